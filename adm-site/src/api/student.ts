@@ -57,21 +57,22 @@ export async function deleteStudents(
 }
 
 
-// 获取学生列表
+// 获取学生列表，按响应头 X-Next-Cursor 逐页取回全部学生
 export async function getStudentList(
 
 ): Promise<{ students: StudentBrief[] } | null> {
-  const response = await request({
-    route: `student`,
-    method: 'GET',
-  })
-  if (!response) {
-    return null
-  }
-else {
-    const students: StudentBrief[] = await response.json()
-    return { students }
-  }
+  const students: StudentBrief[] = []
+  let cursor = '0'
+  do {
+    const response = await request({
+      route: `student?cursor=${encodeURIComponent(cursor)}&limit=1000`,
+      method: 'GET',
+    })
+    if (!response) {
+      return null
+    }
+    students.push(...(await response.json()))
+    cursor = response.headers.get('X-Next-Cursor') ?? '0'
+  } while (cursor !== '0')
+  return { students }
 }
-
-
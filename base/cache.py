@@ -0,0 +1,82 @@
+"""进程内缓存"""
+
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+
+
+@dataclass
+class CacheStats:
+    """缓存统计计数"""
+
+    hits: int = 0
+    """命中次数"""
+    misses: int = 0
+    """未命中次数（包括已过期）"""
+    evictions: int = 0
+    """因容量不足被淘汰的条目数"""
+    expirations: int = 0
+    """因过期被丢弃的条目数"""
+    invalidations: int = 0
+    """被主动失效的条目数"""
+
+
+class TTLCache[K, V]:
+    """带过期时间的 LRU 缓存，非线程安全
+
+    :param maxsize: 最大条目数，0 表示禁用缓存
+    :param ttl: 条目的存活时间（秒）
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> V | None:
+        """获取未过期的条目，并将其标记为最近使用，不存在时返回 None"""
+
+        item = self._data.get(key)
+        if item is None:
+            self.stats.misses += 1
+            return None
+        if item[0] <= time.monotonic():
+            del self._data[key]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return item[1]
+
+    def put(self, key: K, value: V) -> None:
+        """放入条目，超出容量时淘汰最久未使用的条目"""
+
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.stats.evictions += 1
+
+    def pop(self, key: K) -> None:
+        """使条目失效"""
+
+        if self._data.pop(key, None) is not None:
+            self.stats.invalidations += 1
+
+    def clear(self) -> None:
+        """使所有条目失效"""
+
+        self.stats.invalidations += len(self._data)
+        self._data.clear()
+
+    def info(self) -> dict:
+        """缓存的大小和统计计数"""
+
+        return {"size": len(self._data), "maxsize": self.maxsize, **asdict(self.stats)}
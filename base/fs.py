@@ -0,0 +1,88 @@
+"""异步文件系统操作
+
+网络挂载的卷上单次文件系统调用可能耗时数十毫秒，直接在事件循环中调用会阻塞同一进程中的
+所有请求。AsyncFS 在专用的有界线程池中执行这些阻塞调用，不与 asyncio.to_thread 的默认
+线程池争用线程，并按操作统计耗时。
+"""
+
+import asyncio as aio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Callable
+
+
+@dataclass
+class FsOpStats:
+    """单种文件系统操作的统计"""
+
+    count: int = 0
+    """调用次数"""
+    errors: int = 0
+    """抛出异常的次数"""
+    total: float = 0.0
+    """累计耗时（秒），包括在线程池中排队的时间"""
+    max: float = 0.0
+    """最长耗时（秒）"""
+
+
+class AsyncFS:
+    """在专用线程池中执行的异步文件系统操作
+
+    线程池在首次使用时创建，fork 出的子进程会创建自己的线程池。
+
+    :param max_workers: 线程池大小，即同时进行的文件系统调用数上限
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self.stats: dict[str, FsOpStats] = {}
+        self._pool: ThreadPoolExecutor | None = None
+        self._pool_pid = 0
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="fs")
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    async def run[T](self, op: str, func: Callable[..., T], *args) -> T:
+        """在线程池中执行 func(*args)，耗时计入名为 op 的操作"""
+
+        stats = self.stats.get(op)
+        if stats is None:
+            stats = self.stats[op] = FsOpStats()
+        t0 = time.perf_counter()
+        try:
+            return await aio.get_running_loop().run_in_executor(
+                self._executor(), func, *args
+            )
+        except BaseException:
+            stats.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - t0
+            stats.count += 1
+            stats.total += elapsed
+            stats.max = max(stats.max, elapsed)
+
+    async def exists(self, path: str) -> bool:
+        return await self.run("exists", os.path.exists, path)
+
+    async def makedirs(self, path: str) -> None:
+        await self.run("makedirs", os.makedirs, path)
+
+    async def rmdir(self, path: str) -> None:
+        await self.run("rmdir", os.rmdir, path)
+
+    async def rename(self, src: str, dst: str) -> None:
+        await self.run("rename", os.rename, src, dst)
+
+    def info(self) -> dict:
+        """线程池大小和各操作的统计"""
+
+        return {
+            "max_workers": self.max_workers,
+            "ops": {op: asdict(stats) for op, stats in self.stats.items()},
+        }
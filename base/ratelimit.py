@@ -0,0 +1,49 @@
+"""限速器"""
+
+import asyncio as aio
+import time
+
+
+class TokenBucket:
+    """异步令牌桶限速器，非线程安全
+
+    令牌不足时预支令牌并等待到其补足为止，因此等待者按调用顺序依次放行。
+
+    :param rate: 每秒补充的令牌数，0 或负数表示不限速
+    :param burst: 桶容量，即允许的突发请求数
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.acquired = 0
+        """已发放的令牌数"""
+        self.waited = 0.0
+        """所有调用者累计等待的时间（秒）"""
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+
+    async def acquire(self) -> None:
+        """取得一个令牌，令牌不足时等待"""
+
+        self.acquired += 1
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+        self._tokens -= 1
+        if self._tokens < 0:
+            delay = -self._tokens / self.rate
+            self.waited += delay
+            await aio.sleep(delay)
+
+    def info(self) -> dict:
+        """限速器的配置和统计"""
+
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "acquired": self.acquired,
+            "waited": self.waited,
+        }
@@ -6,8 +6,8 @@
 import asyncio as aio
 import logging
 from abc import ABC, abstractmethod
-from enum import IntEnum
-from typing import Optional, List, Dict, Any
+from enum import Enum, IntEnum
+from typing import Optional, List, Dict, Any, Iterable
 from pydantic import BaseModel, Field
 from config import CONFIG, ClusterConfig
 
@@ -73,6 +73,10 @@ class JobInfo(BaseModel):
     # 用户信息
     user_id: Optional[str] = Field(None, description="用户ID")
 
+    # 启动进度
+    phase: Optional[str] = Field(None, description="启动阶段，见 JobInfo.Phase")
+    message: Optional[str] = Field(None, description="启动阶段的说明，如调度失败的原因")
+
     class Status(IntEnum):
         PENDING = 0
         RUNNING = 1
@@ -80,6 +84,20 @@ class JobInfo(BaseModel):
         SUSPENDED = 3
         STARTING = 4
 
+    class Phase(str, Enum):
+        """作业就绪前经历的阶段"""
+
+        SCHEDULING = "scheduling"
+        """等待调度到节点"""
+        PULLING = "pulling"
+        """拉取镜像、创建容器"""
+        BOOTING = "booting"
+        """容器已启动，code-server 尚未通过启动或就绪探针"""
+        READY = "ready"
+        """code-server 已就绪"""
+        FAILING = "failing"
+        """拉取镜像失败或容器反复崩溃"""
+
 
 def _read_port_config() -> List[PortParams]:
     """读取端口配置"""
@@ -115,6 +133,13 @@ class ClusterABC(ABC):
         """获取作业状态"""
         pass
 
+    @abstractmethod
+    async def get_job_statuses(
+        self, job_names: Iterable[str]
+    ) -> Dict[str, JobInfo.Status]:
+        """批量获取作业状态，不存在的作业不出现在结果中"""
+        pass
+
     @abstractmethod
     async def get_job_info(self, job_name: str) -> JobInfo:
         """获取作业信息"""
@@ -145,6 +170,22 @@ class ClusterABC(ABC):
         """回收计算资源"""
         logger.info(f"Cluster {self.__class__.__name__} cleanup")
 
+    async def get_ready_time(self, job_name: str) -> Optional[float]:
+        """作业的 Pod 变为就绪的时间（POSIX 时间戳），未就绪或无法确定时返回 None"""
+        return None
+
+    @property
+    def status_cached(self) -> bool:
+        """作业状态是否从本进程的本地缓存读取，为 True 时查询不访问 API Server"""
+        return False
+
+    async def rollout_image(self) -> Optional[str]:
+        """把配置的代码空间镜像解析为摘要并预拉取到所有节点，之后新的作业按摘要部署
+
+        :return: 按摘要引用的镜像，不支持预拉取时返回 None
+        """
+        return None
+
 
 # 异常定义
 class ClusterError(Exception):
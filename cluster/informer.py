@@ -0,0 +1,274 @@
+"""Kubernetes 资源的 list+watch 本地缓存
+
+Reflector 在后台线程中先 list 一次资源，之后 watch 其变化并维护按作业名索引的本地存储。
+watch 连接断开后从最后的 resourceVersion 继续，resourceVersion 过期（410 Gone）时重新 list。
+稳定状态下读取资源不需要访问 API Server。
+"""
+
+import threading
+from typing import Any, Callable, Iterable
+
+from base.logger import logger
+
+LOGGER = logger(__spec__, __file__)
+
+
+def _resource_version(obj) -> str | None:
+    """对象的 resourceVersion，BOOKMARK 事件中的对象可能是未反序列化的字典"""
+    if isinstance(obj, dict):
+        return obj.get("metadata", {}).get("resourceVersion")
+    return obj.metadata.resource_version
+
+
+def _newer(rv: str | None, than: str | None) -> bool:
+    """resourceVersion 应被视为不透明字符串，但实际上是递增整数，无法比较时视为更新"""
+    try:
+        return int(rv) > int(than)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return True
+
+
+class ResourceExpired(Exception):
+    """watch 的 resourceVersion 已过期，需要重新 list"""
+
+
+class Reflector:
+    """把一类资源 list+watch 到按键索引的本地存储，线程安全
+
+    :param kind: 资源类型名，用于日志
+    :param list_func: 返回资源列表，列表有 items 和 metadata.resource_version
+    :param watch_func: 以 resourceVersion 为参数，返回 {"type", "object"} 事件的迭代器，
+        过期时抛出 status 为 410 的异常或产生 ERROR 事件
+    :param key_func: 对象的索引键（作业名）
+    :param index_func: 对象的二级索引键，多个对象可以有相同的二级索引键，用 select 查询
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        list_func: Callable[[], Any],
+        watch_func: Callable[[str], Iterable[dict]],
+        key_func: Callable[[Any], str],
+        index_func: Callable[[Any], str | None] | None = None,
+    ):
+        self.kind = kind
+        self.resource_version: str | None = None
+        self.synced = threading.Event()
+        """本地存储与 API Server 同步，watch 出错时被清除"""
+        self.relists = 0
+        self.events = 0
+        self.errors = 0
+        self._list_func = list_func
+        self._watch_func = watch_func
+        self._key_func = key_func
+        self._index_func = index_func
+        self._items: dict[str, Any] = {}
+        self._index: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def get(self, key: str) -> Any | None:
+        with self._lock:
+            return self._items.get(key)
+
+    def keys(self) -> list[str]:
+        with self._lock:
+            return list(self._items)
+
+    def select(self, index: str) -> list[Any]:
+        """二级索引键为 index 的所有对象"""
+        with self._lock:
+            return [self._items[key] for key in self._index.get(index, ())]
+
+    def _put(self, key: str, obj) -> None:
+        """写入对象并维护二级索引，调用者持有锁"""
+        self._pop(key)
+        self._items[key] = obj
+        if self._index_func is not None and (index := self._index_func(obj)):
+            self._index.setdefault(index, set()).add(key)
+
+    def _pop(self, key: str) -> None:
+        """删除对象并维护二级索引，调用者持有锁"""
+        old = self._items.pop(key, None)
+        if old is None or self._index_func is None:
+            return
+        if (index := self._index_func(old)) and (keys := self._index.get(index)):
+            keys.discard(key)
+            if not keys:
+                del self._index[index]
+
+    def observe(self, obj) -> None:
+        """写入本进程修改 API 对象后得到的新对象，避免在 watch 事件到达前读到旧对象"""
+        key = self._key_func(obj)
+        with self._lock:
+            old = self._items.get(key)
+            if old is None or _newer(_resource_version(obj), _resource_version(old)):
+                self._put(key, obj)
+
+    def forget(self, key: str) -> None:
+        """删除本进程已删除的对象"""
+        with self._lock:
+            self._pop(key)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self.run, name=f"reflector-{self.kind}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def relist(self) -> None:
+        """重新 list 并替换本地存储"""
+        result = self._list_func()
+        with self._lock:
+            self._items = {}
+            self._index = {}
+            for obj in result.items:
+                self._put(self._key_func(obj), obj)
+            items = self._items
+            self.resource_version = result.metadata.resource_version
+        self.relists += 1
+        LOGGER.info(
+            f"{self.kind} 已同步 {len(items)} 个对象，"
+            f"resourceVersion: {self.resource_version}"
+        )
+
+    def apply(self, event: dict) -> None:
+        """应用一个 watch 事件"""
+        type, obj = event["type"], event["object"]
+        if type == "ERROR":
+            code = obj.get("code") if isinstance(obj, dict) else None
+            if code == 410:
+                raise ResourceExpired(obj)
+            raise RuntimeError(f"watch error: {obj}")
+
+        if type != "BOOKMARK":
+            key = self._key_func(obj)
+            with self._lock:
+                if type == "DELETED":
+                    self._pop(key)
+                else:
+                    self._put(key, obj)
+        self.resource_version = _resource_version(obj) or self.resource_version
+        self.events += 1
+
+    def run(self) -> None:
+        backoff = 1.0
+        while not self._stopped.is_set():
+            try:
+                if self.resource_version is None:
+                    self.relist()
+                self.synced.set()
+                for event in self._watch_func(self.resource_version):  # type: ignore
+                    self.apply(event)
+                    if self._stopped.is_set():
+                        return
+                backoff = 1.0
+            except ResourceExpired:
+                LOGGER.info(f"{self.kind} 的 resourceVersion 已过期，重新同步")
+                self.resource_version = None
+            except Exception as e:
+                if getattr(e, "status", None) == 410:
+                    LOGGER.info(f"{self.kind} 的 resourceVersion 已过期，重新同步")
+                    self.resource_version = None
+                    continue
+                self.errors += 1
+                self.synced.clear()
+                LOGGER.warning(f"{self.kind} watch 失败，{backoff} 秒后重试: {e}")
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+    def info(self) -> dict:
+        return {
+            "synced": self.synced.is_set(),
+            "size": len(self._items),
+            "resource_version": self.resource_version,
+            "relists": self.relists,
+            "events": self.events,
+            "errors": self.errors,
+        }
+
+
+class Informer:
+    """同一命名空间、同一标签选择器下 Deployment、Service 和 Pod 的本地缓存
+
+    Deployment 和 Service 按作业名索引，Pod 按名称索引，并以 app 标签（作业名）为二级索引。
+
+    :param apps_v1: kubernetes.client.AppsV1Api
+    :param core_v1: kubernetes.client.CoreV1Api
+    :param watch_timeout: 单次 watch 请求的服务端超时（秒），超时后从原处继续
+    """
+
+    def __init__(
+        self,
+        apps_v1,
+        core_v1,
+        namespace: str,
+        label_selector: str,
+        watch_timeout: int = 300,
+    ):
+        from kubernetes import watch
+
+        def stream(func):
+            def watch_func(resource_version: str):
+                return watch.Watch().stream(
+                    func,
+                    namespace=namespace,
+                    label_selector=label_selector,
+                    resource_version=resource_version,
+                    allow_watch_bookmarks=True,
+                    timeout_seconds=watch_timeout,
+                )
+
+            return watch_func
+
+        self.deployments = Reflector(
+            "Deployment",
+            lambda: apps_v1.list_namespaced_deployment(
+                namespace=namespace, label_selector=label_selector
+            ),
+            stream(apps_v1.list_namespaced_deployment),
+            lambda obj: obj.metadata.name,
+        )
+        self.services = Reflector(
+            "Service",
+            lambda: core_v1.list_namespaced_service(
+                namespace=namespace, label_selector=label_selector
+            ),
+            stream(core_v1.list_namespaced_service),
+            lambda obj: obj.metadata.name.removesuffix("-svc"),
+        )
+        self.pods = Reflector(
+            "Pod",
+            lambda: core_v1.list_namespaced_pod(
+                namespace=namespace, label_selector=label_selector
+            ),
+            stream(core_v1.list_namespaced_pod),
+            lambda obj: obj.metadata.name,
+            lambda obj: (obj.metadata.labels or {}).get("app"),
+        )
+
+    @property
+    def synced(self) -> bool:
+        """Deployment 和 Service 已同步，Pod 的同步状态单独由 pods.synced 表示"""
+        return self.deployments.synced.is_set() and self.services.synced.is_set()
+
+    def start(self) -> None:
+        self.deployments.start()
+        self.services.start()
+        self.pods.start()
+
+    def stop(self) -> None:
+        self.deployments.stop()
+        self.services.stop()
+        self.pods.stop()
+
+    def info(self) -> dict:
+        return {
+            "deployments": self.deployments.info(),
+            "services": self.services.info(),
+            "pods": self.pods.info(),
+        }
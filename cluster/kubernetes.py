@@ -4,12 +4,16 @@
 """
 
 import asyncio as aio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from base.logger import logger
-from typing import Any, List, Dict
+from base.ratelimit import TokenBucket
+from typing import Any, Iterable, List, Dict
 from kubernetes.client.rest import ApiException
 from dataclasses import dataclass
 
 from config import CONFIG, ENVIRON
+from .informer import Informer
 from . import (
     ClusterABC,
     JobParams,
@@ -22,6 +26,144 @@ from . import (
 LOGGER = logger(__spec__, __file__)
 
 
+_PREPULL_NAME = "codespace-prepull"
+_PREPULL_LABELS = {"managed-by": "yatcc-se", "type": "prepull"}
+_SOURCE_IMAGE_ANNOTATION = "yatcc-se/source-image"
+_PINNED_IMAGE_ANNOTATION = "yatcc-se/pinned-image"
+"""预拉取 DaemonSet 上的注解：按摘要引用的镜像已预拉取到所有节点，新的代码空间按它
+部署。source-image 为它解析自的配置镜像，配置改变后旧的摘要不再使用"""
+
+
+def _pull_policy(image: str) -> str:
+    """按摘要引用的镜像内容不变，已存在时不必访问镜像仓库"""
+    return "IfNotPresent" if "@sha256:" in image else "Always"
+
+
+def _digest_ref(image: str, image_id: str) -> str | None:
+    """用容器状态中的 imageID 把镜像引用固定为摘要，imageID 不含仓库摘要时返回 None
+
+    imageID 形如 docker-pullable://repo@sha256:...，或 repo@sha256:...
+    """
+    if "@sha256:" not in image_id:
+        return None
+    digest = image_id.rsplit("@", 1)[1]
+    repo = image.split("@", 1)[0]
+    if ":" in repo.rsplit("/", 1)[-1]:
+        repo = repo.rsplit(":", 1)[0]
+    return f"{repo}@{digest}"
+
+
+def _build_prepull_daemonset(image: str) -> Dict[str, Any]:
+    """构建在每个节点上拉取镜像的 DaemonSet，所有节点同时更新
+
+    容器只运行 sleep，几乎不占资源；模板中的时间戳注解使每次应用都重建 Pod，重新拉取。
+    """
+    return {
+        "apiVersion": "apps/v1",
+        "kind": "DaemonSet",
+        "metadata": {
+            "name": _PREPULL_NAME,
+            "namespace": CONFIG.CLUSTER.Kubernetes.NAMESPACE,
+            "labels": _PREPULL_LABELS,
+        },
+        "spec": {
+            "selector": {"matchLabels": _PREPULL_LABELS},
+            "updateStrategy": {
+                "type": "RollingUpdate",
+                "rollingUpdate": {"maxUnavailable": "100%"},
+            },
+            "template": {
+                "metadata": {
+                    "labels": _PREPULL_LABELS,
+                    "annotations": {"yatcc-se/rollout": str(time.time())},
+                },
+                "spec": {
+                    "containers": [
+                        {
+                            "name": "prepull",
+                            "image": image,
+                            "imagePullPolicy": _pull_policy(image),
+                            "command": ["sleep", "infinity"],
+                            "resources": {
+                                "requests": {"cpu": "1m", "memory": "8Mi"},
+                                "limits": {"cpu": "10m", "memory": "32Mi"},
+                            },
+                        }
+                    ],
+                    "tolerations": [{"operator": "Exists"}],
+                    "terminationGracePeriodSeconds": 0,
+                },
+            },
+        },
+    }
+
+
+_FAILING_REASONS = frozenset(
+    {
+        "ErrImagePull",
+        "ImagePullBackOff",
+        "InvalidImageName",
+        "CrashLoopBackOff",
+        "CreateContainerError",
+        "CreateContainerConfigError",
+    }
+)
+"""容器等待原因中表示启动失败、需要人工处理的部分，其余等待原因视为正在拉取或创建"""
+
+
+def _pod_phase(pod) -> tuple[JobInfo.Phase, str | None]:
+    """根据 Pod 的状态确定启动阶段和说明"""
+    conditions = {c.type: c for c in (pod.status.conditions or [])}
+    ready = conditions.get("Ready")
+    if ready is not None and ready.status == "True":
+        return JobInfo.Phase.READY, None
+    scheduled = conditions.get("PodScheduled")
+    if scheduled is None or scheduled.status != "True":
+        return JobInfo.Phase.SCHEDULING, scheduled.message if scheduled else None
+    for status in pod.status.container_statuses or []:
+        state = status.state
+        if state is None:
+            continue
+        if state.waiting is not None:
+            if state.waiting.reason in _FAILING_REASONS:
+                return JobInfo.Phase.FAILING, (
+                    state.waiting.message or state.waiting.reason
+                )
+            return JobInfo.Phase.PULLING, state.waiting.reason
+        if state.running is not None:
+            return JobInfo.Phase.BOOTING, None
+    return JobInfo.Phase.PULLING, None
+
+
+def _build_env(env: Dict[str, str]) -> List[Dict[str, Any]]:
+    """容器的环境变量，另外通过 Downward API 注入节点地址 NODE_IP，监控鼹鼠据此忽略
+    kubelet 探针的连接"""
+    return [{"name": k, "value": v} for k, v in env.items()] + [
+        {"name": "NODE_IP", "valueFrom": {"fieldRef": {"fieldPath": "status.hostIP"}}}
+    ]
+
+
+def _read_env(container) -> Dict[str, str]:
+    """容器中直接设置值的环境变量，不包括 _build_env 通过 Downward API 注入的变量"""
+    return {
+        env_var.name: env_var.value
+        for env_var in (container.env or [])
+        if env_var.value_from is None
+    }
+
+
+def _probe_matches(probe, spec: Dict[str, Any]) -> bool:
+    """已有容器的探针是否与 KubernetesSpec 生成的一致，只比较可配置的字段"""
+    return (
+        probe is not None
+        and probe.http_get is not None
+        and probe.http_get.path == spec["httpGet"]["path"]
+        and probe.http_get.port == spec["httpGet"]["port"]
+        and probe.period_seconds == spec["periodSeconds"]
+        and probe.failure_threshold == spec["failureThreshold"]
+    )
+
+
 @dataclass
 class KubernetesSpec:
     """Kubernetes 规格配置"""
@@ -73,6 +215,8 @@ class KubernetesSpec:
                     for port in self.job_params.ports
                 ],
                 "type": "LoadBalancer",  # 关键修改：使用 LoadBalancer 类型以获取公网 IP
+                # 保留客户端地址，用户连接不会被转换为节点地址而被监控鼹鼠当作探针忽略
+                "externalTrafficPolicy": "Local",
             },
         }
 
@@ -80,6 +224,7 @@ class KubernetesSpec:
         return {
             # 默认副本数为 0，在创建时不会自动启动
             "replicas": 0,
+            "progressDeadlineSeconds": CONFIG.CLUSTER.Codespace.START_TIMEOUT,
             "selector": {"matchLabels": {"app": self.job_params.name}},
             "template": {
                 "metadata": {
@@ -100,17 +245,16 @@ class KubernetesSpec:
         return {
             "name": "code-server",
             "image": self.job_params.image,
-            "imagePullPolicy": "Always",
+            "imagePullPolicy": _pull_policy(self.job_params.image),
             "ports": [
                 {"containerPort": item.target_port, "name": item.name}
                 for item in self.job_params.ports
             ],
-            "env": [{"name": k, "value": v} for k, v in self.job_params.env.items()],
+            "env": _build_env(self.job_params.env),
             "args": [],
             "volumeMounts": self._build_volume_mounts(),
             "resources": self._build_resources(),
-            # "readinessProbe": self._build_probe(),
-            # "livenessProbe": self._build_probe(initial_delay=60, period=30),
+            **self._build_probes(),
         }
 
     def _build_volume_mounts(self) -> List[Dict[str, str]]:
@@ -143,11 +287,28 @@ class KubernetesSpec:
             },
         }
 
-    def _build_probe(self, initial_delay: int = 30, period: int = 10) -> Dict[str, Any]:
+    def _build_probes(self) -> Dict[str, Dict[str, Any]]:
+        """启动探针在 code-server 开始监听前屏蔽就绪探针，超时未通过则重启容器；就绪探针
+        决定 Pod 是否 Ready，即代码空间是否进入 running"""
+        codespace = CONFIG.CLUSTER.Codespace
+        return {
+            "startupProbe": self._build_probe(
+                codespace.STARTUP_PROBE_PERIOD,
+                -(-codespace.STARTUP_PROBE_TIMEOUT // codespace.STARTUP_PROBE_PERIOD),
+            ),
+            "readinessProbe": self._build_probe(
+                codespace.READINESS_PROBE_PERIOD, codespace.READINESS_PROBE_FAILURES
+            ),
+        }
+
+    def _build_probe(self, period: int, failure_threshold: int) -> Dict[str, Any]:
         return {
-            "httpGet": {"path": "/", "port": 443},  # HTTP 健康检查路径
-            "initialDelaySeconds": initial_delay,
+            "httpGet": {
+                "path": CONFIG.CLUSTER.Codespace.PROBE_PATH,
+                "port": CONFIG.CLUSTER.Codespace.PROBE_PORT,
+            },
             "periodSeconds": period,
+            "failureThreshold": failure_threshold,
         }
 
     def _build_labels(self) -> Dict[str, str]:
@@ -168,6 +329,53 @@ class KubernetesCluster(ClusterABC):
         self._is_initialized = False
         self._port_forwards: Dict[str, Dict] = {}
         self._local_port_base = 30000  # 本地端口基数，用于端口转发
+        self._limiter = TokenBucket(
+            CONFIG.CLUSTER.Kubernetes.API_QPS, CONFIG.CLUSTER.Kubernetes.API_BURST
+        )
+        self._informer: Informer | None = None
+        self._executor = ThreadPoolExecutor(
+            CONFIG.CLUSTER.Kubernetes.API_WORKERS, thread_name_prefix="k8s-api"
+        )
+        self._pinned_image: str | None = None
+        self._pinned_checked = -float("inf")
+        self._api_stats = {
+            "calls": 0,
+            "errors": 0,
+            "queue_total": 0.0,
+            "queue_max": 0.0,
+            "call_total": 0.0,
+            "call_max": 0.0,
+        }
+
+    async def _call(self, func, /, *args, **kwargs):
+        """经过限速器，在专用线程池中调用 Kubernetes API
+
+        线程池与连接池大小相同，不与默认线程池争用线程，每次调用都有超时。分别统计在
+        线程池中排队的时间和调用本身的时间。
+        """
+        await self._limiter.acquire()
+        kwargs.setdefault("_request_timeout", CONFIG.CLUSTER.Kubernetes.TIMEOUT)
+        stats = self._api_stats
+        queued = time.perf_counter()
+        started = queued
+
+        def run():
+            nonlocal started
+            started = time.perf_counter()
+            return func(*args, **kwargs)
+
+        try:
+            return await aio.get_running_loop().run_in_executor(self._executor, run)
+        except BaseException:
+            stats["errors"] += 1
+            raise
+        finally:
+            finished = time.perf_counter()
+            stats["calls"] += 1
+            stats["queue_total"] += started - queued
+            stats["queue_max"] = max(stats["queue_max"], started - queued)
+            stats["call_total"] += finished - started
+            stats["call_max"] = max(stats["call_max"], finished - started)
 
     async def initialize(self):
         """初始化 Kubernetes 集群连接"""
@@ -190,13 +398,27 @@ class KubernetesCluster(ClusterABC):
                 except Exception as e:
                     raise ClusterError(f"Failed to load Kubernetes config: {e}")
 
-            # 创建客户端
-            self._k8s_client = client.ApiClient()
-            self._apps_v1 = client.AppsV1Api()
-            self._core_v1 = client.CoreV1Api()
+            # 创建客户端，连接池容纳所有 API 调用线程和 informer 的 watch 连接
+            configuration = client.Configuration.get_default_copy()
+            configuration.connection_pool_maxsize = (
+                CONFIG.CLUSTER.Kubernetes.API_WORKERS + 3
+            )
+            self._k8s_client = client.ApiClient(configuration)
+            self._apps_v1 = client.AppsV1Api(self._k8s_client)
+            self._core_v1 = client.CoreV1Api(self._k8s_client)
 
             # 测试连接
-            await aio.to_thread(self._core_v1.list_namespace, timeout_seconds=10)
+            await self._call(self._core_v1.list_namespace, timeout_seconds=10)
+
+            if CONFIG.CLUSTER.Kubernetes.INFORMER:
+                self._informer = Informer(
+                    self._apps_v1,
+                    self._core_v1,
+                    CONFIG.CLUSTER.Kubernetes.NAMESPACE,
+                    "managed-by=yatcc-se",
+                    CONFIG.CLUSTER.Kubernetes.WATCH_TIMEOUT,
+                )
+                self._informer.start()
 
             self._is_initialized = True
             LOGGER.info("Kubernetes cluster initialized successfully")
@@ -210,6 +432,54 @@ class KubernetesCluster(ClusterABC):
         if not self._is_initialized:
             await self.initialize()
 
+    @property
+    def status_cached(self) -> bool:
+        """informer 已同步时作业状态从本地缓存读取"""
+        return self._informer is not None and self._informer.synced
+
+    async def _read_deployment(self, job_name: str):
+        """读取 Deployment，informer 已同步时从本地缓存读取，不访问 API Server"""
+        if self._informer is not None and self._informer.synced:
+            deployment = self._informer.deployments.get(job_name)
+            if deployment is None:
+                raise ApiException(status=404, reason="Not Found")
+            return deployment
+        return await self._call(
+            self.apps_v1.read_namespaced_deployment,
+            name=job_name,
+            namespace=CONFIG.CLUSTER.Kubernetes.NAMESPACE,
+        )
+
+    async def _read_service(self, job_name: str):
+        """读取作业的 Service，informer 已同步时从本地缓存读取，不访问 API Server"""
+        if self._informer is not None and self._informer.synced:
+            service = self._informer.services.get(job_name)
+            if service is None:
+                raise ApiException(status=404, reason="Not Found")
+            return service
+        return await self._call(
+            self.core_v1.read_namespaced_service,
+            name=f"{job_name}-svc",
+            namespace=CONFIG.CLUSTER.Kubernetes.NAMESPACE,
+        )
+
+    def _observe(self, obj) -> None:
+        """把修改 API 对象后得到的新对象写入 informer 的本地缓存"""
+        if self._informer is None:
+            return
+        if obj.kind == "Service":
+            self._informer.services.observe(obj)
+        else:
+            self._informer.deployments.observe(obj)
+
+    def info(self) -> dict:
+        """API 调用的限速、排队和耗时统计，以及 informer 的同步状态"""
+        return {
+            "limiter": self._limiter.info(),
+            "api": dict(self._api_stats),
+            "informer": None if self._informer is None else self._informer.info(),
+        }
+
     @property
     def apps_v1(self):
         """获取 AppsV1Api 客户端"""
@@ -226,6 +496,7 @@ class KubernetesCluster(ClusterABC):
         这是一个幂等操作：如果资源已存在，则直接返回其信息。
         """
         await self.ensure_initialized()
+        job_params = await self._pin_image(job_params)
 
         job_name = job_params.name
         namespace = CONFIG.CLUSTER.Kubernetes.NAMESPACE
@@ -233,7 +504,7 @@ class KubernetesCluster(ClusterABC):
         try:
             # 1. 获取或创建 Deployment
             try:
-                deployment = await aio.to_thread(
+                deployment = await self._call(
                     self.apps_v1.read_namespaced_deployment,
                     name=job_name,
                     namespace=namespace,
@@ -243,11 +514,12 @@ class KubernetesCluster(ClusterABC):
                 if e.status == 404:
                     LOGGER.info(f"Deployment '{job_name}' not found, creating...")
                     deployment_spec = KubernetesSpec(job_params)._build_deployment()
-                    deployment = await aio.to_thread(
+                    deployment = await self._call(
                         self.apps_v1.create_namespaced_deployment,
                         namespace=namespace,
                         body=deployment_spec,
                     )
+                    self._observe(deployment)
                     LOGGER.info(f"Successfully created Deployment '{job_name}'.")
                 else:
                     raise  # 重新抛出其他 API 错误
@@ -265,6 +537,7 @@ class KubernetesCluster(ClusterABC):
     async def submit_job(self, job_params: JobParams) -> JobInfo:
         """提交或更新 code-server 作业，并确保其运行。"""
         await self.ensure_initialized()
+        job_params = await self._pin_image(job_params)
 
         # 步骤 1: 确保资源已分配。
         # 这一步是幂等的，如果资源已存在，它只会获取信息。
@@ -284,7 +557,7 @@ class KubernetesCluster(ClusterABC):
         for attempt in range(max_retries):
             try:
                 # 读取最新的 Deployment
-                deployment = await aio.to_thread(
+                deployment = await self._call(
                     self.apps_v1.read_namespaced_deployment,
                     name=job_name,
                     namespace=namespace,
@@ -307,7 +580,11 @@ class KubernetesCluster(ClusterABC):
 
                 # 检查并更新容器配置
                 container = deployment.spec.template.spec.containers[0]
-                new_env = [{"name": k, "value": v} for k, v in job_params.env.items()]
+                if container.image != job_params.image:
+                    container.image = job_params.image
+                    container.image_pull_policy = _pull_policy(job_params.image)
+                    made_changes = True
+                new_env = _build_env(job_params.env)
                 new_limits = {
                     "memory": job_params.memory_limit
                     or CONFIG.CLUSTER.Codespace.DEFAULT_MEMORY_LIMIT,
@@ -319,15 +596,32 @@ class KubernetesCluster(ClusterABC):
                     container.resources.limits = new_limits
                     made_changes = True
 
+                # 应用最新的探针和启动期限
+                probes = KubernetesSpec(job_params)._build_probes()
+                if not (
+                    _probe_matches(container.startup_probe, probes["startupProbe"])
+                    and _probe_matches(
+                        container.readiness_probe, probes["readinessProbe"]
+                    )
+                ):
+                    container.startup_probe = probes["startupProbe"]
+                    container.readiness_probe = probes["readinessProbe"]
+                    made_changes = True
+                start_timeout = CONFIG.CLUSTER.Codespace.START_TIMEOUT
+                if deployment.spec.progress_deadline_seconds != start_timeout:
+                    deployment.spec.progress_deadline_seconds = start_timeout
+                    made_changes = True
+
                 # 如果有更改，则执行 patch
                 if made_changes:
                     LOGGER.info(f"Patching Deployment '{job_name}' with updates...")
-                    deployment = await aio.to_thread(
+                    deployment = await self._call(
                         self.apps_v1.patch_namespaced_deployment,
                         name=job_name,
                         namespace=namespace,
                         body=deployment,
                     )
+                    self._observe(deployment)
                 else:
                     LOGGER.info(
                         f"Deployment '{job_name}' is already up-to-date and running."
@@ -354,7 +648,7 @@ class KubernetesCluster(ClusterABC):
         svc_name = job_params.name + "-svc"
 
         try:
-            service = await aio.to_thread(
+            service = await self._call(
                 self.core_v1.read_namespaced_service,
                 name=svc_name,
                 namespace=CONFIG.CLUSTER.Kubernetes.NAMESPACE,
@@ -375,11 +669,12 @@ class KubernetesCluster(ClusterABC):
         """创建 Service，返回 Service 对象"""
         service_spec = KubernetesSpec(job_params)._build_service()
         svc_name = service_spec["metadata"]["name"]
-        service = await aio.to_thread(
+        service = await self._call(
             self.core_v1.create_namespaced_service,
             namespace=CONFIG.CLUSTER.Kubernetes.NAMESPACE,
             body=service_spec,
         )
+        self._observe(service)
 
         # 对于 LoadBalancer 类型，node_port 不再是关键信息，直接返回 service 对象
         return service
@@ -388,14 +683,9 @@ class KubernetesCluster(ClusterABC):
         """获取指定作业的外部可访问 URL"""
         await self.ensure_initialized()
         svc_name = f"{job_name}-svc"
-        namespace = CONFIG.CLUSTER.Kubernetes.NAMESPACE
 
         try:
-            service = await aio.to_thread(
-                self.core_v1.read_namespaced_service,
-                name=svc_name,
-                namespace=namespace,
-            )
+            service = await self._read_service(job_name)
 
             # 检查 LoadBalancer 的状态，等待公网 IP 分配
             if service.status.load_balancer and service.status.load_balancer.ingress:
@@ -423,46 +713,124 @@ class KubernetesCluster(ClusterABC):
         """获取作业状态"""
         await self.ensure_initialized()
         try:
-            deployment = await aio.to_thread(
-                self.apps_v1.read_namespaced_deployment,
-                name=job_name,
-                namespace=CONFIG.CLUSTER.Kubernetes.NAMESPACE,
-            )
+            deployment = await self._read_deployment(job_name)
             if not deployment:
                 raise JobNotFoundError(f"Job not found: {job_name}")
-            # 检查 Deployment 的状态
-            if (
-                deployment.status.ready_replicas
-                and deployment.status.ready_replicas >= 1
-            ):
-                return JobInfo.Status.RUNNING
-            elif deployment.status.unavailable_replicas:
-                return JobInfo.Status.FAILED
-            elif deployment.status.replicas == 0:
-                return JobInfo.Status.SUSPENDED
-            else:
-                return JobInfo.Status.PENDING
+            return self._deployment_status(deployment)
         except ApiException as e:
             if e.status == 404:
                 raise JobNotFoundError(f"Job not found: {job_name}")
             raise ClusterError(f"Failed to get job status: {e}")
 
+    async def get_job_statuses(
+        self, job_names: Iterable[str]
+    ) -> Dict[str, JobInfo.Status]:
+        """批量获取作业状态
+
+        informer 已同步时从本地缓存读取，否则用一次带标签选择器的 list 请求取回所有作业的
+        Deployment，而不是逐个 read。
+        """
+        await self.ensure_initialized()
+        names = set(job_names)
+        if not names:
+            return {}
+
+        if self._informer is not None and self._informer.synced:
+            deployments = [self._informer.deployments.get(name) for name in names]
+        else:
+            try:
+                result = await self._call(
+                    self.apps_v1.list_namespaced_deployment,
+                    namespace=CONFIG.CLUSTER.Kubernetes.NAMESPACE,
+                    label_selector="managed-by=yatcc-se",
+                )
+            except ApiException as e:
+                raise ClusterError(f"Failed to list job statuses: {e}")
+            deployments = result.items
+
+        return {
+            deployment.metadata.name: self._deployment_status(deployment)
+            for deployment in deployments
+            if deployment is not None and deployment.metadata.name in names
+        }
+
+    @staticmethod
+    def _deployment_status(deployment) -> JobInfo.Status:
+        """根据 Deployment 的状态确定作业状态
+
+        只有 Pod 通过就绪探针后才是 RUNNING。尚未就绪的 Pod 也计入 unavailableReplicas，
+        因此只有 Deployment 超过 progressDeadlineSeconds 仍未就绪或无法创建 Pod 时才是
+        FAILED，其余为 PENDING。
+        """
+        annotations = deployment.metadata.annotations or {}
+        if (
+            annotations.get("yatcc-se/suspended") == "true"
+            or deployment.spec.replicas == 0
+        ):
+            return JobInfo.Status.SUSPENDED
+        if deployment.status.ready_replicas and deployment.status.ready_replicas >= 1:
+            return JobInfo.Status.RUNNING
+        for condition in deployment.status.conditions or []:
+            if (condition.type == "Progressing" and condition.status == "False") or (
+                condition.type == "ReplicaFailure" and condition.status == "True"
+            ):
+                return JobInfo.Status.FAILED
+        return JobInfo.Status.PENDING
+
+    async def _job_phase(
+        self, job_name: str, status: JobInfo.Status
+    ) -> tuple[JobInfo.Phase | None, str | None]:
+        """作业的启动阶段和说明，就绪前根据最新创建的 Pod 确定
+
+        informer 的 Pod 缓存已同步时从本地缓存读取，不访问 API Server。
+        """
+        if status == JobInfo.Status.SUSPENDED:
+            return None, None
+        if status == JobInfo.Status.RUNNING:
+            return JobInfo.Phase.READY, None
+        pods = await self._list_job_pods(job_name)
+        if not pods:
+            return JobInfo.Phase.SCHEDULING, None
+        pod = max(pods, key=lambda pod: pod.metadata.creation_timestamp)
+        return _pod_phase(pod)
+
+    async def _list_job_pods(self, job_name: str) -> list:
+        """作业未在删除中的 Pod，informer 的 Pod 缓存已同步时从本地缓存读取"""
+        if self._informer is not None and self._informer.pods.synced.is_set():
+            pods = self._informer.pods.select(job_name)
+        else:
+            result = await self._call(
+                self.core_v1.list_namespaced_pod,
+                namespace=CONFIG.CLUSTER.Kubernetes.NAMESPACE,
+                label_selector=f"app={job_name}",
+            )
+            pods = result.items
+        return [pod for pod in pods if pod.metadata.deletion_timestamp is None]
+
+    async def get_ready_time(self, job_name: str) -> float | None:
+        """作业最早就绪的 Pod 的 Ready 条件的 lastTransitionTime"""
+        await self.ensure_initialized()
+        times = [
+            condition.last_transition_time.timestamp()
+            for pod in await self._list_job_pods(job_name)
+            for condition in (pod.status.conditions or [])
+            if condition.type == "Ready"
+            and condition.status == "True"
+            and condition.last_transition_time is not None
+        ]
+        return min(times, default=None)
+
     async def get_job_info(self, job_name: str) -> JobInfo:
         """获取作业详细信息"""
         await self.ensure_initialized()
-        namespace = CONFIG.CLUSTER.Kubernetes.NAMESPACE
         try:
-            deployment = await aio.to_thread(
-                self.apps_v1.read_namespaced_deployment,
-                name=job_name,
-                namespace=namespace,
-            )
-            service = await aio.to_thread(
-                self.core_v1.read_namespaced_service,
-                name=f"{job_name}-svc",
-                namespace=namespace,
+            deployment = await self._read_deployment(job_name)
+            service = await self._read_service(job_name)
+            job_info = await self._build_job_info(deployment, service)
+            job_info.phase, job_info.message = await self._job_phase(
+                job_name, JobInfo.Status(job_info.status)
             )
-            return await self._build_job_info(deployment, service)
+            return job_info
         except ApiException as e:
             if e.status == 404:
                 raise JobNotFoundError(
@@ -478,7 +846,7 @@ class KubernetesCluster(ClusterABC):
 
         for attempt in range(max_retries):
             try:
-                deployment = await aio.to_thread(
+                deployment = await self._call(
                     self.apps_v1.read_namespaced_deployment,
                     name=job_name,
                     namespace=namespace,
@@ -488,21 +856,30 @@ class KubernetesCluster(ClusterABC):
                     LOGGER.info(f"Deployment '{job_name}' is already suspended.")
                     return
 
-                # 记录原始副本数并设置暂停注解
-                annotations = deployment.metadata.annotations or {}
-                annotations["yatcc-se/suspended"] = "true"
-                annotations["yatcc-se/original-replicas"] = str(
-                    deployment.spec.replicas or 1
-                )
-                deployment.metadata.annotations = annotations
-                deployment.spec.replicas = 0
+                # 记录原始副本数并设置暂停注解，以 resourceVersion 为前提条件
+                body: Dict[str, Any] = {
+                    "metadata": {
+                        "annotations": {
+                            "yatcc-se/suspended": "true",
+                            "yatcc-se/original-replicas": str(
+                                deployment.spec.replicas or 1
+                            ),
+                        },
+                        "resourceVersion": deployment.metadata.resource_version,
+                    },
+                    "spec": {"replicas": 0},
+                }
+                # 清除旧版本为预热池设置的节点亲和性
+                if deployment.spec.template.spec.affinity is not None:
+                    body["spec"]["template"] = {"spec": {"affinity": None}}
 
-                await aio.to_thread(
+                deployment = await self._call(
                     self.apps_v1.patch_namespaced_deployment,
                     name=job_name,
                     namespace=namespace,
-                    body=deployment,
+                    body=body,
                 )
+                self._observe(deployment)
                 LOGGER.info(f"Successfully suspended Deployment '{job_name}'.")
                 return
 
@@ -526,18 +903,7 @@ class KubernetesCluster(ClusterABC):
 
     async def _build_job_info(self, deployment, service) -> JobInfo:
         """从 Deployment 和 Service 对象构建 JobInfo"""
-        annotations = deployment.metadata.annotations or {}
-        if (
-            annotations.get("yatcc-se/suspended") == "true"
-            or deployment.spec.replicas == 0
-        ):
-            status = JobInfo.Status.SUSPENDED
-        elif deployment.status.ready_replicas and deployment.status.ready_replicas >= 1:
-            status = JobInfo.Status.RUNNING
-        elif deployment.status.unavailable_replicas:
-            status = JobInfo.Status.FAILED
-        else:
-            status = JobInfo.Status.PENDING
+        status = self._deployment_status(deployment)
 
         service_url = "pending"
         if (
@@ -568,7 +934,7 @@ class KubernetesCluster(ClusterABC):
             name=deployment.metadata.name,
             image=container.image,
             ports=ports,
-            env={env_var.name: env_var.value for env_var in (container.env or [])},
+            env=_read_env(container),
             status=status,
             created_at=(
                 deployment.metadata.creation_timestamp.isoformat()
@@ -596,11 +962,13 @@ class KubernetesCluster(ClusterABC):
 
         # 删除 Deployment
         try:
-            await aio.to_thread(
+            await self._call(
                 self.apps_v1.delete_namespaced_deployment,
                 name=job_name,
                 namespace=namespace,
             )
+            if self._informer is not None:
+                self._informer.deployments.forget(job_name)
             LOGGER.info(f"Deleted Deployment: {job_name}")
         except ApiException as e:
             if e.status != 404:
@@ -608,11 +976,13 @@ class KubernetesCluster(ClusterABC):
 
         # 删除 Service
         try:
-            await aio.to_thread(
+            await self._call(
                 self.core_v1.delete_namespaced_service,
                 name=f"{job_name}-svc",
                 namespace=namespace,
             )
+            if self._informer is not None:
+                self._informer.services.forget(job_name)
             LOGGER.info(f"Deleted Service: {job_name}-svc")
         except ApiException as e:
             if e.status != 404:
@@ -628,7 +998,7 @@ class KubernetesCluster(ClusterABC):
         label_selector = ",".join(label_selectors)
 
         try:
-            deployments = await aio.to_thread(
+            deployments = await self._call(
                 self.apps_v1.list_namespaced_deployment,
                 namespace=CONFIG.CLUSTER.Kubernetes.NAMESPACE,
                 label_selector=label_selector,
@@ -639,16 +1009,7 @@ class KubernetesCluster(ClusterABC):
                 container = deployment.spec.template.spec.containers[0]
                 labels = deployment.metadata.labels or {}
 
-                # 确定状态
-                if (
-                    deployment.status.ready_replicas
-                    and deployment.status.ready_replicas >= 1
-                ):
-                    status = JobInfo.Status.RUNNING
-                elif deployment.status.unavailable_replicas:
-                    status = JobInfo.Status.FAILED
-                else:
-                    status = JobInfo.Status.PENDING
+                status = self._deployment_status(deployment)
 
                 user_id = labels.get("user-id")
                 if user_id is not None:
@@ -659,9 +1020,7 @@ class KubernetesCluster(ClusterABC):
                     name=deployment.metadata.name,
                     image=container.image,
                     ports=[CONFIG.CLUSTER.Codespace.PORT],
-                    env={
-                        env_var.name: env_var.value for env_var in (container.env or [])
-                    },
+                    env=_read_env(container),
                     status=status,
                     created_at=(
                         deployment.metadata.creation_timestamp.isoformat()
@@ -678,12 +1037,155 @@ class KubernetesCluster(ClusterABC):
         except ApiException as e:
             raise ClusterError(f"Failed to list jobs: {e}")
 
+    async def _pin_image(self, job_params: JobParams) -> JobParams:
+        """作业使用配置中的代码空间镜像且其摘要已预拉取到所有节点时，改为按摘要引用
+
+        摘要记录在预拉取 DaemonSet 的注解上，每个进程每分钟最多读取一次。
+        """
+        image = CONFIG.CLUSTER.Codespace.IMAGE
+        if job_params.image != image or not CONFIG.CLUSTER.Codespace.PREPULL:
+            return job_params
+
+        now = time.monotonic()
+        if now - self._pinned_checked >= 60:
+            try:
+                daemonset = await self._call(
+                    self.apps_v1.read_namespaced_daemon_set,
+                    name=_PREPULL_NAME,
+                    namespace=CONFIG.CLUSTER.Kubernetes.NAMESPACE,
+                )
+                annotations = daemonset.metadata.annotations or {}
+                self._pinned_image = (
+                    annotations.get(_PINNED_IMAGE_ANNOTATION)
+                    if annotations.get(_SOURCE_IMAGE_ANNOTATION) == image
+                    else None
+                )
+                self._pinned_checked = now
+            except ApiException as e:
+                if e.status == 404:
+                    self._pinned_image = None
+                    self._pinned_checked = now
+                else:
+                    LOGGER.warning(f"Failed to read pinned codespace image: {e}")
+
+        if self._pinned_image is None:
+            return job_params
+        return job_params.model_copy(update={"image": self._pinned_image})
+
+    async def _apply_prepull(self, image: str) -> None:
+        body = _build_prepull_daemonset(image)
+        try:
+            await self._call(
+                self.apps_v1.create_namespaced_daemon_set,
+                namespace=CONFIG.CLUSTER.Kubernetes.NAMESPACE,
+                body=body,
+            )
+        except ApiException as e:
+            if e.status != 409:
+                raise
+            await self._call(
+                self.apps_v1.patch_namespaced_daemon_set,
+                name=_PREPULL_NAME,
+                namespace=CONFIG.CLUSTER.Kubernetes.NAMESPACE,
+                body=body,
+            )
+
+    async def _wait_prepull(self, deadline: float) -> None:
+        """等待预拉取 DaemonSet 在所有节点上更新并就绪，即镜像已拉取到所有节点"""
+        while True:
+            daemonset = await self._call(
+                self.apps_v1.read_namespaced_daemon_set,
+                name=_PREPULL_NAME,
+                namespace=CONFIG.CLUSTER.Kubernetes.NAMESPACE,
+            )
+            status = daemonset.status
+            desired = status.desired_number_scheduled
+            if (
+                (status.observed_generation or 0) >= daemonset.metadata.generation
+                and (status.updated_number_scheduled or 0) == desired
+                and (status.number_ready or 0) == desired
+            ):
+                return
+            if time.monotonic() >= deadline:
+                raise ClusterError(
+                    f"Pre-pull timed out: {status.number_ready or 0}/{desired} nodes ready"
+                )
+            await aio.sleep(5)
+
+    async def _resolve_digest(self, image: str) -> str | None:
+        """从预拉取 Pod 的容器状态中读取镜像被解析到的摘要"""
+        pods = await self._call(
+            self.core_v1.list_namespaced_pod,
+            namespace=CONFIG.CLUSTER.Kubernetes.NAMESPACE,
+            label_selector=",".join(f"{k}={v}" for k, v in _PREPULL_LABELS.items()),
+        )
+        refs: Dict[str, int] = {}
+        for pod in pods.items:
+            for status in pod.status.container_statuses or []:
+                if status.image == image or status.image.endswith("/" + image):
+                    if ref := _digest_ref(image, status.image_id or ""):
+                        refs[ref] = refs.get(ref, 0) + 1
+        if len(refs) > 1:
+            # 标签在预拉取期间被推送了新镜像，取多数节点上的摘要，之后统一拉取
+            LOGGER.warning(f"Image {image} resolved to several digests: {refs}")
+        return max(refs, key=refs.__getitem__) if refs else None
+
+    async def rollout_image(self) -> str | None:
+        """把配置的代码空间镜像解析为摘要，预拉取到所有节点后切换新的代码空间使用它
+
+        先以标签预拉取并从容器状态中读取摘要，再以摘要预拉取，保证所有节点上都是同一
+        摘要，最后在 DaemonSet 上记录摘要，各进程据此改为按摘要、IfNotPresent 部署。
+        切换之前仍使用上一次的摘要。
+
+        :return: 按摘要引用的镜像，未启用预拉取或失败时返回 None
+        """
+        await self.ensure_initialized()
+        image = CONFIG.CLUSTER.Codespace.IMAGE
+        if not CONFIG.CLUSTER.Codespace.PREPULL:
+            return None
+
+        deadline = time.monotonic() + CONFIG.CLUSTER.Codespace.PREPULL_TIMEOUT
+        try:
+            pinned = image if "@sha256:" in image else None
+            if pinned is None:
+                LOGGER.info(f"Pre-pulling {image} to resolve its digest...")
+                await self._apply_prepull(image)
+                await self._wait_prepull(deadline)
+                pinned = await self._resolve_digest(image)
+                if pinned is None:
+                    LOGGER.warning(f"Could not resolve the digest of {image}")
+                    return None
+
+            LOGGER.info(f"Pre-pulling {pinned} to all nodes...")
+            await self._apply_prepull(pinned)
+            await self._wait_prepull(deadline)
+            await self._call(
+                self.apps_v1.patch_namespaced_daemon_set,
+                name=_PREPULL_NAME,
+                namespace=CONFIG.CLUSTER.Kubernetes.NAMESPACE,
+                body={
+                    "metadata": {
+                        "annotations": {
+                            _SOURCE_IMAGE_ANNOTATION: image,
+                            _PINNED_IMAGE_ANNOTATION: pinned,
+                        }
+                    }
+                },
+            )
+        except Exception as e:
+            LOGGER.error(f"Failed to roll out codespace image {image}: {e}")
+            return None
+
+        self._pinned_image, self._pinned_checked = pinned, time.monotonic()
+        LOGGER.info(f"Codespace image {image} pinned to {pinned}")
+        return pinned
+
     async def get_job_logs(self, job_name: str, lines: int = 100) -> str:
         """获取作业日志"""
         await self.ensure_initialized()
         try:
             # 获取关联的 Pod
-            pods = await aio.to_thread(
+            pods = await self._call(
                 self.core_v1.list_namespaced_pod,
                 namespace=CONFIG.CLUSTER.Kubernetes.NAMESPACE,
                 label_selector=f"app={job_name}",
@@ -694,7 +1196,7 @@ class KubernetesCluster(ClusterABC):
 
             # 获取第一个 Pod 的日志
             pod = pods.items[0]
-            logs = await aio.to_thread(
+            logs = await self._call(
                 self.core_v1.read_namespaced_pod_log,
                 name=pod.metadata.name,
                 namespace=CONFIG.CLUSTER.Kubernetes.NAMESPACE,
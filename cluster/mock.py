@@ -7,7 +7,7 @@ import asyncio as aio
 import uuid
 import logging
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, Iterable, List
 
 from base import guard_ainit
 
@@ -120,6 +120,23 @@ class MockCluster(ClusterABC):
 
         return self._jobs[job_id].status
 
+    async def get_ready_time(self, job_id: str) -> float | None:
+        """模拟作业进入运行状态的时间"""
+        job = self._jobs.get(job_id)
+        if job is None or job.status != JobInfo.Status.RUNNING or not job.updated_at:
+            return None
+        return datetime.fromisoformat(job.updated_at).timestamp()
+
+    async def get_job_statuses(
+        self, job_names: Iterable[str]
+    ) -> Dict[str, JobInfo.Status]:
+        """批量获取模拟作业状态"""
+        await self.ensure_initialized()
+
+        return {
+            name: self._jobs[name].status for name in job_names if name in self._jobs
+        }
+
     async def get_job_info(self, job_id: str) -> JobInfo:
         """获取模拟作业信息"""
         await self.ensure_initialized()
@@ -127,7 +144,13 @@ class MockCluster(ClusterABC):
         if job_id not in self._jobs:
             raise JobNotFoundError(f"Job not found: {job_id}")
 
-        return self._jobs[job_id].copy(deep=True)
+        job_info = self._jobs[job_id].copy(deep=True)
+        job_info.phase = {
+            JobInfo.Status.PENDING: JobInfo.Phase.BOOTING,
+            JobInfo.Status.RUNNING: JobInfo.Phase.READY,
+            JobInfo.Status.FAILED: JobInfo.Phase.FAILING,
+        }.get(job_info.status)
+        return job_info
 
     async def get_service_url(self, job_id: str) -> str:
         """获取模拟作业的服务访问地址"""
@@ -11,6 +11,7 @@ from base.logger import logger
 from base.progress import PROGRESS
 
 from . import CONFIG
+from .mole import Mole
 
 LOGGER = logger(__spec__, __file__)
 
@@ -18,6 +19,7 @@ SSH_SERVER: aio.subprocess.Process | None
 CODE_SERVER: aio.subprocess.Process
 CENTRAL_CONTROL: str | None
 STUDENT_API_KEY: str | None
+NODE_IP: str | None
 HTTP_PROXY: str | None
 KEEPALIVE_INTERVAL: float
 
@@ -31,12 +33,12 @@ async def start() -> None:
 
     ######
     with PROGRESS["初始化环境变量", LOGGER]:
-        # global CENTRAL_CONTROL
-        # ek = "CENTRAL_CONTROL"
-        # PROGRESS(ek + " ... ")
-        # CENTRAL_CONTROL = os.getenv(ek)
-        # PROGRESS(f"{CENTRAL_CONTROL=}", logger=LOGGER)
-        # PROGRESS("NOT SET" if CENTRAL_CONTROL is None else "OK")
+        global CENTRAL_CONTROL
+        ek = "CENTRAL_CONTROL"
+        PROGRESS(ek + " ... ")
+        CENTRAL_CONTROL = os.getenv(ek) or None
+        PROGRESS(f"{CENTRAL_CONTROL=}", logger=LOGGER)
+        PROGRESS("NOT SET" if CENTRAL_CONTROL is None else "OK")
 
         ######
         global STUDENT_API_KEY
@@ -46,6 +48,14 @@ async def start() -> None:
         PROGRESS(f"{STUDENT_API_KEY=}", logger=LOGGER)
         PROGRESS("NOT SET" if STUDENT_API_KEY is None else "OK")
 
+        ######
+        global NODE_IP
+        ek = "NODE_IP"
+        PROGRESS(ek + " ... ")
+        NODE_IP = os.getenv(ek) or None
+        PROGRESS(f"{NODE_IP=}", logger=LOGGER)
+        PROGRESS("NOT SET" if NODE_IP is None else "OK")
+
         #####
         # global HTTP_PROXY
         # ek = "HTTP_PROXY"
@@ -55,21 +65,21 @@ async def start() -> None:
         # PROGRESS("NOT SET" if HTTP_PROXY is None else "OK")
 
         ######
-        # global KEEPALIVE_INTERVAL
-        # ek = "YatCC_KEEPALIVE_INTERVAL"
-        # PROGRESS(ek + " ... ")
-        # if (x := os.getenv(ek)) is None:
-        #     KEEPALIVE_INTERVAL = float(60 * 5)
-        #     PROGRESS(f"NOT SET -> {KEEPALIVE_INTERVAL}")
-        # else:
-        #     try:
-        #         KEEPALIVE_INTERVAL = float(x)
-        #         PROGRESS(f"{x!r} -> {KEEPALIVE_INTERVAL}")
-        #     except ValueError:
-        #         PROGRESS("KEEPALIVE_INTERVAL 环境变量不是数值", logger=LOGGER)
-        #         PROGRESS("NOT A NUMBER")
-        #         return
-        # PROGRESS(f"{KEEPALIVE_INTERVAL=} ({x!r})", logger=LOGGER)
+        global KEEPALIVE_INTERVAL
+        ek = "YatCC_KEEPALIVE_INTERVAL"
+        PROGRESS(ek + " ... ")
+        if (x := os.getenv(ek)) is None:
+            KEEPALIVE_INTERVAL = float(60 * 5)
+            PROGRESS(f"NOT SET -> {KEEPALIVE_INTERVAL}")
+        else:
+            try:
+                KEEPALIVE_INTERVAL = float(x)
+                PROGRESS(f"{x!r} -> {KEEPALIVE_INTERVAL}")
+            except ValueError:
+                PROGRESS("KEEPALIVE_INTERVAL 环境变量不是数值", logger=LOGGER)
+                PROGRESS("NOT A NUMBER")
+                return
+        PROGRESS(f"{KEEPALIVE_INTERVAL=} ({x!r})", logger=LOGGER)
 
     ######
     global SSH_SERVER
@@ -156,12 +166,17 @@ async def run():
 
     global CENTRAL_CONTROL
     global STUDENT_API_KEY
-    global HTTP_PROXY
     global KEEPALIVE_INTERVAL
+    global NODE_IP
     global CODE_SERVER
-    if CENTRAL_CONTROL is None:
+    if CENTRAL_CONTROL is None or STUDENT_API_KEY is None:
         PROGRESS("自动保活已禁用", logger=LOGGER)
-        return
+    else:
+        # kubelet 探针从节点地址连接 code-server，不计为用户活动
+        ignore = () if NODE_IP is None else (NODE_IP,)
+        mole = Mole(CENTRAL_CONTROL, STUDENT_API_KEY, KEEPALIVE_INTERVAL, ignore=ignore)
+        aio.create_task(mole.run(), name="mole")
+        PROGRESS(f"监控鼹鼠已启动，心跳间隔 {KEEPALIVE_INTERVAL} 秒", logger=LOGGER)
 
     while True:
         await aio.sleep(KEEPALIVE_INTERVAL)
@@ -174,24 +189,6 @@ async def run():
             entry.terminate(CODE_SERVER.returncode)
             break
 
-        # PROGRESS("运行监控鼹鼠进行保活")
-        # with open(CONFIG.log_dir + "mole.out", "ab") as out, open(
-        #     CONFIG.log_dir + "mole.err", "ab"
-        # ) as err:
-        #     mole_proc = await aio.create_subprocess_exec(
-        #         sys.executable,
-        #         *["-m", "yatcc_cs.mole"],
-        #         *["--central-control", CENTRAL_CONTROL],
-        #         *["--student-api-key", STUDENT_API_KEY],
-        #         *["--http-proxy", HTTP_PROXY],
-        #         cwd=CONFIG.app_dir,
-        #         stdin=aio.subprocess.DEVNULL,
-        #         stdout=out,
-        #         stderr=err,
-        #     )
-        # if mole_proc.returncode != 0:
-        #     PROGRESS(f"监控鼹鼠异常退出，退出码 {mole_proc.returncode}", logger=LOGGER)
-
 
 # ==================================================================================== #
 from textwrap import dedent
@@ -0,0 +1,197 @@
+"""监控鼹鼠：检测代码空间中的用户活动，向学生服务上报心跳
+
+活动来自三个方面：code-server 上的连接（浏览器打开编辑器时保持 websocket 连接）、SSH
+会话和 /code 下最近的文件写入。kubelet 的探针从节点地址访问同一端口，来自节点的连接不
+计为活动。鼹鼠定期采样活动，两次上报之间的活动合并为一次心跳，
+没有活动时不上报，让中心服务据此判断代码空间空闲。上报间隔不小于 interval，首次上报
+随机延迟以错开大量同时启动的容器，失败时指数退避并遵守 Retry-After。所有心跳复用同一个
+HTTP 持久连接。
+
+只依赖标准库和 base，不依赖中心服务的其它模块。
+"""
+
+import asyncio as aio
+import http.client
+import ipaddress
+import os
+import random
+import sys
+import time
+from urllib.parse import urlsplit
+
+from base.logger import logger
+
+LOGGER = logger(__spec__, __file__)
+
+_TCP_ESTABLISHED = "01"
+_SKIP_DIRS = frozenset({"node_modules", "__pycache__"})
+
+
+def _parse_address(field: str) -> ipaddress.IPv4Address | ipaddress.IPv6Address:
+    """解析 /proc/net/tcp 中的 地址:端口，IPv4 映射的 IPv6 地址转换为 IPv4 地址"""
+
+    raw = bytes.fromhex(field.split(":")[0])
+    if sys.byteorder == "little":
+        # 地址按主机字节序的 32 位字存储
+        raw = b"".join(raw[i : i + 4][::-1] for i in range(0, len(raw), 4))
+    addr = ipaddress.ip_address(raw)
+    if isinstance(addr, ipaddress.IPv6Address) and addr.ipv4_mapped is not None:
+        return addr.ipv4_mapped
+    return addr
+
+
+def count_connections(
+    ports: set[int],
+    ignore: frozenset[str] = frozenset(),
+    tables=("/proc/net/tcp", "/proc/net/tcp6"),
+) -> int:
+    """统计本地端口属于 ports 的已建立 TCP 连接数，不计对端地址属于 ignore 的连接"""
+
+    ignored = {ipaddress.ip_address(host) for host in ignore}
+    count = 0
+    for table in tables:
+        try:
+            with open(table) as f:
+                next(f)  # 表头
+                for line in f:
+                    fields = line.split()
+                    local, remote, state = fields[1], fields[2], fields[3]
+                    if state != _TCP_ESTABLISHED or int(local[-4:], 16) not in ports:
+                        continue
+                    if ignored and _parse_address(remote) in ignored:
+                        continue
+                    count += 1
+        except (OSError, StopIteration, IndexError, ValueError):
+            continue
+    return count
+
+
+def written_since(root: str, since: float, limit: int = 20000) -> bool:
+    """root 下是否有在 since 之后修改的文件或目录
+
+    创建、删除和重命名文件会更新所在目录的修改时间，因此也能被发现。跳过隐藏目录和依赖
+    目录，最多检查 limit 个条目，找到一个即返回。
+    """
+
+    stack = [root]
+    checked = 0
+    while stack and checked < limit:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    checked += 1
+                    try:
+                        if entry.stat(follow_symlinks=False).st_mtime > since:
+                            return True
+                        if entry.is_dir(follow_symlinks=False) and not (
+                            entry.name.startswith(".") or entry.name in _SKIP_DIRS
+                        ):
+                            stack.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return False
+
+
+class Mole:
+    """活动监控和心跳上报
+
+    :param central_control: 学生服务地址，如 http://yatcc-se:5002
+    :param api_key: 学生的 API-KEY
+    :param interval: 两次心跳的最短间隔（秒）
+    :param code_dir: 检测文件写入的目录
+    :param ports: 用户连接的本地端口，默认为 code-server 和 SSH
+    :param ignore: 不计为用户连接的对端地址，即 kubelet 探针来自的节点地址
+    """
+
+    def __init__(
+        self,
+        central_control: str,
+        api_key: str,
+        interval: float,
+        code_dir: str = "/code",
+        ports: tuple[int, ...] = (443, 22),
+        ignore: tuple[str, ...] = (),
+    ):
+        url = urlsplit(central_control)
+        self.scheme = url.scheme or "http"
+        self.netloc = url.netloc
+        self.path = url.path.rstrip("/") + "/codespace/keepalive"
+        self.api_key = api_key
+        self.interval = interval
+        self.code_dir = code_dir
+        self.ports = set(ports)
+        self.ignore = frozenset(ignore)
+        self.sent = 0
+        self.failed = 0
+        self._conn: http.client.HTTPConnection | None = None
+        self._last_sample = time.time()
+
+    def detect(self) -> bool:
+        """自上次采样以来是否有用户活动"""
+
+        now = time.time()
+        since, self._last_sample = self._last_sample, now
+        if count_connections(self.ports, self.ignore) > 0:
+            return True
+        return written_since(self.code_dir, since)
+
+    def post(self) -> tuple[int, float]:
+        """上报一次心跳，返回状态码（连接失败时为 0）和服务端要求的重试等待时间"""
+
+        if self._conn is None:
+            cls = (
+                http.client.HTTPSConnection
+                if self.scheme == "https"
+                else http.client.HTTPConnection
+            )
+            self._conn = cls(self.netloc, timeout=10)
+        try:
+            self._conn.request("POST", self.path, headers={"X-API-KEY": self.api_key})
+            res = self._conn.getresponse()
+            res.read()
+        except (OSError, http.client.HTTPException) as e:
+            # 连接被服务端关闭或网络错误，下次重新建立连接
+            LOGGER.warning(f"上报心跳失败: {e}")
+            self._conn.close()
+            self._conn = None
+            return 0, 0.0
+        try:
+            retry_after = float(res.getheader("Retry-After") or 0)
+        except ValueError:
+            retry_after = 0.0
+        return res.status, retry_after
+
+    async def run(self) -> None:
+        """持续采样活动并上报合并后的心跳"""
+
+        sample = min(self.interval / 4, 15.0)
+        pending = False
+        failures = 0
+        # 错开同时启动的大量容器的心跳
+        next_send = time.monotonic() + random.uniform(0, self.interval)
+        while True:
+            try:
+                if await aio.to_thread(self.detect):
+                    pending = True
+            except Exception as e:
+                LOGGER.error(f"检测活动失败: {e}")
+
+            now = time.monotonic()
+            if pending and now >= next_send:
+                status, retry_after = await aio.to_thread(self.post)
+                if status in (200, 202):
+                    # 202 表示代码空间不在运行，同样视为已上报
+                    self.sent += 1
+                    pending, failures = False, 0
+                    next_send = now + self.interval
+                else:
+                    if status:
+                        LOGGER.warning(f"上报心跳被拒绝，状态码 {status}")
+                    self.failed += 1
+                    failures += 1
+                    backoff = min(self.interval * 2 ** min(failures, 4), 600.0)
+                    next_send = now + max(backoff * random.uniform(0.5, 1), retry_after)
+
+            await aio.sleep(sample)
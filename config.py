@@ -83,6 +83,72 @@ class Core(Configuration):
     default_admin_api_key = "SE!@2025"
     """默认的管理员 API-KEY"""
 
+    read_batch_size = 500
+    """批量读取学生记录时每个 Redis 管道中的记录数"""
+
+    student_cache_size = 4096
+    """每个进程中学生记录读缓存的最大条目数，0 表示禁用"""
+    student_cache_ttl = 30.0
+    """学生记录读缓存条目的存活时间（秒），跨进程失效通知丢失时的兜底"""
+
+    account_cache_size = 4096
+    """每个进程中 API-KEY 验证缓存的最大条目数，0 表示禁用"""
+    account_cache_ttl = 300.0
+    """账户是否有效的缓存存活时间（秒），跨进程失效通知丢失时的兜底"""
+
+    provision_hash_concurrency = 8
+    """批量创建学生时同时计算的密码哈希数，实际还受 password_slots 限制"""
+    provision_fs_concurrency = 16
+    """批量创建学生时同时创建学生目录的数量"""
+    provision_cluster_concurrency = 8
+    """批量创建学生时同时分配集群资源的数量"""
+    provision_db_concurrency = 32
+    """批量创建学生时同时写入数据库的数量"""
+
+    password_workers = 2
+    """每个进程中计算密码哈希的进程池大小"""
+    password_slots: int | None = None
+    """所有进程中同时进行的密码哈希计算的上限，None 表示 svc_stu_workers 的一半（至少为 1）"""
+    password_queue_limit: int | None = None
+    """所有进程中等待计算槽位的请求数上限，超出时请求被立即拒绝，None 表示
+    svc_stu_workers - password_slots - 1，使洪峰期间至少有一个学生服务工作进程空闲"""
+    password_queue_timeout = 1.0
+    """请求等待计算槽位的最长时间（秒），超时后被拒绝"""
+    password_queue_poll = 0.01
+    """等待计算槽位时检查槽位的间隔（秒）"""
+
+    job_concurrency = 2
+    """entry 进程中同时执行的后台任务数"""
+    job_ttl = 7 * 24 * 3600
+    """后台任务结束后，其状态和结果的保留时间（秒）"""
+
+    codespace_batch_concurrency = 16
+    """批量启动或停止代码空间时同时处理的学生数"""
+
+    fs_workers = 8
+    """每个进程中执行学生目录等文件系统操作的线程数"""
+
+    job_status_share_ttl = 1.0
+    """集群作业状态查询结果在进程间共享的时间（秒），0 表示只在进程内合并并发查询；
+    集群从 informer 缓存读取作业状态时不共享"""
+    job_status_share_wait = 5.0
+    """等待其它进程完成同一作业状态查询的最长时间（秒），超时后自行查询"""
+
+    quota_schedule_max_wait = 60.0
+    """配额调度器两次检查之间的最长等待时间（秒），截止时间提前时调度器会被立即唤醒，
+    这只是唤醒丢失时的兜底"""
+
+    codespace_idle_timeout = 30 * 60
+    """代码空间无活动多久后被自动停止（秒），0 表示不自动停止。活动来自代码空间中监控鼹鼠
+    的心跳，因此未配置 CLUSTER.Codespace.CENTRAL_CONTROL 时同样不自动停止"""
+    codespace_reap_batch_size = 100
+    """回收空闲的代码空间时每批停止的数量"""
+    codespace_reap_retry_interval = 60.0
+    """停止空闲的代码空间失败后，等待多久再重试（秒）"""
+    codespace_starting_interval = 5.0
+    """核对启动中的代码空间是否已就绪的间隔（秒），0 表示只在查询状态和定期监控时核对。
+    计费从 Pod 就绪的时间开始，不受这个间隔影响"""
+
 
 CONFIG.CORE = Core
 
@@ -101,6 +167,9 @@ class SvcAdm(Configuration):
     static_dir = str(PROJECT_DIR / "adm-site/dist")
     """前端静态站点目录路径"""
 
+    student_page_size = 100
+    """学生列表每页的默认记录数"""
+
 
 CONFIG.SVC_ADM = SvcAdm
 
@@ -142,6 +211,17 @@ class ClusterConfig(Configuration):
         NAMESPACE = "default"
         KUBECONFIG_PATH = None
         TIMEOUT = 30
+        """单次 Kubernetes API 调用的超时（秒）"""
+        API_QPS = 20
+        """每个进程调用 Kubernetes API 的平均速率（次/秒），0 表示不限速"""
+        API_BURST = 40
+        """每个进程调用 Kubernetes API 允许的突发次数"""
+        API_WORKERS = 16
+        """每个进程中调用 Kubernetes API 的线程数，也是 HTTP 连接池的大小"""
+        INFORMER = True
+        """通过 list+watch 在本地缓存 Deployment、Service 和 Pod，状态查询不访问 API Server"""
+        WATCH_TIMEOUT = 300
+        """单次 watch 请求的超时（秒），超时后从最后的 resourceVersion 继续"""
 
     class Codespace(Configuration):
         """codespace 配置"""
@@ -151,6 +231,30 @@ class ClusterConfig(Configuration):
         DEFAULT_CPU_LIMIT = "500m"
         DEFAULT_MEMORY_LIMIT = "1Gi"
         DEFAULT_STORAGE_SIZE = "5Gi"
+        CENTRAL_CONTROL: str | None = None
+        """代码空间中的监控鼹鼠上报心跳的学生服务地址，如 http://yatcc-se:5002，None 表示禁用"""
+        KEEPALIVE_INTERVAL = 60
+        """监控鼹鼠上报心跳的最短间隔（秒），应远小于 CORE.codespace_idle_timeout"""
+        PREPULL = True
+        """启动时把 IMAGE 解析为摘要，用 DaemonSet 预拉取到所有节点后按摘要部署，
+        否则每次启动代码空间都以 Always 策略拉取 IMAGE"""
+        PREPULL_TIMEOUT = 1800
+        """等待镜像预拉取到所有节点的最长时间（秒）"""
+        PROBE_PATH = "/healthz"
+        """启动和就绪探针以 HTTP GET 访问的 code-server 路径，该路径不需要登录"""
+        PROBE_PORT = 443
+        """启动和就绪探针访问的容器端口，即 code-server 监听的端口"""
+        STARTUP_PROBE_PERIOD = 2
+        """启动探针的间隔（秒）"""
+        STARTUP_PROBE_TIMEOUT = 300
+        """容器启动后 code-server 开始监听的最长时间（秒），超过后容器被重启"""
+        READINESS_PROBE_PERIOD = 10
+        """就绪探针的间隔（秒）"""
+        READINESS_PROBE_FAILURES = 3
+        """就绪探针连续失败多少次后 Pod 不再就绪，代码空间回到 starting"""
+        START_TIMEOUT = 600
+        """从启动代码空间到 Pod 就绪的最长时间（秒），包括调度和拉取镜像，超过后代码空间
+        被报告为 failed"""
         PORT = [
             {
                 "port": 80,
@@ -9,11 +9,13 @@
 
 import asyncio as aio
 import os
+from typing import Callable
 
 import redis.asyncio
 import redis.asyncio.client
 
 from base import guard_ainit
+from base.fs import AsyncFS
 from base.logger import logger
 
 import cluster
@@ -25,18 +27,22 @@ LOGGER = logger(__spec__, __file__)
 DB0: redis.asyncio.Redis
 DB_STU: redis.asyncio.Redis
 
+# 文件系统操作
+FS: AsyncFS
+
 
 @guard_ainit(LOGGER)
 async def ainit(
     *,
     cluster_mock=False,
 ) -> None:
-    global DB0, DB_STU, CLUSTER
+    global DB0, DB_STU, FS, CLUSTER
 
     from config import CONFIG
 
     DB0 = redis.asyncio.Redis(**CONFIG.CORE.redis_init, db=0)
     DB_STU = redis.asyncio.Redis(**CONFIG.CORE.redis_init, db=1)
+    FS = AsyncFS(CONFIG.CORE.fs_workers)
 
     os.makedirs(CONFIG.CORE.students_dir, mode=0o777, exist_ok=True)
     os.makedirs(CONFIG.CORE.archive_students_dir, mode=0o777, exist_ok=True)
@@ -52,6 +58,74 @@ async def ready() -> bool:
         return False
 
 
+class NOTIFY:
+    """跨进程通知，基于 Redis 发布订阅，用于使各工作进程的进程内缓存失效
+
+    工作进程的事件循环只在处理请求时运行，因此不在后台接收消息，而是在访问缓存前调用
+    drain 处理已到达的消息。订阅连接断开重连期间消息可能丢失，此时以 None 调用所有处理
+    函数，由其清空缓存。
+    """
+
+    _pubsub: redis.asyncio.client.PubSub | None = None
+    _subscribed: set[str] = set()
+    _handlers: dict[str, list[Callable[[bytes | None], None]]] = {}
+    _lost = False
+    _draining = False
+
+    @classmethod
+    def listen(cls, channel: str, handler: Callable[[bytes | None], None]) -> None:
+        """注册频道的消息处理函数，在下一次 drain 时订阅"""
+        cls._handlers.setdefault(channel, []).append(handler)
+
+    @classmethod
+    async def drain(cls) -> None:
+        """处理所有已到达的消息，不会等待
+
+        订阅连接不能被并发读取，已有协程在处理时直接返回。
+        """
+        if cls._draining:
+            return
+        cls._draining = True
+        try:
+            await cls._drain()
+        finally:
+            cls._draining = False
+
+    @classmethod
+    async def _drain(cls) -> None:
+        try:
+            if cls._pubsub is None:
+                cls._pubsub = DB0.pubsub()
+            if missing := cls._handlers.keys() - cls._subscribed:
+                await cls._pubsub.subscribe(*missing)
+                cls._subscribed |= missing
+                cls._pubsub.connection.register_connect_callback(cls._on_reconnect)
+            while msg := await cls._pubsub.get_message(timeout=0):
+                if msg["type"] == "message":
+                    for handler in cls._handlers.get(msg["channel"].decode(), ()):
+                        handler(msg["data"])
+        except redis.RedisError as e:
+            LOGGER.warning(f"通知订阅连接异常: {e}")
+            pubsub, cls._pubsub = cls._pubsub, None
+            cls._subscribed = set()
+            cls._lost = True
+            try:
+                if pubsub is not None:
+                    await pubsub.aclose()
+            except redis.RedisError:
+                pass
+
+        if cls._lost:
+            cls._lost = False
+            for handlers in cls._handlers.values():
+                for handler in handlers:
+                    handler(None)
+
+    @classmethod
+    def _on_reconnect(cls, _conn) -> None:
+        cls._lost = True
+
+
 # ==================================================================================== #
 
 
@@ -1,22 +1,49 @@
+import hmac
+
 from base.logger import logger
 from config import CONFIG
-from . import OversizeError
+from . import NOTIFY, OversizeError
 
 LOGGER = logger(__spec__, __file__)
 
+_API_KEY_CHANNEL = "admin-api-key"
+"""管理员 API-KEY 变更通知的发布订阅频道"""
+
 
 class API_KEY:
 
+    _cached: str | None = None
+    _listening = False
+
+    @classmethod
+    def _on_notify(cls, _msg: bytes | None) -> None:
+        cls._cached = None
+
     @classmethod
     async def get(cls) -> str:
+        """获取管理员 API-KEY，值缓存在进程内，由 set 发布的通知刷新"""
         from . import DB0
 
+        if not cls._listening:
+            NOTIFY.listen(_API_KEY_CHANNEL, cls._on_notify)
+            cls._listening = True
+        await NOTIFY.drain()
+        if cls._cached is not None:
+            return cls._cached
+
         ret = await DB0.get("admin-api-key")
         if ret is None:
             LOGGER.debug("管理员 API-KEY 未设置，使用默认值")
-            return CONFIG.CORE.default_admin_api_key
-        assert type(ret) is bytes
-        return ret.decode()
+            cls._cached = CONFIG.CORE.default_admin_api_key
+        else:
+            assert type(ret) is bytes
+            cls._cached = ret.decode()
+        return cls._cached
+
+    @classmethod
+    async def check(cls, api_key: str) -> bool:
+        """以常数时间比较管理员 API-KEY"""
+        return hmac.compare_digest(api_key.encode(), (await cls.get()).encode())
 
     @classmethod
     async def set(cls, api_key: str) -> None:
@@ -25,5 +52,9 @@ class API_KEY:
         enc = api_key.encode()
         if len(enc) > 32:
             raise OversizeError(api_key, 32, "管理员 API-KEY 过长")
-        ok = await DB0.set("admin-api-key", enc)
+        pipe = DB0.pipeline(transaction=True)
+        pipe.set("admin-api-key", enc)
+        pipe.publish(_API_KEY_CHANNEL, b"")
+        ok, _ = await pipe.execute()
         assert ok is True
+        cls._cached = None
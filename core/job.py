@@ -0,0 +1,372 @@
+"""后台任务队列
+
+管理员的批量操作可以提交为后台任务，由 entry 进程中的 JOB.serve 执行，不受 HTTP 超时限制，
+也不占用 Web 服务的工作进程。任务状态、进度和逐项结果保存在 Redis 中。
+"""
+
+import asyncio as aio
+import json
+import time
+from datetime import datetime
+from enum import Enum
+from typing import Any, Awaitable, Callable
+from uuid import uuid4
+
+from base.logger import logger
+from base.progress import Progress
+
+from . import Error
+
+LOGGER = logger(__spec__, __file__)
+
+_QUEUE_KEY = "job-queue"
+"""等待执行的任务ID列表"""
+_RUNNING_KEY = "job-running"
+"""正在执行的任务ID列表，entry 进程重启时其中的任务被标记为失败"""
+
+
+def _job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def _params_key(job_id: str) -> str:
+    return f"job:{job_id}:params"
+
+
+def _results_key(job_id: str) -> str:
+    return f"job:{job_id}:results"
+
+
+class JobState(str, Enum):
+    """任务状态枚举"""
+
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class JobNotFoundError(Error):
+    """任务未找到"""
+
+    def __init__(self, job_id: str, *args):
+        self.job_id = job_id
+        super().__init__(*args)
+
+    def __str__(self) -> str:
+        return f"Job {self.job_id!r} not found: {super().__str__()}"
+
+
+# ==================================================================================== #
+
+
+class BatchProgress(Progress):
+    """批量操作的进度监视器，记录总量、已完成数量和逐项结果"""
+
+    def __init__(self):
+        super().__init__()
+        self.message = ""
+        self.total_num = -1
+        self.done = 0
+        self.success: list[str] = []
+        self.failed: list[dict[str, str]] = []
+        self._started = time.monotonic()
+
+    def elapsed(self) -> float:
+        """从创建到现在经过的时间（秒）"""
+        return time.monotonic() - self._started
+
+    def desc(self, msg: Any = None) -> None:
+        self.message = "" if msg is None else str(msg)
+
+    def total(self, num=None, msg: Any | None = None) -> None:
+        self.total_num = num if isinstance(num, int) else -1
+        if msg is not None:
+            self.desc(msg)
+
+    def step(self, rel: int, msg: Any | None = None) -> None:
+        self.done += rel
+        if msg is not None:
+            self.desc(msg)
+
+    def jump(self, abs: int, msg: Any | None = None) -> None:
+        self.done = abs
+        if msg is not None:
+            self.desc(msg)
+
+    def succeed(self, item: str) -> None:
+        """记录一项操作成功，并推进进度"""
+        self.success.append(item)
+        self.step(1)
+
+    def fail(self, item: str, reason: str) -> None:
+        """记录一项操作失败，并推进进度"""
+        self.failed.append({"id": item, "reason": reason})
+        self.step(1)
+
+    def report(self) -> dict:
+        """与同步批量接口相同格式的结果，elapsed 为总耗时（秒）"""
+        return {
+            "success": self.success,
+            "failed": self.failed,
+            "elapsed": round(self.elapsed(), 3),
+        }
+
+
+class JobProgress(BatchProgress):
+    """把进度和逐项结果写入任务记录的进度监视器，写入在后台合并进行"""
+
+    def __init__(self, job_id: str):
+        super().__init__()
+        self.job_id = job_id
+        self._fields: dict[str, str | int] = {}
+        self._results: list[str] = []
+        self._task: aio.Task | None = None
+
+    def desc(self, msg: Any = None) -> None:
+        super().desc(msg)
+        self._fields["message"] = self.message
+        self._schedule()
+
+    def total(self, num=None, msg: Any | None = None) -> None:
+        super().total(num, msg)
+        self._fields["total"] = self.total_num
+        self._schedule()
+
+    def step(self, rel: int, msg: Any | None = None) -> None:
+        super().step(rel, msg)
+        self._fields["done"] = self.done
+        self._schedule()
+
+    def jump(self, abs: int, msg: Any | None = None) -> None:
+        super().jump(abs, msg)
+        self._fields["done"] = self.done
+        self._schedule()
+
+    def succeed(self, item: str) -> None:
+        self._results.append(json.dumps({"id": item, "ok": True}))
+        super().succeed(item)
+
+    def fail(self, item: str, reason: str) -> None:
+        self._results.append(json.dumps({"id": item, "ok": False, "reason": reason}))
+        super().fail(item, reason)
+
+    def _schedule(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = aio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self) -> None:
+        from . import DB0
+
+        while self._fields or self._results:
+            fields, self._fields = self._fields, {}
+            results, self._results = self._results, []
+            pipe = DB0.pipeline(transaction=True)
+            if fields:
+                pipe.hset(_job_key(self.job_id), mapping=fields)
+            if results:
+                pipe.rpush(_results_key(self.job_id), *results)
+            await pipe.execute()
+
+    async def close(self) -> None:
+        """等待所有进度写入完成"""
+        if self._task is not None:
+            await self._task
+        await self._flush()
+
+
+# ==================================================================================== #
+
+
+class JOB:
+
+    _HANDLERS: dict[str, Callable[..., Awaitable[None]]] = {}
+
+    @classmethod
+    def register(cls, kind: str, handler: Callable[..., Awaitable[None]]) -> None:
+        """注册任务处理函数，以 handler(progress=JobProgress, **params) 的形式调用"""
+        cls._HANDLERS[kind] = handler
+
+    @classmethod
+    def handler(cls, kind: str) -> Callable[..., Awaitable[None]]:
+        """获取任务处理函数，可用于在当前请求中同步执行同样的操作"""
+        return cls._HANDLERS[kind]
+
+    @classmethod
+    async def submit(cls, kind: str, params: dict) -> str:
+        """提交后台任务，立即返回任务ID
+
+        参数单独保存，任务开始执行时即被删除，避免密码等敏感数据长期留存。
+        """
+        from . import DB0
+
+        if kind not in cls._HANDLERS:
+            raise ValueError(f"unknown job kind: {kind!r}")
+
+        job_id = uuid4().hex
+        pipe = DB0.pipeline(transaction=True)
+        pipe.hset(
+            _job_key(job_id),
+            mapping={
+                "kind": kind,
+                "state": JobState.PENDING.value,
+                "created": datetime.now().timestamp(),
+                "total": -1,
+                "done": 0,
+            },
+        )
+        pipe.set(_params_key(job_id), json.dumps(params))
+        pipe.lpush(_QUEUE_KEY, job_id)
+        await pipe.execute()
+        LOGGER.info(f"提交后台任务: {job_id}, 类型: {kind}")
+        return job_id
+
+    @classmethod
+    async def get(cls, job_id: str) -> dict:
+        """获取任务的状态、进度和逐项结果"""
+        from . import DB0
+
+        pipe = DB0.pipeline(transaction=False)
+        pipe.hgetall(_job_key(job_id))
+        pipe.lrange(_results_key(job_id), 0, -1)
+        record, results = await pipe.execute()
+        if not record:
+            raise JobNotFoundError(job_id)
+
+        record = {k.decode(): v.decode() for k, v in record.items()}
+        started = float(record.get("started", 0))
+        finished = float(record.get("finished", 0))
+        success, failed = [], []
+        for item in map(json.loads, results):
+            if item["ok"]:
+                success.append(item["id"])
+            else:
+                failed.append({"id": item["id"], "reason": item["reason"]})
+        return {
+            "id": job_id,
+            "kind": record["kind"],
+            "state": record["state"],
+            "message": record.get("message", ""),
+            "error": record.get("error", ""),
+            "total": int(record["total"]),
+            "done": int(record["done"]),
+            "created": float(record["created"]),
+            "started": started,
+            "finished": finished,
+            "elapsed": round(finished - started, 3) if finished else 0.0,
+            "success": success,
+            "failed": failed,
+        }
+
+    @classmethod
+    async def run_once(cls, timeout: float | None = None) -> bool:
+        """取出并执行一个任务
+
+        :param timeout: 等待任务的时间（秒），None 表示不等待
+        :return: 是否执行了任务
+        """
+        from . import DB0
+
+        if timeout is None:
+            job_id = await DB0.lmove(_QUEUE_KEY, _RUNNING_KEY, "RIGHT", "LEFT")
+        else:
+            job_id = await DB0.blmove(
+                _QUEUE_KEY, _RUNNING_KEY, timeout, "RIGHT", "LEFT"
+            )
+        if job_id is None:
+            return False
+        await cls._run(job_id.decode())
+        return True
+
+    @classmethod
+    async def _run(cls, job_id: str) -> None:
+        from . import DB0
+
+        from config import CONFIG
+
+        progress = JobProgress(job_id)
+        pipe = DB0.pipeline(transaction=True)
+        pipe.hget(_job_key(job_id), "kind")
+        pipe.getdel(_params_key(job_id))
+        pipe.hset(
+            _job_key(job_id),
+            mapping={
+                "state": JobState.RUNNING.value,
+                "started": datetime.now().timestamp(),
+            },
+        )
+        kind, params, _ = await pipe.execute()
+
+        fields: dict[str, str | float] = {}
+        try:
+            try:
+                handler = cls._HANDLERS[kind.decode()]
+                LOGGER.info(f"开始执行后台任务: {job_id}, 类型: {kind.decode()}")
+                await handler(progress=progress, **json.loads(params))
+            finally:
+                # 进度写入失败同样使任务失败，而不是让任务停留在运行中
+                await progress.close()
+            fields["state"] = JobState.SUCCEEDED.value
+        except Exception as e:
+            LOGGER.error(f"后台任务执行失败: {job_id}, 错误: {e}")
+            fields["state"] = JobState.FAILED.value
+            fields["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            fields.setdefault("state", JobState.FAILED.value)
+            fields["finished"] = datetime.now().timestamp()
+            pipe = DB0.pipeline(transaction=True)
+            pipe.hset(_job_key(job_id), mapping=fields)
+            pipe.expire(_job_key(job_id), CONFIG.CORE.job_ttl)
+            pipe.expire(_results_key(job_id), CONFIG.CORE.job_ttl)
+            pipe.lrem(_RUNNING_KEY, 0, job_id)
+            await pipe.execute()
+        LOGGER.info(f"后台任务结束: {job_id}, 状态: {fields['state']}")
+
+    @classmethod
+    async def recover(cls) -> int:
+        """把上次运行中断的任务标记为失败，返回中断的任务数"""
+        from . import DB0
+
+        from config import CONFIG
+
+        job_ids = await DB0.lrange(_RUNNING_KEY, 0, -1)
+        pipe = DB0.pipeline(transaction=True)
+        for job_id in job_ids:
+            key = _job_key(job_id.decode())
+            pipe.hset(
+                key,
+                mapping={
+                    "state": JobState.FAILED.value,
+                    "error": "服务重启，任务中断",
+                    "finished": datetime.now().timestamp(),
+                },
+            )
+            pipe.expire(key, CONFIG.CORE.job_ttl)
+            pipe.expire(_results_key(job_id.decode()), CONFIG.CORE.job_ttl)
+            pipe.delete(_params_key(job_id.decode()))
+        pipe.delete(_RUNNING_KEY)
+        await pipe.execute()
+        return len(job_ids)
+
+    @classmethod
+    async def serve(cls) -> None:
+        """持续执行任务，最多同时执行 CONFIG.CORE.job_concurrency 个"""
+        from config import CONFIG
+
+        sem = aio.Semaphore(CONFIG.CORE.job_concurrency)
+        tasks: set[aio.Task] = set()
+
+        async def run_one():
+            try:
+                await cls.run_once(timeout=5)
+            except Exception as e:
+                LOGGER.error(f"执行后台任务时发生错误: {e}")
+                await aio.sleep(1)
+            finally:
+                sem.release()
+
+        while True:
+            await sem.acquire()
+            task = aio.create_task(run_one())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
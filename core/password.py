@@ -0,0 +1,156 @@
+"""密码哈希与验证
+
+scrypt 等密码哈希算法刻意消耗大量 CPU，在请求协程中同步计算会占满工作进程。这里的原语把
+计算放到进程池中执行，并用文件锁实现跨进程的槽位限制同时进行的计算数量。所有槽位被占用时
+请求进入同样以文件锁实现的等待队列，直到取得槽位；队列已满或等待超时才抛出
+PasswordBusyError，使登录洪峰中始终有工作进程可以处理其它请求。
+"""
+
+import asyncio as aio
+import contextlib
+import fcntl
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from base.logger import logger
+
+from . import Error
+
+LOGGER = logger(__spec__, __file__)
+
+
+class PasswordBusyError(Error):
+    """密码哈希槽位已满"""
+
+    def __str__(self) -> str:
+        return f"password hashing is busy: {super().__str__()}"
+
+
+class PASSWORD:
+
+    _pool: ProcessPoolExecutor | None = None
+    _pool_pid = 0
+
+    @classmethod
+    def _executor(cls) -> ProcessPoolExecutor:
+        """当前进程的进程池，在首次使用时创建，因此 gunicorn 的每个工作进程各有一个"""
+        from config import CONFIG
+
+        if cls._pool is None or cls._pool_pid != os.getpid():
+            cls._pool = ProcessPoolExecutor(
+                max_workers=CONFIG.CORE.password_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            cls._pool_pid = os.getpid()
+        return cls._pool
+
+    @classmethod
+    def slots(cls) -> int:
+        """跨进程的计算槽位数，默认为学生服务工作进程数的一半
+
+        登录请求由学生服务处理，而 gunicorn 的同步工作进程在等待哈希时同样被占用，因此槽位
+        与等待队列合计不超过学生服务工作进程数减一，保证洪峰期间至少有一个工作进程空闲。
+        """
+        from config import CONFIG
+
+        if CONFIG.CORE.password_slots is not None:
+            return CONFIG.CORE.password_slots
+        return max(1, CONFIG.ENTRY.svc_stu_workers // 2)
+
+    @classmethod
+    def queue_limit(cls) -> int:
+        """跨进程的等待队列长度，默认为学生服务中槽位之外再留出一个空闲工作进程后的余量"""
+        from config import CONFIG
+
+        if CONFIG.CORE.password_queue_limit is not None:
+            return CONFIG.CORE.password_queue_limit
+        return max(0, CONFIG.ENTRY.svc_stu_workers - cls.slots() - 1)
+
+    @classmethod
+    def _slot(cls):
+        """占用一个跨进程的计算槽位，所有槽位被占用时抛出 PasswordBusyError"""
+        return cls._lock("password", cls.slots())
+
+    @classmethod
+    def _ticket(cls):
+        """占用一个跨进程的等待队列位置，队列已满时抛出 PasswordBusyError"""
+        return cls._lock("password-queue", cls.queue_limit())
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _lock(name: str, count: int):
+        """占用 count 个同名文件锁中的一个，全部被占用时抛出 PasswordBusyError
+
+        文件锁位于 run 目录下，文件描述符关闭或进程退出时自动释放。
+        """
+        from config import CONFIG
+
+        lock_dir = CONFIG.run_dir
+        os.makedirs(lock_dir, exist_ok=True)
+        for i in range(count):
+            fd = os.open(f"{lock_dir}{name}.{i}.lock", os.O_CREAT | os.O_RDWR, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            try:
+                yield
+            finally:
+                os.close(fd)
+            return
+        raise PasswordBusyError()
+
+    @classmethod
+    async def _run(cls, wait: bool, func, *args):
+        """取得计算槽位后在进程池中执行 func
+
+        槽位已满时先占用一个等待队列位置，再轮询槽位直到 CONFIG.CORE.password_queue_timeout；
+        wait 为 True 时不占用队列位置，也不限制等待时间。
+        """
+        from config import CONFIG
+
+        loop = aio.get_running_loop()
+        deadline = None
+        with contextlib.ExitStack() as queue:
+            while True:
+                with contextlib.ExitStack() as stack:
+                    try:
+                        stack.enter_context(cls._slot())
+                    except PasswordBusyError:
+                        pass
+                    else:
+                        return await loop.run_in_executor(cls._executor(), func, *args)
+
+                if not wait and deadline is None:
+                    try:
+                        queue.enter_context(cls._ticket())
+                    except PasswordBusyError:
+                        LOGGER.warning("密码哈希等待队列已满，拒绝请求")
+                        raise
+                    deadline = loop.time() + CONFIG.CORE.password_queue_timeout
+                elif not wait and loop.time() >= deadline:
+                    LOGGER.warning("等待密码哈希槽位超时，拒绝请求")
+                    raise PasswordBusyError("timed out")
+                await aio.sleep(CONFIG.CORE.password_queue_poll)
+
+    @classmethod
+    async def hash(cls, password: str, wait: bool = False) -> str:
+        """计算密码哈希
+
+        :param wait: 不受等待队列长度和等待时间限制，一直等到取得槽位
+        """
+        return await cls._run(wait, generate_password_hash, password)
+
+    @classmethod
+    async def verify(cls, pwd_hash: str, password: str, wait: bool = False) -> bool:
+        """验证密码
+
+        :param wait: 不受等待队列长度和等待时间限制，一直等到取得槽位
+        """
+        if not pwd_hash:
+            return False
+        return await cls._run(wait, check_password_hash, pwd_hash, password)
@@ -1,16 +1,29 @@
 import asyncio
+import contextlib
+from contextvars import ContextVar
 from enum import Enum
-import os
 from datetime import datetime
-from typing import AsyncIterator, cast
-
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Iterable,
+    Mapping,
+    Sequence,
+)
+
+import redis
 from pydantic import BaseModel, Field, RootModel
+from redis.commands.core import AsyncScript
 from werkzeug.security import check_password_hash, generate_password_hash
 
 import cluster
+from base.cache import TTLCache
 from base.logger import logger
 
-from . import Error
+from . import NOTIFY, Error
+from .job import JOB, BatchProgress
+from .password import PASSWORD
 
 LOGGERR = logger(__spec__, __file__)
 
@@ -116,6 +129,22 @@ class CodespaceQuotaExceededError(Error):
         return f"Codespace quota exceeded: {self.sid}"
 
 
+class CodespaceTransitionError(Error):
+    """代码空间状态转换非法错误"""
+
+    def __init__(self, sid: str, current: str, target: str, *args):
+        self.sid = sid
+        self.current = current
+        self.target = target
+        super().__init__(*args)
+
+    def __str__(self) -> str:
+        return (
+            f"Illegal codespace transition: {self.sid}, "
+            f"{self.current} -> {self.target}"
+        )
+
+
 class CodespaceStartError(Error):
     """代码空间启动错误"""
 
@@ -143,49 +172,524 @@ class CodespaceStopError(Error):
 # ==================================================================================== #
 
 
+_FIELDS = (
+    "pwd_hash",
+    "user_info.name",
+    "user_info.mail",
+    "codespace.status",
+    "codespace.url",
+    "codespace.time_quota",
+    "codespace.time_used",
+    "codespace.last_start",
+    "codespace.last_stop",
+    "codespace.last_active",
+    "codespace.last_watch",
+)
+"""学生记录在 Redis 哈希中的字段，顺序与 _parse 的参数一致"""
+
+
+_FLOAT_FIELDS = frozenset(
+    (
+        "codespace.time_quota",
+        "codespace.time_used",
+        "codespace.last_start",
+        "codespace.last_stop",
+        "codespace.last_active",
+        "codespace.last_watch",
+    )
+)
+"""数值类型的字段"""
+
+
+def _decode(field: str, value: bytes | None) -> str | float:
+    """解码单个字段的值"""
+
+    if field in _FLOAT_FIELDS:
+        return float(value or 0)
+    return value.decode() if value is not None else ""
+
+
+def _parse(sid: str, data: list) -> Student | None:
+    """从 HMGET 的结果构造学生记录，记录不存在时返回 None"""
+
+    vmap = dict(zip(_FIELDS, data))
+    if vmap["pwd_hash"] is None:
+        return None
+
+    return Student(
+        sid=sid,
+        pwd_hash=vmap["pwd_hash"],
+        user_info=UserInfo(name=vmap["user_info.name"], mail=vmap["user_info.mail"]),
+        codespace=CodespaceInfo(
+            status=vmap["codespace.status"],
+            url=vmap["codespace.url"],
+            time_quota=float(vmap["codespace.time_quota"] or 0),
+            time_used=float(vmap["codespace.time_used"] or 0),
+            last_start=float(vmap["codespace.last_start"] or 0),
+            last_stop=float(vmap["codespace.last_stop"] or 0),
+            last_active=float(vmap["codespace.last_active"] or 0),
+            last_watch=float(vmap["codespace.last_watch"] or 0),
+        ),
+    )
+
+
+_INDEX_PREFIX = "@"
+"""索引键的前缀，学号不会以此开头，因此索引键不会与学生记录冲突"""
+_INDEX_VERSION = 4
+"""索引结构的版本，升高后 TABLE.migrate 会重建索引"""
+_INDEX_VERSION_KEY = _INDEX_PREFIX + "index-version"
+_REGISTRY_KEY = _INDEX_PREFIX + "students"
+"""学生注册表，所有成员分数为 0 的有序集合，因此按学号字典序排列"""
+
+
+_STATUS_KEY_PREFIX = _INDEX_PREFIX + "codespace.status:"
+
+
+def _status_key(status: CodespaceStatus | str) -> str:
+    """代码空间状态索引集合的键"""
+
+    return _STATUS_KEY_PREFIX + CodespaceStatus(status).value
+
+
+_DEADLINE_KEY = _INDEX_PREFIX + "codespace.deadline"
+"""运行中且有时间配额的代码空间的配额耗尽时间，分数为 POSIX 时间戳"""
+_DEADLINE_WAKE_KEY = _INDEX_PREFIX + "codespace.deadline:wake"
+"""最早的截止时间提前时推入的唤醒列表，配额调度器阻塞等待在其上"""
+_DEADLINE_MARGIN = 0.05
+"""配额调度器在截止时间之后多等待的时间（秒），使到期时的计费确实达到配额"""
+_ACTIVITY_KEY = _INDEX_PREFIX + "codespace.activity"
+"""运行中的代码空间的最后活动时间，分数为 POSIX 时间戳。心跳只更新这里，代码空间
+离开运行状态时才写回 codespace.last_active"""
+
+
+def _deadline(codespace: CodespaceInfo) -> float | None:
+    """代码空间的配额耗尽时间：自上次启动或检查起计费，剩余配额用完的时刻
+
+    计费把这段时间计入已使用时间并推后计费起点，因此截止时间在计费前后不变。
+    """
+    if codespace.status != CodespaceStatus.RUNNING or codespace.time_quota <= 0:
+        return None
+    since = max(codespace.last_start, codespace.last_watch)
+    return since + codespace.time_quota - codespace.time_used
+
+
+_SCHEDULE_LUA = """
+local function schedule(key, deadlines, wake)
+  local h = redis.call('HMGET', key, 'codespace.status', 'codespace.time_quota',
+    'codespace.time_used', 'codespace.last_start', 'codespace.last_watch')
+  local quota = tonumber(h[2]) or 0
+  if h[1] ~= 'running' or quota <= 0 then
+    redis.call('ZREM', deadlines, key)
+    return
+  end
+  local since = math.max(tonumber(h[4]) or 0, tonumber(h[5]) or 0)
+  local deadline = since + quota - (tonumber(h[3]) or 0)
+  local first = redis.call('ZRANGE', deadlines, 0, 0, 'WITHSCORES')
+  redis.call('ZADD', deadlines, deadline, key)
+  if first[2] == nil or deadline < tonumber(first[2]) then
+    redis.call('LPUSH', wake, key)
+    redis.call('LTRIM', wake, 0, 0)
+  end
+end
+"""
+"""按记录重新计算代码空间的截止时间（与 _deadline 相同），最早的截止时间提前时唤醒
+配额调度器。KEYS[2] 为截止时间集合，KEYS[3] 为唤醒列表"""
+
+_ACTIVITY_LUA = """
+local function track_activity(key, activity)
+  local status = redis.call('HGET', key, 'codespace.status')
+  if status == 'running' then
+    local now = redis.call('TIME')
+    redis.call('ZADD', activity, 'NX', now[1] + now[2] / 1e6, key)
+  else
+    local active = redis.call('ZSCORE', activity, key)
+    if active then
+      redis.call('HSET', key, 'codespace.last_active', active)
+      redis.call('ZREM', activity, key)
+    end
+  end
+end
+"""
+"""进入运行状态的代码空间以当前时间加入活动集合，离开运行状态时把最后活动时间写回
+记录并移出集合。KEYS[4] 为活动集合"""
+
+_UPDATE_LUA = _SCHEDULE_LUA + _ACTIVITY_LUA + """
+local key, channel = KEYS[1], ARGV[1]
+if redis.call('EXISTS', key) == 0 then
+  return false
+end
+local nset = tonumber(ARGV[2])
+local i = 3
+for _ = 1, nset do
+  local field, value = ARGV[i], ARGV[i + 1]
+  if field == 'codespace.status' then
+    for j = 6, #KEYS do
+      redis.call('SREM', KEYS[j], key)
+    end
+    redis.call('SADD', KEYS[5], key)
+  end
+  redis.call('HSET', key, field, value)
+  i = i + 2
+end
+local ret = {}
+while i <= #ARGV do
+  ret[#ret + 1] = redis.call('HINCRBYFLOAT', key, ARGV[i], ARGV[i + 1])
+  i = i + 2
+end
+schedule(key, KEYS[2], KEYS[3])
+track_activity(key, KEYS[4])
+redis.call('PUBLISH', channel, key)
+return ret
+"""
+"""部分更新学生记录：记录不存在时返回 nil，否则设置字段、同步状态索引、增加数值字段、
+重新计算截止时间、维护活动集合、发布失效通知，返回各增加字段的新值。
+设置 codespace.status 时 KEYS[5] 为新状态的索引集合，KEYS[6..] 为其余状态的索引集合"""
+
+_TRANSITION_LUA = _SCHEDULE_LUA + _ACTIVITY_LUA + """
+local key, channel = KEYS[1], ARGV[1]
+local target, sources, now = ARGV[2], ARGV[3], tonumber(ARGV[4])
+local check_quota, charge = ARGV[5] == '1', ARGV[6] == '1'
+if redis.call('EXISTS', key) == 0 then
+  return false
+end
+local current = redis.call('HGET', key, 'codespace.status') or 'stopped'
+if not string.find(' ' .. sources .. ' ', ' ' .. current .. ' ', 1, true) then
+  return {0, current}
+end
+local h = redis.call('HMGET', key, 'codespace.time_quota', 'codespace.time_used',
+  'codespace.last_start', 'codespace.last_watch')
+local quota, used = h[1] or '0', h[2] or '0'
+if charge and current == 'running' then
+  local since = math.max(tonumber(h[3]) or 0, tonumber(h[4]) or 0)
+  if since > 0 and now > since then
+    used = redis.call('HINCRBYFLOAT', key, 'codespace.time_used', now - since)
+  end
+  redis.call('HSET', key, 'codespace.last_watch', ARGV[4])
+end
+if check_quota and tonumber(quota) > 0 and tonumber(used) >= tonumber(quota) then
+  redis.call('PUBLISH', channel, key)
+  return {-1, current}
+end
+if current ~= target then
+  for j = 6, #KEYS do
+    redis.call('SREM', KEYS[j], key)
+  end
+  redis.call('SADD', KEYS[5], key)
+end
+for i = 7, #ARGV, 2 do
+  redis.call('HSET', key, ARGV[i], ARGV[i + 1])
+end
+redis.call('HSET', key, 'codespace.status', target)
+schedule(key, KEYS[2], KEYS[3])
+track_activity(key, KEYS[4])
+redis.call('PUBLISH', channel, key)
+return {1, current, used, quota}
+"""
+"""代码空间状态的比较并设置：当前状态属于 sources 时转换到 target 并设置其余字段，
+重新计算截止时间并维护活动集合。charge 时把运行时间计入 time_used，check_quota 时在
+配额用尽时拒绝转换。KEYS[5] 为 target 的索引集合，KEYS[6..] 为其余 sources 的索引集合。
+返回 nil（记录不存在）、{0, 当前状态}（非法转换）、{-1, 当前状态}（配额用尽）
+或 {1, 原状态, time_used, time_quota}"""
+
+_SCRIPTS: dict[str, AsyncScript] = {}
+_CACHE_CHANNEL = "student-invalidate"
+"""学生记录失效通知的发布订阅频道，消息为学号"""
+_JOB_STATUS_KEY_PREFIX = "codespace-job-status:"
+"""DB0 中跨进程共享的集群作业状态查询结果，加 :lock 后缀为查询锁"""
+
+
+def _script(source: str) -> AsyncScript:
+    """获取注册在 DB_STU 上的 Lua 脚本，脚本以 EVALSHA 执行，服务端缓存缺失时自动加载"""
+    from core import DB_STU
+
+    script = _SCRIPTS.get(source)
+    if script is None or script.registered_client is not DB_STU:
+        script = _SCRIPTS[source] = DB_STU.register_script(source)
+    return script
+
+
+async def _make_student_dirs(sid: str, stu_path: str) -> bool:
+    """创建学生目录，返回是否新建了目录"""
+    from core import FS
+
+    if await FS.exists(stu_path):
+        LOGGERR.warning(
+            f"Student directory {stu_path} already exists, skipping creation"
+        )
+        return False
+    try:
+        await FS.makedirs(stu_path)
+        for sub in ("code/", "io/", "root/"):
+            await FS.makedirs(stu_path + sub)
+    except:
+        LOGGERR.error(f"Failed to create student directory {stu_path}")
+        raise StudentDirectoryError(
+            sid, f"Failed to create student directory {stu_path}"
+        )
+    return True
+
+
+async def _remove_student_dirs(stu_path: str) -> None:
+    """删除新建的空学生目录"""
+    from core import FS
+
+    for sub in ("code/", "io/", "root/", ""):
+        try:
+            await FS.rmdir(stu_path + sub)
+        except OSError as e:
+            LOGGERR.warning(f"Failed to remove student directory {stu_path + sub}: {e}")
+
+
+class CACHE:
+    """学生记录的进程内读缓存，TABLE 的写操作通过 NOTIFY 使所有进程中的条目失效"""
+
+    _cache: TTLCache[str, Student] | None = None
+
+    @classmethod
+    def _get(cls) -> TTLCache[str, Student]:
+        if cls._cache is None:
+            from config import CONFIG
+
+            cls._cache = TTLCache(
+                CONFIG.CORE.student_cache_size, CONFIG.CORE.student_cache_ttl
+            )
+            NOTIFY.listen(_CACHE_CHANNEL, cls._on_notify)
+        return cls._cache
+
+    @classmethod
+    def _on_notify(cls, sid: bytes | None) -> None:
+        if sid is None:
+            cls._get().clear()
+        else:
+            cls._get().pop(sid.decode())
+
+    @classmethod
+    async def sync(cls) -> TTLCache[str, Student]:
+        """处理已到达的失效通知，返回缓存"""
+        cache = cls._get()
+        await NOTIFY.drain()
+        return cache
+
+    @classmethod
+    def invalidate(cls, sid: str) -> None:
+        """使本进程中的条目失效"""
+        cls._get().pop(sid)
+
+    @classmethod
+    def info(cls) -> dict:
+        """缓存的大小和命中、未命中、淘汰等统计计数"""
+        return cls._get().info()
+
+
+class ACCOUNT:
+    """学生 API-KEY 验证，缓存 API-KEY 的解密结果和账户是否有效
+
+    解密是纯函数，其结果（包括无效的 API-KEY）只受容量限制；账户是否有效随学生记录的失效
+    通知而失效。
+    """
+
+    _keys: TTLCache[str, str] | None = None
+    _valid: TTLCache[str, bool]
+
+    @classmethod
+    def _init(cls) -> None:
+        if cls._keys is None:
+            from config import CONFIG
+
+            size, ttl = CONFIG.CORE.account_cache_size, CONFIG.CORE.account_cache_ttl
+            cls._keys = TTLCache(size, float("inf"))
+            cls._valid = TTLCache(size, ttl)
+            NOTIFY.listen(_CACHE_CHANNEL, cls._on_notify)
+
+    @classmethod
+    def _on_notify(cls, sid: bytes | None) -> None:
+        if sid is None:
+            cls._valid.clear()
+        else:
+            cls._valid.pop(sid.decode())
+
+    @classmethod
+    async def verify(cls, api_key: str) -> str | None:
+        """验证 API-KEY
+
+        :return: API-KEY 对应的学号，API-KEY 无效时返回 None
+        :raises StudentNotFoundError: 学生不存在或没有用户信息
+        """
+        from util import api_key_dec
+
+        cls._init()
+        await NOTIFY.drain()
+        assert cls._keys is not None
+
+        sid = cls._keys.get(api_key)
+        if sid is None:
+            sid = api_key_dec(api_key) or ""
+            cls._keys.put(api_key, sid)
+        if not sid:
+            return None
+
+        valid = cls._valid.get(sid)
+        if valid is None:
+            user = await TABLE.get_user_info(sid)
+            valid = bool(user.name or user.mail)
+            cls._valid.put(sid, valid)
+        if not valid:
+            raise StudentNotFoundError(sid)
+        return sid
+
+    @classmethod
+    def invalidate(cls, sid: str) -> None:
+        """使本进程中账户是否有效的缓存失效"""
+        if cls._keys is not None:
+            cls._valid.pop(sid)
+
+    @classmethod
+    def info(cls) -> dict:
+        """API-KEY 和账户缓存的统计计数"""
+        cls._init()
+        assert cls._keys is not None
+        return {"keys": cls._keys.info(), "valid": cls._valid.info()}
+
+
+_MEMO: ContextVar[dict[tuple[str, str], Any] | None] = ContextVar("_MEMO", default=None)
+
+
+class MEMO:
+    """请求范围的记忆化
+
+    在 scope 内，同一学生的记录和代码空间状态各最多获取一次，TABLE 的写操作使对应学生的
+    条目失效。scope 之外（如监控和后台任务）不做记忆化。
+    """
+
+    @classmethod
+    @contextlib.contextmanager
+    def scope(cls):
+        """进入新的记忆化范围，通常包住一次请求的处理"""
+        token = _MEMO.set({})
+        try:
+            yield
+        finally:
+            _MEMO.reset(token)
+
+    @classmethod
+    def get(cls, kind: str, sid: str) -> Any:
+        """获取记忆的值，不在 scope 内或没有记忆时返回 None"""
+        memo = _MEMO.get()
+        return None if memo is None else memo.get((kind, sid))
+
+    @classmethod
+    def put(cls, kind: str, sid: str, value: Any) -> None:
+        memo = _MEMO.get()
+        if memo is not None:
+            memo[(kind, sid)] = value
+
+    @classmethod
+    def invalidate(cls, sid: str) -> None:
+        memo = _MEMO.get()
+        if memo:
+            memo.pop(("student", sid), None)
+            memo.pop(("status", sid), None)
+
+
+def _invalidate(sid: str) -> None:
+    """使本进程中学生记录的各种缓存失效，其它进程由失效通知处理"""
+    CACHE.invalidate(sid)
+    ACCOUNT.invalidate(sid)
+    MEMO.invalidate(sid)
+
+
 class TABLE:
 
     @classmethod
     async def read(cls, sid: str) -> Student:
-        """读取学生记录"""
+        """读取学生记录，优先从请求范围的记忆和进程内缓存读取"""
         from core import DB_STU
 
-        keys = [
-            "pwd_hash",
-            "user_info.name",
-            "user_info.mail",
-            "codespace.status",
-            "codespace.url",
-            "codespace.time_quota",
-            "codespace.time_used",
-            "codespace.last_start",
-            "codespace.last_stop",
-            "codespace.last_active",
-            "codespace.last_watch",
-        ]
+        if (student := MEMO.get("student", sid)) is not None:
+            return student.model_copy(deep=True)
 
-        data = await DB_STU.hmget(sid, *keys)
-        vmap = dict(zip(keys, data))
-        if vmap["pwd_hash"] is None:
-            raise StudentNotFoundError(sid)
+        cache = await CACHE.sync()
+        if (student := cache.get(sid)) is None:
+            data = await DB_STU.hmget(sid, *_FIELDS)
+            student = _parse(sid, data)
+            if student is None:
+                raise StudentNotFoundError(sid)
+            cache.put(sid, student)
+        MEMO.put("student", sid, student)
+        return student.model_copy(deep=True)
 
-        return Student(
-            sid=sid,
-            pwd_hash=vmap["pwd_hash"],
-            user_info=UserInfo(
-                name=vmap["user_info.name"], mail=vmap["user_info.mail"]
-            ),
-            codespace=CodespaceInfo(
-                status=vmap["codespace.status"],
-                url=vmap["codespace.url"],
-                time_quota=float(vmap["codespace.time_quota"] or 0),
-                time_used=float(vmap["codespace.time_used"] or 0),
-                last_start=float(vmap["codespace.last_start"] or 0),
-                last_stop=float(vmap["codespace.last_stop"] or 0),
-                last_active=float(vmap["codespace.last_active"] or 0),
-                last_watch=float(vmap["codespace.last_watch"] or 0),
-            ),
-        )
+    @classmethod
+    async def read_many(
+        cls, sids: Iterable[str], batch_size: int | None = None
+    ) -> list[Student]:
+        """批量读取学生记录，每批记录通过一个 Redis 管道读取，不存在的记录被跳过
+
+        :param sids: 学号序列
+        :param batch_size: 每个管道中的记录数，默认为 CONFIG.CORE.read_batch_size
+        :return: 按 sids 顺序排列的学生记录
+        """
+        from core import DB_STU
+
+        from config import CONFIG
+
+        batch_size = batch_size or CONFIG.CORE.read_batch_size
+        sids = list(sids)
+        students = []
+        for i in range(0, len(sids), batch_size):
+            batch = sids[i : i + batch_size]
+            pipe = DB_STU.pipeline(transaction=False)
+            for sid in batch:
+                pipe.hmget(sid, *_FIELDS)
+            for sid, data in zip(batch, await pipe.execute()):
+                student = _parse(sid, data)
+                if student is None:
+                    LOGGERR.warning(f"Student {sid!r} not found during batch read")
+                    continue
+                students.append(student)
+        return students
+
+    @classmethod
+    async def scan(
+        cls, cursor: str = "0", count: int = 100, fields: Sequence[str] = _FIELDS
+    ) -> tuple[str, list[dict[str, str | float]]]:
+        """按学号顺序分页读取学生记录，只读取指定的字段
+
+        :param cursor: 上一页返回的游标，"0" 表示从头开始
+        :param count: 每页的记录数
+        :param fields: 要读取的字段，取值为 _FIELDS 中的字段名
+        :return: 下一页的游标（"0" 表示没有下一页）和记录列表，每条记录包含 "sid"
+            和所请求的字段
+        """
+        from core import DB_STU
+
+        if unknown := set(fields) - set(_FIELDS):
+            raise ValueError(f"unknown student fields: {sorted(unknown)}")
+        if cursor == "0":
+            start = "-"
+        elif cursor.startswith("("):
+            start = cursor
+        else:
+            raise ValueError(f"invalid cursor: {cursor!r}")
+
+        sids = [
+            sid.decode()
+            for sid in await DB_STU.zrangebylex(
+                _REGISTRY_KEY, start, "+", start=0, num=count
+            )
+        ]
+
+        pipe = DB_STU.pipeline(transaction=False)
+        for sid in sids:
+            pipe.hmget(sid, "pwd_hash", *fields)
+        records = []
+        for sid, data in zip(sids, await pipe.execute()):
+            if data[0] is None:
+                continue  # 读取前被删除
+            record: dict[str, str | float] = {"sid": sid}
+            for field, value in zip(fields, data[1:]):
+                record[field] = _decode(field, value)
+            records.append(record)
+        return ("(" + sids[-1] if len(sids) >= count else "0"), records
 
     @classmethod
     async def write(cls, student: Student) -> None:
@@ -206,62 +710,298 @@ class TABLE:
             "codespace.last_watch": str(student.codespace.last_watch),
         }
 
-        await DB_STU.hmset(student.sid, data)
+        status = CodespaceStatus(student.codespace.status)
+        pipe = DB_STU.pipeline(transaction=True)
+        pipe.hset(student.sid, mapping=data)
+        pipe.zadd(_REGISTRY_KEY, {student.sid: 0})
+        for other in CodespaceStatus:
+            if other != status:
+                pipe.srem(_status_key(other), student.sid)
+        pipe.sadd(_status_key(status), student.sid)
+        if (deadline := _deadline(student.codespace)) is not None:
+            pipe.zadd(_DEADLINE_KEY, {student.sid: deadline})
+            pipe.lpush(_DEADLINE_WAKE_KEY, student.sid)
+            pipe.ltrim(_DEADLINE_WAKE_KEY, 0, 0)
+        else:
+            pipe.zrem(_DEADLINE_KEY, student.sid)
+        if status == CodespaceStatus.RUNNING:
+            pipe.zadd(_ACTIVITY_KEY, {student.sid: student.codespace.last_active})
+        else:
+            pipe.zrem(_ACTIVITY_KEY, student.sid)
+        pipe.publish(_CACHE_CHANNEL, student.sid)
+        _invalidate(student.sid)
+        await pipe.execute()
+
+    @classmethod
+    async def update(
+        cls,
+        sid: str,
+        fields: Mapping[str, str | float] = {},
+        incr: Mapping[str, float] = {},
+    ) -> dict[str, float]:
+        """原子地更新学生记录的部分字段，不读取整条记录
+
+        :param fields: 要设置的字段及其值，设置 codespace.status 时同步更新状态索引
+        :param incr: 要增加的数值字段及其增量，使用 HINCRBYFLOAT
+        :return: incr 中各字段增加后的值
+        """
+        if unknown := (set(fields) | set(incr)) - set(_FIELDS):
+            raise ValueError(f"unknown student fields: {sorted(unknown)}")
+        if unknown := set(incr) - _FLOAT_FIELDS:
+            raise ValueError(f"non-numeric student fields: {sorted(unknown)}")
+
+        keys = [sid, _DEADLINE_KEY, _DEADLINE_WAKE_KEY, _ACTIVITY_KEY]
+        args: list[str | float] = [_CACHE_CHANNEL, len(fields)]
+        for field, value in fields.items():
+            if field == "codespace.status":
+                value = CodespaceStatus(value).value
+                keys.append(_status_key(value))
+                keys += (_status_key(s) for s in CodespaceStatus if s != value)
+            args += (field, value)
+        for field, delta in incr.items():
+            args += (field, delta)
+
+        _invalidate(sid)
+        ret = await _script(_UPDATE_LUA)(keys=keys, args=args)
+        if ret is None:
+            raise StudentNotFoundError(sid)
+        return {field: float(value) for field, value in zip(incr, ret)}
 
     @classmethod
-    async def iter_all(cls) -> AsyncIterator[Student]:
-        """迭代所有学生记录"""
+    async def transition(
+        cls,
+        sid: str,
+        sources: Iterable[CodespaceStatus],
+        target: CodespaceStatus,
+        fields: Mapping[str, str | float] = {},
+        *,
+        check_quota: bool = False,
+        charge: bool = False,
+        now: float | None = None,
+    ) -> tuple[float, float]:
+        """在一次往返中原子地执行代码空间状态转换
+
+        :param sources: 允许转换的当前状态
+        :param target: 目标状态
+        :param fields: 转换成功时一并设置的字段
+        :param check_quota: 时间配额已用尽时拒绝转换
+        :param charge: 当前状态为 running 时，把自上次启动或检查以来的时间计入已使用
+            时间，并更新 codespace.last_watch
+        :param now: 计费使用的 POSIX 时间戳，默认为当前时间
+        :return: 转换后的已使用时间和时间配额
+        :raises StudentNotFoundError: 学生不存在
+        :raises CodespaceTransitionError: 当前状态不在 sources 中
+        :raises CodespaceQuotaExceededError: check_quota 且配额已用尽
+        """
+        if unknown := set(fields) - set(_FIELDS):
+            raise ValueError(f"unknown student fields: {sorted(unknown)}")
+
+        target = CodespaceStatus(target)
+        sources = {CodespaceStatus(status) for status in sources}
+        keys = [sid, _DEADLINE_KEY, _DEADLINE_WAKE_KEY, _ACTIVITY_KEY]
+        keys.append(_status_key(target))
+        keys += (_status_key(status) for status in sources if status != target)
+        args: list[str | float] = [
+            _CACHE_CHANNEL,
+            target.value,
+            " ".join(status.value for status in sources),
+            now or datetime.now().timestamp(),
+            int(check_quota),
+            int(charge),
+        ]
+        for field, value in fields.items():
+            args += (field, value)
+
+        _invalidate(sid)
+        ret = await _script(_TRANSITION_LUA)(keys=keys, args=args)
+        if ret is None:
+            raise StudentNotFoundError(sid)
+        if ret[0] == 0:
+            raise CodespaceTransitionError(sid, ret[1].decode(), target.value)
+        if ret[0] == -1:
+            raise CodespaceQuotaExceededError(sid)
+        return float(ret[2]), float(ret[3])
+
+    @classmethod
+    async def incr_time_used(cls, sid: str, delta: float) -> float:
+        """增加代码空间已使用时间，返回增加后的值"""
+        ret = await cls.update(sid, incr={"codespace.time_used": delta})
+        return ret["codespace.time_used"]
+
+    @classmethod
+    async def iter_ids(cls, batch_size: int | None = None) -> AsyncIterator[str]:
+        """增量迭代所有学生ID，由注册表的 ZSCAN 提供，不会阻塞 Redis"""
         from core import DB_STU
 
-        async for sid in DB_STU.scan_iter():
-            try:
-                yield await cls.read(cast(str, sid))
-            except StudentNotFoundError:
-                LOGGERR.warning(f"Student {sid!r} not found during iteration")
+        from config import CONFIG
+
+        batch_size = batch_size or CONFIG.CORE.read_batch_size
+        async for sid, _ in DB_STU.zscan_iter(_REGISTRY_KEY, count=batch_size):
+            yield sid.decode()
+
+    @classmethod
+    async def iter_all(cls, batch_size: int | None = None) -> AsyncIterator[Student]:
+        """迭代所有学生记录，按批次流式读取"""
+        from config import CONFIG
+
+        batch_size = batch_size or CONFIG.CORE.read_batch_size
+        batch: list[str] = []
+        async for sid in cls.iter_ids(batch_size):
+            batch.append(sid)
+            if len(batch) >= batch_size:
+                for student in await cls.read_many(batch, batch_size):
+                    yield student
+                batch = []
+        for student in await cls.read_many(batch, batch_size):
+            yield student
 
     @classmethod
     async def all_ids(cls) -> list[str]:
         """获取所有学生ID"""
+        return [sid async for sid in cls.iter_ids()]
+
+    @classmethod
+    async def ids_by_status(cls, status: CodespaceStatus) -> list[str]:
+        """获取代码空间处于指定状态的学生ID，由状态索引集合提供"""
         from core import DB_STU
 
-        return await DB_STU.keys()
+        return [sid.decode() for sid in await DB_STU.smembers(_status_key(status))]
 
     @classmethod
-    async def create(cls, stu: Student) -> bool:
-        """在数据库创建新的学生记录，在集群中分配存储空间"""
+    async def migrate(cls) -> bool:
+        """重建索引，只在索引版本落后时执行，返回是否执行了重建"""
         from core import DB_STU
 
         from config import CONFIG
 
+        version = await DB_STU.get(_INDEX_VERSION_KEY)
+        if version is not None and int(version) >= _INDEX_VERSION:
+            return False
+
+        LOGGERR.info(f"重建学生索引: {version!r} -> {_INDEX_VERSION}")
+        await DB_STU.delete(
+            _REGISTRY_KEY,
+            _DEADLINE_KEY,
+            _ACTIVITY_KEY,
+            *(_status_key(status) for status in CodespaceStatus),
+        )
+
+        # 注册表尚未建立，只能从键空间中扫描学生记录
+        batch_size = CONFIG.CORE.read_batch_size
+        now = datetime.now().timestamp()
+        batch: list[str] = []
+
+        async def flush():
+            pipe = DB_STU.pipeline(transaction=False)
+            for stu in await cls.read_many(batch, batch_size):
+                pipe.zadd(_REGISTRY_KEY, {stu.sid: 0})
+                pipe.sadd(_status_key(stu.codespace.status), stu.sid)
+                if (deadline := _deadline(stu.codespace)) is not None:
+                    pipe.zadd(_DEADLINE_KEY, {stu.sid: deadline})
+                if stu.codespace.status == CodespaceStatus.RUNNING:
+                    # 重建前没有记录心跳，从重建时开始计算空闲时间
+                    pipe.zadd(_ACTIVITY_KEY, {stu.sid: now})
+            await pipe.execute()
+            batch.clear()
+
+        async for key in DB_STU.scan_iter(count=batch_size, _type="HASH"):
+            batch.append(key.decode())
+            if len(batch) >= batch_size:
+                await flush()
+        await flush()
+
+        await DB_STU.set(_INDEX_VERSION_KEY, _INDEX_VERSION)
+        return True
+
+    @classmethod
+    async def create(cls, stu: Student) -> bool:
+        """在数据库创建新的学生记录，在集群中分配存储空间"""
+        from core import DB_STU
+
         if await DB_STU.exists(stu.sid):
             raise StudentAlreadyExistsError(stu.sid)
+        await cls._provision(stu)
+        return True
 
-        stu_path = CONFIG.CORE.students_dir + stu.sid + "/"
-        if not os.path.exists(stu_path):
+    @classmethod
+    async def create_many(
+        cls,
+        students: Sequence[Student],
+        passwords: Sequence[str | None] | None = None,
+        progress: BatchProgress | None = None,
+    ) -> list[Exception | None]:
+        """批量创建学生，按密码哈希、学生目录、集群资源、数据库写入四个阶段流水线执行，
+        各阶段的并发数分别由 CONFIG.CORE.provision_*_concurrency 限制
+
+        :param passwords: 与 students 对应的明文密码，为 None 时使用学生已有的密码哈希
+        :param progress: 每个学生完成时记录其结果
+        :return: 与 students 对应的结果，成功为 None，失败为异常
+        """
+        from core import DB_STU
+
+        from config import CONFIG
+
+        hash_sem = asyncio.Semaphore(CONFIG.CORE.provision_hash_concurrency)
+        fs_sem = asyncio.Semaphore(CONFIG.CORE.provision_fs_concurrency)
+        cluster_sem = asyncio.Semaphore(CONFIG.CORE.provision_cluster_concurrency)
+        db_sem = asyncio.Semaphore(CONFIG.CORE.provision_db_concurrency)
+
+        if passwords is None:
+            passwords = [None] * len(students)
+        pipe = DB_STU.pipeline(transaction=False)
+        for stu in students:
+            pipe.exists(stu.sid)
+        exists = await pipe.execute()
+        seen: set[str] = set()
+
+        async def provision(stu: Student, pwd: str | None, exists: int):
             try:
-                os.makedirs(stu_path)
-                os.makedirs(stu_path + "code/")
-                os.makedirs(stu_path + "io/")
-                os.makedirs(stu_path + "root/")
-            except:
-                LOGGERR.error(f"Failed to create student directory {stu_path}")
-                raise StudentDirectoryError(
-                    stu.sid,
-                    f"Failed to create student directory {stu_path}",
-                )
-        else:
-            LOGGERR.warning(
-                f"Student directory {stu_path} already exists, skipping creation"
+                if exists or stu.sid in seen:
+                    raise StudentAlreadyExistsError(stu.sid)
+                seen.add(stu.sid)
+                if pwd is not None:
+                    async with hash_sem:
+                        stu.pwd_hash = await PASSWORD.hash(pwd, wait=True)
+                await cls._provision(stu, fs_sem, cluster_sem, db_sem)
+            except Exception as e:
+                if progress is not None:
+                    progress.fail(stu.sid, str(e))
+                return e
+            if progress is not None:
+                progress.succeed(stu.sid)
+            return None
+
+        return await asyncio.gather(
+            *(
+                provision(stu, pwd, ex)
+                for stu, pwd, ex in zip(students, passwords, exists)
             )
+        )
+
+    @classmethod
+    async def _provision(
+        cls,
+        stu: Student,
+        fs_sem: AsyncContextManager = contextlib.nullcontext(),
+        cluster_sem: AsyncContextManager = contextlib.nullcontext(),
+        db_sem: AsyncContextManager = contextlib.nullcontext(),
+    ) -> None:
+        """创建学生目录、分配集群资源并写入学生记录，失败时回滚已创建的目录"""
+        from config import CONFIG
+
+        stu_path = CONFIG.CORE.students_dir + stu.sid + "/"
+        async with fs_sem:
+            created = await _make_student_dirs(stu.sid, stu_path)
 
         # 分配计算资源
         try:
-            await CODESPACE.allocate(sid=stu.sid)
+            async with cluster_sem:
+                await CODESPACE.allocate(sid=stu.sid)
         except Exception as e:
             LOGGERR.error(f"Failed to allocate resources for student {stu.sid}: {e}")
-            os.rmdir(stu_path + "code/")
-            os.rmdir(stu_path + "io/")
-            os.rmdir(stu_path + "root/")
+            if created:
+                async with fs_sem:
+                    await _remove_student_dirs(stu_path)
             raise Error(f"Failed to allocate resources for student {stu.sid}")
 
         stu.codespace.status = CodespaceStatus.STOPPED
@@ -273,14 +1013,13 @@ class TABLE:
         stu.codespace.last_active = ts
         stu.codespace.last_watch = ts
 
-        await cls.write(stu)
-
-        return True
+        async with db_sem:
+            await cls.write(stu)
 
     @classmethod
     async def delete(cls, sid: str) -> bool:
         """删除学生记录，归档代码空间，在集群中释放存储空间"""
-        from core import DB_STU
+        from core import DB_STU, FS
         from config import CONFIG
 
         try:
@@ -291,8 +1030,8 @@ class TABLE:
 
         # 归档代码空间
         stu_path = CONFIG.CORE.students_dir + sid + "/"
-        if os.path.exists(stu_path):
-            os.rename(
+        if await FS.exists(stu_path):
+            await FS.rename(
                 stu_path,
                 CONFIG.CORE.archive_students_dir
                 + sid
@@ -307,17 +1046,25 @@ class TABLE:
             LOGGERR.error(f"Failed to clean up codespace for student {sid}: {e}")
             return False
 
-        # 删除学生记录
-        await DB_STU.delete(sid)
+        # 删除学生记录及其索引
+        pipe = DB_STU.pipeline(transaction=True)
+        pipe.delete(sid)
+        pipe.zrem(_REGISTRY_KEY, sid)
+        pipe.zrem(_DEADLINE_KEY, sid)
+        pipe.zrem(_ACTIVITY_KEY, sid)
+        for status in CodespaceStatus:
+            pipe.srem(_status_key(status), sid)
+        pipe.publish(_CACHE_CHANNEL, sid)
+        _invalidate(sid)
+        await pipe.execute()
         return True
 
     @classmethod
     async def reset_password(cls, sid: str, new_password: str) -> None:
         """重置学生密码"""
         try:
-            student = await cls.read(sid)
-            student.reset_password(new_password)
-            await cls.write(student)
+            pwd_hash = await PASSWORD.hash(new_password)
+            await cls.update(sid, {"pwd_hash": pwd_hash})
         except StudentNotFoundError:
             LOGGERR.warning(f"尝试重置不存在的学生 {sid!r} 的密码")
             raise
@@ -327,7 +1074,7 @@ class TABLE:
         """检查学生密码"""
         try:
             student = await cls.read(sid)
-            return student.check_password(password)
+            return await PASSWORD.verify(student.pwd_hash, password)
         except StudentNotFoundError:
             LOGGERR.warning(f"尝试验证不存在的学生 {sid!r} 的密码")
             return False
@@ -346,9 +1093,10 @@ class TABLE:
     async def set_user_info(cls, sid: str, user_info: UserInfo) -> None:
         """设置学生用户信息"""
         try:
-            student = await cls.read(sid)
-            student.user_info = user_info
-            await cls.write(student)
+            await cls.update(
+                sid,
+                {"user_info.name": user_info.name, "user_info.mail": user_info.mail},
+            )
         except StudentNotFoundError:
             LOGGERR.warning(f"尝试更新不存在的学生 {sid!r} 的用户信息")
             raise
@@ -356,127 +1104,235 @@ class TABLE:
 
 class CODESPACE:
 
-    @classmethod
-    async def start(cls, sid: str) -> None:
-        """启动代码空间"""
-        from core import CLUSTER
+    _inflight: dict[str, asyncio.Future] = {}
+    """进程内正在进行的集群作业状态查询，键为作业名"""
 
+    @classmethod
+    async def _job_status(cls, job_name: str) -> cluster.JobInfo.Status:
+        """获取集群作业状态，同一进程中并发的查询合并为一次集群调用"""
+        loop = asyncio.get_running_loop()
+        fut = cls._inflight.get(job_name)
+        if fut is not None and fut.get_loop() is loop:
+            return await asyncio.shield(fut)
+
+        fut = cls._inflight[job_name] = loop.create_future()
         try:
-            # 获取学生信息
-            student = await TABLE.read(sid)
+            status = await cls._shared_job_status(job_name)
+        except asyncio.CancelledError:
+            fut.cancel()
+            raise
+        except Exception as e:
+            fut.set_exception(e)
+            fut.exception()  # 没有其它等待者时不报告未获取的异常
+            raise
+        else:
+            fut.set_result(status)
+            return status
+        finally:
+            if cls._inflight.get(job_name) is fut:
+                del cls._inflight[job_name]
 
-            # 如果代码空间已在运行，则无需再次启动
-            if student.codespace.status == "running":
-                LOGGERR.info(f"代码空间已经在运行中: {sid}")
-                return
+    @classmethod
+    async def _shared_job_status(cls, job_name: str) -> cluster.JobInfo.Status:
+        """CONFIG.CORE.job_status_share_ttl 大于 0 时，通过 Redis 锁在进程间合并查询，
+        并在该时间内共享查询结果；Redis 不可用时直接查询集群
 
-            # 检查时间配额
-            if (
-                student.codespace.time_quota > 0
-                and student.codespace.time_used >= student.codespace.time_quota
-            ):
-                LOGGERR.warning(f"学生代码空间时间配额已用尽: {sid}")
-                raise CodespaceQuotaExceededError(sid)
+        集群从本地缓存读取作业状态时查询本身没有开销，不再经过 Redis 共享。
+        """
+        from core import CLUSTER, DB0
+        from config import CONFIG
 
-            # 准备作业参数
-            job_params = cls.build_job_params(sid)
+        ttl = CONFIG.CORE.job_status_share_ttl
+        if ttl <= 0 or CLUSTER.status_cached:
+            return await CLUSTER.get_job_status(job_name)
 
-            # 提交作业到集群
-            LOGGERR.info(f"正在启动学生代码空间: {sid}")
+        key = _JOB_STATUS_KEY_PREFIX + job_name
+        lock = key + ":lock"
+        wait = CONFIG.CORE.job_status_share_wait
+        deadline = asyncio.get_running_loop().time() + wait
+        try:
+            while True:
+                if (shared := await DB0.get(key)) is not None:
+                    return cluster.JobInfo.Status(int(shared))
+                if await DB0.set(lock, b"", nx=True, px=int(wait * 1000)):
+                    break
+                if asyncio.get_running_loop().time() >= deadline:
+                    return await CLUSTER.get_job_status(job_name)
+                await asyncio.sleep(0.05)
+        except redis.RedisError as e:
+            LOGGERR.warning(f"共享集群作业状态不可用: {job_name}, 错误: {e}")
+            return await CLUSTER.get_job_status(job_name)
 
-            student.codespace.status = "starting"
+        try:
+            status = await CLUSTER.get_job_status(job_name)
+            await DB0.set(key, int(status), px=int(ttl * 1000))
+            return status
+        finally:
+            await DB0.delete(lock)
 
-            await TABLE.write(student)  # 更新状态为starting
+    @classmethod
+    async def _forget_job_status(cls, job_name: str) -> None:
+        """作业被提交或删除后，丢弃共享的旧查询结果"""
+        from core import DB0
 
-            job_info = await CLUSTER.submit_job(job_params)
+        try:
+            await DB0.delete(_JOB_STATUS_KEY_PREFIX + job_name)
+        except redis.RedisError as e:
+            LOGGERR.warning(f"丢弃共享的集群作业状态失败: {job_name}, 错误: {e}")
 
-            # 更新代码空间信息
-            now = datetime.now().timestamp()
-            student.codespace.status = "running"
-            student.codespace.url = job_info.service_url
-            student.codespace.last_start = now
-            student.codespace.last_active = now
-            student.codespace.last_watch = now
+    @classmethod
+    async def start(cls, sid: str) -> bool:
+        """启动代码空间
 
-            # 保存更新后的学生信息
-            await TABLE.write(student)
-            LOGGERR.info(f"学生代码空间启动成功: {sid}, job_id: {job_info.id}")
+        通过 stopped/failed -> starting 的原子状态转换取得启动权，重复的启动请求在访问
+        集群之前即被拒绝。提交作业后代码空间保持 starting，直到 get_status 发现 Pod 已
+        就绪才转换到 running。
 
+        :return: 是否由本次调用启动，代码空间已在启动或运行中时返回 False
+        """
+        from core import CLUSTER
+
+        # 检查时间配额并取得启动权，starting 期间 last_start 为提交启动的时间
+        try:
+            await TABLE.transition(
+                sid,
+                (CodespaceStatus.STOPPED, CodespaceStatus.FAILED),
+                CodespaceStatus.STARTING,
+                {"codespace.last_start": datetime.now().timestamp()},
+                check_quota=True,
+            )
         except StudentNotFoundError:
             LOGGERR.error(f"找不到学生: {sid}")
             raise
         except CodespaceQuotaExceededError:
             LOGGERR.error(f"学生代码空间配额已用尽: {sid}")
             raise
+        except CodespaceTransitionError as e:
+            LOGGERR.info(f"代码空间已经在启动或运行中: {sid}, 状态: {e.current}")
+            return False
+
+        job_params = cls.build_job_params(sid)
+        try:
+            # 提交作业到集群
+            LOGGERR.info(f"正在启动学生代码空间: {sid}")
+            job_info = await CLUSTER.submit_job(job_params)
+            await cls._forget_job_status(job_params.name)
         except Exception as e:
             LOGGERR.error(f"启动学生代码空间失败: {sid}, 错误: {e}")
-            # 确保发生错误时代码空间状态被设置为stopped
+            # 放弃启动，确保代码空间状态回到stopped
             try:
-                student = await TABLE.read(sid)
-                student.codespace.status = "stopped"
-                await TABLE.write(student)
-            except:
+                await TABLE.transition(
+                    sid, (CodespaceStatus.STARTING,), CodespaceStatus.STOPPED
+                )
+            except Error:
                 pass
             raise CodespaceStartError(sid, str(e))
 
-    @classmethod
-    async def stop(cls, sid: str) -> None:
-        """停止代码空间"""
-        from core import CLUSTER
-
+        # 记录访问地址，代码空间在 Pod 就绪前保持 starting
         try:
-            # 获取学生信息
-            student = await TABLE.read(sid)
-            job_param = cls.build_job_params(sid)
+            try:
+                await TABLE.transition(
+                    sid,
+                    (CodespaceStatus.STARTING,),
+                    CodespaceStatus.STARTING,
+                    {"codespace.url": job_info.service_url},
+                )
+            except CodespaceTransitionError as e:
+                # 期间 get_status 可能已根据集群状态把 starting 改为 running
+                if e.current != CodespaceStatus.RUNNING.value:
+                    raise
+                await TABLE.update(sid, {"codespace.url": job_info.service_url})
+        except (StudentNotFoundError, CodespaceTransitionError) as e:
+            # 启动期间代码空间被停止或学生被删除，回收刚提交的作业
+            LOGGERR.warning(f"代码空间在启动期间被停止: {sid}, {e}")
+            try:
+                await CLUSTER.delete_job(job_params.name)
+            except Exception as e:
+                LOGGERR.error(f"回收代码空间作业失败: {sid}, 错误: {e}")
+            raise CodespaceStartError(sid, "代码空间在启动期间被停止")
 
-            # 如果代码空间已经停止，则无需操作
-            if student.codespace.status == "stopped":
-                LOGGERR.info(f"代码空间已经停止: {sid}")
-                return
+        LOGGERR.info(f"学生代码空间已提交，等待就绪: {sid}, job_id: {job_info.id}")
+        return True
 
-            # 调用集群接口停止作业
-            LOGGERR.info(f"正在停止学生代码空间: {sid}, job_id: {job_param.name}")
-            await CLUSTER.delete_job(job_param.name)
+    @classmethod
+    async def stop(cls, sid: str) -> bool:
+        """停止代码空间
 
-            # 更新代码空间信息
-            now = datetime.now().timestamp()
-            student.codespace.status = "stopped"
-            student.codespace.url = ""
-            student.codespace.last_stop = now
-
-            # 计算本次使用的时间并更新总使用时间
-            if student.codespace.last_start > 0:
-                used_time = now - max(
-                    student.codespace.last_start, student.codespace.last_watch
-                )
-                student.codespace.time_used += used_time
-                LOGGERR.info(
-                    f"代码空间使用时间更新: {sid}, +{used_time}秒, 总计{student.codespace.time_used}秒"
-                )
+        先原子地转换到 stopped 并结算使用时间，再删除集群作业，并发的停止请求只有一个
+        会访问集群。
 
-            # 保存更新后的学生信息
-            await TABLE.write(student)
-            LOGGERR.info(f"学生代码空间停止成功: {sid}")
+        :return: 是否由本次调用停止，代码空间已经停止时返回 False
+        """
+        from core import CLUSTER
 
+        now = datetime.now().timestamp()
+        try:
+            time_used, _ = await TABLE.transition(
+                sid,
+                (
+                    CodespaceStatus.RUNNING,
+                    CodespaceStatus.STARTING,
+                    CodespaceStatus.FAILED,
+                ),
+                CodespaceStatus.STOPPED,
+                {"codespace.url": "", "codespace.last_stop": now},
+                charge=True,
+                now=now,
+            )
         except StudentNotFoundError:
             LOGGERR.error(f"找不到学生: {sid}")
             raise
+        except CodespaceTransitionError:
+            LOGGERR.info(f"代码空间已经停止: {sid}")
+            return False
+        LOGGERR.info(f"代码空间使用时间更新: {sid}, 总计{time_used}秒")
+
+        # 调用集群接口停止作业
+        job_param = cls.build_job_params(sid)
+        try:
+            LOGGERR.info(f"正在停止学生代码空间: {sid}, job_id: {job_param.name}")
+            await CLUSTER.delete_job(job_param.name)
+        except cluster.JobNotFoundError:
+            # 作业已不存在，代码空间已经停止
+            LOGGERR.warning(f"代码空间作业不存在: {sid}, job_id: {job_param.name}")
         except Exception as e:
             LOGGERR.error(f"停止学生代码空间失败: {sid}, 错误: {e}")
-            try:
-                # 尝试更新状态为stopped，确保一致性
-                student = await TABLE.read(sid)
-                student.codespace.status = "stopped"
-                await TABLE.write(student)
-            except:
-                pass
+            await cls._restore_running(sid, now)
             raise CodespaceStopError(sid, str(e))
+        await cls._forget_job_status(job_param.name)
+
+        LOGGERR.info(f"学生代码空间停止成功: {sid}")
+        return True
+
+    @classmethod
+    async def _restore_running(cls, sid: str, now: float) -> None:
+        """删除作业失败时把代码空间恢复到 running，使停止可以被重试
+
+        使用时间已结算到 now，从 now 起重新计费；活动集合恢复停止前的最后活动时间，
+        空闲回收因此会再次选中它。作业的实际状态由下一次 get_status 修正。
+        """
+        from core import DB_STU
+
+        try:
+            await TABLE.transition(
+                sid,
+                (CodespaceStatus.STOPPED,),
+                CodespaceStatus.RUNNING,
+                {"codespace.last_start": now, "codespace.last_watch": now},
+            )
+            last_active = (await TABLE.read(sid)).codespace.last_active
+            await DB_STU.zadd(_ACTIVITY_KEY, {sid: last_active}, xx=True)
+        except Exception as e:
+            LOGGERR.error(f"恢复代码空间运行状态失败: {sid}, 错误: {e}")
 
     @classmethod
     async def get_status(cls, sid: str) -> str:
-        """获取代码空间状态"""
+        """获取代码空间状态，在请求范围内最多访问集群一次"""
         from core import CLUSTER
 
+        if (status := MEMO.get("status", sid)) is not None:
+            return status
+
         try:
             # 获取学生信息
             student = await TABLE.read(sid)
@@ -486,39 +1342,24 @@ class CODESPACE:
 
             # 如果数据库中记录的状态是stopped或None，直接返回
             if status == "stopped" or status is None:
+                MEMO.put("status", sid, status)
                 return status
 
             try:
                 # 从集群获取作业状态
-                job_status = await CLUSTER.get_job_status(job_id)
-
-                # 映射集群作业状态到代码空间状态
-                if job_status == cluster.JobInfo.Status.RUNNING:
-                    status = "running"
-                elif job_status == cluster.JobInfo.Status.STARTING:
-                    status = "starting"
-                elif job_status == cluster.JobInfo.Status.SUSPENDED:
-                    status = "stopped"
-                elif job_status == cluster.JobInfo.Status.FAILED:
-                    LOGGERR.error(f"代码空间作业失败: {sid}, job_id: {job_id}")
-                    status = "failed"
-                else:
-                    status = "pending"
-
-                # 更新学生代码空间状态
-                student.codespace.status = status
-                await TABLE.write(student)
-                LOGGERR.info(f"获取代码空间状态成功: {sid}, 状态: {status}")
-                return status
-
+                job_status = await cls._job_status(job_id)
+                status = cls._map_job_status(sid, job_id, job_status)
             except Exception as e:
                 # 获取作业状态失败，假设作业不存在或已停止
                 LOGGERR.warning(
                     f"获取代码空间作业状态失败: {sid}, job_id: {job_id}, 错误: {e}"
                 )
-                student.codespace.status = "stopped"
-                await TABLE.write(student)
-                return "stopped"
+                status = cls._missing_job_status(student)
+
+            status = await cls._reconcile(student, status)
+            LOGGERR.info(f"获取代码空间状态成功: {sid}, 状态: {status}")
+            MEMO.put("status", sid, status)
+            return status
 
         except StudentNotFoundError:
             LOGGERR.error(f"找不到学生: {sid}")
@@ -527,6 +1368,172 @@ class CODESPACE:
             LOGGERR.error(f"获取代码空间状态失败: {sid}, 错误: {e}")
             return "error"
 
+    @classmethod
+    async def get_statuses(cls, sids: Iterable[str]) -> dict[str, str]:
+        """批量获取代码空间状态，所有需要访问集群的学生共用一次集群调用
+
+        结果与逐个调用 get_status 相同，不存在的学生不出现在结果中。集群调用失败时
+        返回数据库中记录的状态，不据此停止代码空间。
+        """
+        from core import CLUSTER
+
+        statuses: dict[str, str] = {}
+        unknown = []
+        for sid in sids:
+            if (status := MEMO.get("status", sid)) is not None:
+                statuses[sid] = status
+            else:
+                unknown.append(sid)
+
+        # 记录为 stopped 的代码空间不需要访问集群
+        pending: dict[str, Student] = {}
+        for student in await TABLE.read_many(unknown):
+            status = student.codespace.status
+            if status == "stopped" or status is None:
+                statuses[student.sid] = status
+                MEMO.put("status", student.sid, status)
+            else:
+                pending[cls.build_job_params(student.sid).name] = student
+        if not pending:
+            return statuses
+
+        try:
+            job_statuses = await CLUSTER.get_job_statuses(pending)
+        except Exception as e:
+            LOGGERR.warning(f"批量获取代码空间作业状态失败: {e}")
+            for student in pending.values():
+                statuses[student.sid] = student.codespace.status
+            return statuses
+
+        async def reconcile(job_id: str, student: Student):
+            sid = student.sid
+            job_status = job_statuses.get(job_id)
+            # 作业不存在，与 get_status 相同地处理
+            status = (
+                cls._missing_job_status(student)
+                if job_status is None
+                else cls._map_job_status(sid, job_id, job_status)
+            )
+            try:
+                status = await cls._reconcile(student, status)
+            except StudentNotFoundError:
+                return
+            except Exception as e:
+                LOGGERR.error(f"获取代码空间状态失败: {sid}, 错误: {e}")
+                status = "error"
+            else:
+                MEMO.put("status", sid, status)
+            statuses[sid] = status
+
+        await asyncio.gather(*(reconcile(k, v) for k, v in pending.items()))
+        LOGGERR.info(
+            f"批量获取代码空间状态: {len(statuses)} 个, 访问集群 {len(pending)} 个"
+        )
+        return statuses
+
+    @staticmethod
+    def _map_job_status(
+        sid: str, job_id: str, job_status: cluster.JobInfo.Status
+    ) -> str:
+        """映射集群作业状态到代码空间状态"""
+        if job_status == cluster.JobInfo.Status.RUNNING:
+            return "running"
+        elif job_status == cluster.JobInfo.Status.STARTING:
+            return "starting"
+        elif job_status == cluster.JobInfo.Status.SUSPENDED:
+            return "stopped"
+        elif job_status == cluster.JobInfo.Status.FAILED:
+            LOGGERR.error(f"代码空间作业失败: {sid}, job_id: {job_id}")
+            return "failed"
+        else:
+            # 作业已提交但尚未就绪，按启动中处理
+            return "starting"
+
+    @staticmethod
+    def _missing_job_status(student: Student) -> str:
+        """集群中找不到作业时的代码空间状态
+
+        刚取得启动权的代码空间可能尚未提交作业，在 START_TIMEOUT 内仍视为启动中，
+        避免把正在进行的启动误判为已停止。
+        """
+        from config import CONFIG
+
+        codespace = student.codespace
+        if (
+            codespace.status == CodespaceStatus.STARTING
+            and datetime.now().timestamp() - codespace.last_start
+            < CONFIG.CLUSTER.Codespace.START_TIMEOUT
+        ):
+            return "starting"
+        return "stopped"
+
+    @classmethod
+    async def _reconcile(cls, student: Student, status: str) -> str:
+        """状态变化时更新学生代码空间状态，期间状态被其他请求改变时以其为准
+
+        进入 running 时从 Pod 就绪的时间开始计费，而不是观察到就绪的时间，启动期间不计入
+        使用时间；无法确定就绪时间时从当前时间开始。空闲时间从当前时间开始计算。
+        """
+        sid, recorded = student.sid, student.codespace.status
+        if status == recorded:
+            return status
+        fields: dict[str, str | float] = {}
+        if status == "stopped":
+            fields["codespace.url"] = ""
+        elif status == "running":
+            now = datetime.now().timestamp()
+            since = await cls._ready_time(sid)
+            since = now if since is None else min(since, now)
+            since = max(since, student.codespace.last_start)
+            fields["codespace.last_start"] = since
+            fields["codespace.last_active"] = now
+            fields["codespace.last_watch"] = since
+        try:
+            await TABLE.transition(sid, (recorded,), status, fields, charge=True)
+        except CodespaceTransitionError as e:
+            return e.current
+        return status
+
+    @classmethod
+    async def _ready_time(cls, sid: str) -> float | None:
+        """代码空间的 Pod 就绪的时间，无法获取时返回 None"""
+        from core import CLUSTER
+
+        job_name = cls.build_job_params(sid).name
+        try:
+            return await CLUSTER.get_ready_time(job_name)
+        except Exception as e:
+            LOGGERR.warning(f"获取代码空间就绪时间失败: {sid}, 错误: {e}")
+            return None
+
+    @classmethod
+    async def get_progress(cls, sid: str) -> dict[str, Any]:
+        """获取代码空间状态和启动进度
+
+        :return: status 为代码空间状态；phase 为启动阶段（见 cluster.JobInfo.Phase），
+            只在 starting 和 running 时有值；message 为启动阶段的说明，如调度失败的原因
+        """
+        from core import CLUSTER
+
+        status = await cls.get_status(sid)
+        phase = message = None
+        if status == "running":
+            phase = cluster.JobInfo.Phase.READY.value
+        elif status == "starting":
+            job_id = cls.build_job_params(sid).name
+            try:
+                job_info = await CLUSTER.get_job_info(job_id)
+            except cluster.JobNotFoundError:
+                # 作业尚未提交
+                phase = cluster.JobInfo.Phase.SCHEDULING.value
+            except Exception as e:
+                LOGGERR.warning(f"获取代码空间启动进度失败: {sid}, 错误: {e}")
+            else:
+                if job_info.phase is not None:
+                    phase = cluster.JobInfo.Phase(job_info.phase).value
+                message = job_info.message
+        return {"status": status, "phase": phase, "message": message}
+
     @classmethod
     async def get_url(cls, sid: str) -> str | bool:
         """获取代码空间URL
@@ -537,11 +1544,9 @@ class CODESPACE:
             False: 代码空间已停止或不可用
         """
         try:
-            # 获取学生信息
-            student = await TABLE.read(sid)
-
-            # 获取当前代码空间状态
+            # 先获取状态，其中的状态转换会使记录失效，之后读取的是最新记录
             status = await cls.get_status(sid)
+            student = await TABLE.read(sid)
 
             if status == "stopped":
                 return False
@@ -563,9 +1568,8 @@ class CODESPACE:
                 try:
                     job_info = await CLUSTER.get_job_info(job_param.name)
                     if job_info.service_url:
-                        student.codespace.url = job_info.service_url
-                        await TABLE.write(student)
-                        return student.codespace.url
+                        await TABLE.update(sid, {"codespace.url": job_info.service_url})
+                        return job_info.service_url
                     else:
                         LOGGERR.warning(f"代码空间没有可用的URL: {sid}")
                         # 继续尝试，不立即返回False
@@ -660,6 +1664,16 @@ class CODESPACE:
                 "PASSWORD": api_key_enc(sid),
                 "SUDO_PASSWORD": api_key_enc(sid),
                 "STUDENT_API_KEY": api_key_enc(sid),
+                **(
+                    {
+                        "CENTRAL_CONTROL": CONFIG.CLUSTER.Codespace.CENTRAL_CONTROL,
+                        "YatCC_KEEPALIVE_INTERVAL": str(
+                            CONFIG.CLUSTER.Codespace.KEEPALIVE_INTERVAL
+                        ),
+                    }
+                    if CONFIG.CLUSTER.Codespace.CENTRAL_CONTROL
+                    else {}
+                ),
                 **kwargs.get("env", {}),
             },
             user_id=sid,
@@ -678,24 +1692,21 @@ class CODESPACE:
     async def watch(cls, sid: str) -> None:
         """监控代码空间活动状态，更新最后活动时间，停止空闲作业"""
         try:
-            student = await TABLE.read(sid)
-            if student.codespace.status != CodespaceStatus.RUNNING:
-                return
-
-            now = datetime.now().timestamp()
+            # running -> running 的转换结算自上次检查以来的使用时间
+            time_used, time_quota = await TABLE.transition(
+                sid,
+                (CodespaceStatus.RUNNING,),
+                CodespaceStatus.RUNNING,
+                charge=True,
+            )
 
             # 检查是否超出时间配额
-            if student.codespace.time_quota > 0:
-                current_usage = now - max(
-                    student.codespace.last_start, student.codespace.last_watch
-                )
-                student.codespace.last_watch = now
-                student.codespace.time_used += current_usage
-                await TABLE.write(student)
-                if student.codespace.time_used >= student.codespace.time_quota:
-                    LOGGERR.info(f"学生 {sid} 代码空间因超出配额将被停止。")
-                    await cls.stop(sid)
+            if time_quota > 0 and time_used >= time_quota:
+                LOGGERR.info(f"学生 {sid} 代码空间因超出配额将被停止。")
+                await cls.stop(sid)
 
+        except CodespaceTransitionError:
+            pass
         except StudentNotFoundError:
             LOGGERR.warning(f"监控期间找不到学生 {sid}，跳过。")
         except Exception as e:
@@ -703,13 +1714,316 @@ class CODESPACE:
 
     @classmethod
     async def watch_all(cls) -> None:
-        """监控所有学生的代码空间"""
-        sids = await TABLE.all_ids()
+        """监控所有学生的代码空间
+
+        先用一次集群调用核对所有启动中和运行中的代码空间，Pod 已就绪的转换到 running，
+        作业已退出的转换到相应状态，再监控仍在运行的代码空间。
+        """
+        sids = await TABLE.ids_by_status(CodespaceStatus.RUNNING)
+        sids += await TABLE.ids_by_status(CodespaceStatus.STARTING)
+        statuses = await cls.get_statuses(sids)
+        sids = [
+            sid
+            for sid, status in statuses.items()
+            if status == CodespaceStatus.RUNNING.value
+        ]
         tasks = [cls.watch(sid) for sid in sids]
         await asyncio.gather(*tasks)
 
     @classmethod
-    async def keep_alive(cls, sid: str) -> None:
-        """保持代码空间活跃，更新最后活动时间"""
-        # TODO
-        pass
+    async def schedule_starting(cls) -> None:
+        """每 CONFIG.CORE.codespace_starting_interval 秒核对启动中的代码空间
+
+        Pod 就绪的代码空间及时转换到 running 并进入配额调度和空闲回收，而不是等到学生查询
+        状态或下一次 watch_all。没有启动中的代码空间时只读取一次状态索引，不访问集群。
+        """
+        from config import CONFIG
+
+        while (interval := CONFIG.CORE.codespace_starting_interval) > 0:
+            try:
+                if sids := await TABLE.ids_by_status(CodespaceStatus.STARTING):
+                    await cls.get_statuses(sids)
+            except Exception as e:
+                LOGGERR.error(f"核对启动中的代码空间失败: {e}")
+            await asyncio.sleep(interval)
+
+    @classmethod
+    async def enforce_quotas(cls) -> float | None:
+        """停止所有已到配额耗尽时间的代码空间，返回下一个截止时间，没有时返回 None"""
+        from core import DB_STU
+
+        now = datetime.now().timestamp()
+        due = await DB_STU.zrangebyscore(_DEADLINE_KEY, "-inf", now)
+        if due:
+            LOGGERR.info(f"{len(due)} 个代码空间到达配额耗尽时间")
+            await asyncio.gather(*(cls.watch(sid.decode()) for sid in due))
+        first = await DB_STU.zrange(_DEADLINE_KEY, 0, 0, withscores=True)
+        return first[0][1] if first else None
+
+    @classmethod
+    async def schedule_quotas(cls) -> None:
+        """按截止时间执行时间配额
+
+        睡眠到最早的截止时间，只检查到期的代码空间。启动代码空间或调整配额使最早的截止
+        时间提前时，调度器从唤醒列表被唤醒并重新计算等待时间；没有截止时间时只阻塞在
+        Redis 上，不产生其它开销。
+        """
+        from core import DB_STU
+
+        from config import CONFIG
+
+        while True:
+            max_wait = CONFIG.CORE.quota_schedule_max_wait
+            try:
+                deadline = await cls.enforce_quotas()
+            except Exception as e:
+                LOGGERR.error(f"执行代码空间时间配额失败: {e}")
+                deadline = None
+            wait = max_wait
+            if deadline is not None:
+                wait = deadline - datetime.now().timestamp() + _DEADLINE_MARGIN
+                wait = min(max(wait, _DEADLINE_MARGIN), max_wait)
+            try:
+                await DB_STU.blpop([_DEADLINE_WAKE_KEY], timeout=wait)
+            except redis.RedisError as e:
+                LOGGERR.warning(f"等待代码空间截止时间失败: {e}")
+                await asyncio.sleep(wait)
+
+    @classmethod
+    async def keep_alive(cls, sid: str) -> bool:
+        """记录代码空间的一次活动，在一次往返中执行 ZADD 和 ZSCORE
+
+        只更新活动集合中已有的成员，即运行中的代码空间。分数未变化时 ZADD 的返回值同样
+        为 0，因此以成员是否存在判断代码空间是否在运行。
+
+        :return: 代码空间是否在运行
+        """
+        from core import DB_STU
+
+        now = datetime.now().timestamp()
+        pipe = DB_STU.pipeline(transaction=False)
+        pipe.zadd(_ACTIVITY_KEY, {sid: now}, xx=True)
+        pipe.zscore(_ACTIVITY_KEY, sid)
+        _, score = await pipe.execute()
+        return score is not None
+
+    @classmethod
+    async def reap_idle(cls) -> float | None:
+        """分批停止无活动超过 CONFIG.CORE.codespace_idle_timeout 的代码空间
+
+        删除作业失败的代码空间被恢复到运行状态并留在活动集合中，本轮后续批次跳过它们，
+        在 CONFIG.CORE.codespace_reap_retry_interval 后重试。
+
+        :return: 下一个代码空间可能空闲超时的时间，没有运行中的代码空间时返回 None
+        """
+        from core import DB_STU
+
+        from config import CONFIG
+
+        timeout = CONFIG.CORE.codespace_idle_timeout
+        batch_size = CONFIG.CORE.codespace_reap_batch_size
+        failed: set[str] = set()
+        while True:
+            cutoff = datetime.now().timestamp() - timeout
+            # 失败的成员未被移除，多取出相应数量后排除它们，以免反复重试同一批
+            num = batch_size + len(failed)
+            idle = [
+                sid.decode()
+                for sid in await DB_STU.zrangebyscore(
+                    _ACTIVITY_KEY, "-inf", cutoff, start=0, num=num
+                )
+            ]
+            batch = [sid for sid in idle if sid not in failed]
+            if not batch:
+                break
+            LOGGERR.info(f"停止 {len(batch)} 个空闲的代码空间")
+            stopped = 0
+
+            async def stop_one(sid: str):
+                nonlocal stopped
+                try:
+                    if await cls.stop(sid):
+                        stopped += 1
+                    else:
+                        # 代码空间已不在运行，清除遗留的成员
+                        await DB_STU.zrem(_ACTIVITY_KEY, sid)
+                except StudentNotFoundError:
+                    await DB_STU.zrem(_ACTIVITY_KEY, sid)
+                except Exception as e:
+                    failed.add(sid)
+                    LOGGERR.error(f"停止空闲的代码空间失败: {sid}, 错误: {e}")
+
+            await BATCH._fan_out(batch, stop_one)
+            LOGGERR.info(f"已停止 {stopped} 个空闲的代码空间")
+            if len(idle) < num:
+                break
+
+        first = await DB_STU.zrange(_ACTIVITY_KEY, 0, 0, withscores=True)
+        if not first:
+            return None
+        next_idle = first[0][1] + timeout
+        if failed:
+            retry = CONFIG.CORE.codespace_reap_retry_interval
+            next_idle = max(next_idle, datetime.now().timestamp() + retry)
+        return next_idle
+
+    @classmethod
+    async def schedule_idle_reaping(cls) -> None:
+        """睡眠到最早可能空闲超时的时间后回收空闲的代码空间
+
+        心跳只会推后空闲超时时间，新进入运行状态的代码空间至少在一个超时时长后才会空闲，
+        因此不需要被唤醒。没有配置 CONFIG.CLUSTER.Codespace.CENTRAL_CONTROL 时代码空间
+        不会上报心跳，活动时间停留在启动时，因此不回收。
+        """
+        from config import CONFIG
+
+        if CONFIG.CLUSTER.Codespace.CENTRAL_CONTROL is None:
+            LOGGERR.info("代码空间不上报心跳，不回收空闲的代码空间")
+            return
+        while (timeout := CONFIG.CORE.codespace_idle_timeout) > 0:
+            try:
+                next_idle = await cls.reap_idle()
+            except Exception as e:
+                LOGGERR.error(f"回收空闲的代码空间失败: {e}")
+                next_idle = None
+            wait = timeout
+            if next_idle is not None:
+                wait = min(max(next_idle - datetime.now().timestamp(), 1.0), timeout)
+            await asyncio.sleep(wait)
+
+
+# ==================================================================================== #
+
+
+class BATCH:
+    """管理员的批量操作，逐项结果记录在 progress 中
+
+    参数都是可以 JSON 序列化的，因此既可以在请求中同步执行，也可以作为后台任务执行。
+    """
+
+    @classmethod
+    async def create(cls, students: list[dict], progress: BatchProgress) -> None:
+        """批量创建学生
+
+        :param students: 每项包含 id、name、mail、pwd、time_quota
+        """
+        progress.total(len(students), "创建学生")
+        await TABLE.create_many(
+            [
+                Student(
+                    sid=item["id"],
+                    user_info=UserInfo(name=item["name"], mail=item["mail"]),
+                    codespace=CodespaceInfo(time_quota=item["time_quota"]),
+                )
+                for item in students
+            ],
+            [item["pwd"] for item in students],
+            progress,
+        )
+
+    @classmethod
+    async def delete(cls, sids: list[str], progress: BatchProgress) -> None:
+        """批量删除学生"""
+        progress.total(len(sids), "删除学生")
+        for sid in sids:
+            try:
+                if await TABLE.delete(sid):
+                    progress.succeed(sid)
+                else:
+                    progress.fail(sid, "学生不存在或集群资源释放失败")
+            except Exception as e:
+                progress.fail(sid, str(e))
+
+    @classmethod
+    async def _fan_out(cls, sids: list[str], func) -> None:
+        """对每个学生并发执行 func，并发数由 CONFIG.CORE.codespace_batch_concurrency 限制，
+        集群 API 的调用速率另由集群层的限速器限制"""
+        from config import CONFIG
+
+        sem = asyncio.Semaphore(CONFIG.CORE.codespace_batch_concurrency)
+
+        async def run(sid: str):
+            async with sem:
+                await func(sid)
+
+        await asyncio.gather(*(run(sid) for sid in sids))
+
+    @classmethod
+    async def start(cls, sids: list[str], progress: BatchProgress) -> None:
+        """批量启动代码空间"""
+
+        progress.total(len(sids), "启动代码空间")
+        statuses = await CODESPACE.get_statuses(sids)
+
+        async def start_one(sid: str):
+            try:
+                if (status := statuses.get(sid)) is None:
+                    progress.fail(sid, "学生不存在")
+                elif status == CodespaceStatus.RUNNING.value:
+                    progress.fail(sid, "代码空间已在运行")
+                elif not await CODESPACE.start(sid):
+                    progress.fail(sid, "代码空间已在运行")
+                else:
+                    progress.succeed(sid)
+            except StudentNotFoundError:
+                progress.fail(sid, "学生不存在")
+            except CodespaceQuotaExceededError:
+                progress.fail(sid, "代码空间配额已耗尽")
+            except Exception as e:
+                progress.fail(sid, str(e))
+
+        await cls._fan_out(sids, start_one)
+        LOGGERR.info(
+            f"批量启动代码空间: 成功 {len(progress.success)}, "
+            f"失败 {len(progress.failed)}, 耗时 {progress.elapsed():.2f} 秒"
+        )
+
+    @classmethod
+    async def stop(cls, sids: list[str], progress: BatchProgress) -> None:
+        """批量停止代码空间"""
+
+        progress.total(len(sids), "停止代码空间")
+        statuses = await CODESPACE.get_statuses(sids)
+
+        async def stop_one(sid: str):
+            try:
+                if (status := statuses.get(sid)) is None:
+                    progress.fail(sid, "学生不存在")
+                elif status == CodespaceStatus.STOPPED.value:
+                    progress.fail(sid, "代码空间不在运行")
+                elif not await CODESPACE.stop(sid):
+                    progress.fail(sid, "代码空间不在运行")
+                else:
+                    progress.succeed(sid)
+            except StudentNotFoundError:
+                progress.fail(sid, "学生不存在")
+            except Exception as e:
+                progress.fail(sid, str(e))
+
+        await cls._fan_out(sids, stop_one)
+        LOGGERR.info(
+            f"批量停止代码空间: 成功 {len(progress.success)}, "
+            f"失败 {len(progress.failed)}, 耗时 {progress.elapsed():.2f} 秒"
+        )
+
+    @classmethod
+    async def set_quota(
+        cls, sids: list[str], time_quota: int, progress: BatchProgress
+    ) -> None:
+        """批量调整代码空间时间配额"""
+        progress.total(len(sids), "调整代码空间配额")
+        for sid in sids:
+            try:
+                await TABLE.update(sid, {"codespace.time_quota": time_quota})
+                progress.succeed(sid)
+            except StudentNotFoundError:
+                progress.fail(sid, "学生不存在")
+            except Exception as e:
+                progress.fail(sid, str(e))
+
+
+JOB.register("student.create", BATCH.create)
+JOB.register("student.delete", BATCH.delete)
+JOB.register("codespace.start", BATCH.start)
+JOB.register("codespace.stop", BATCH.stop)
+JOB.register("codespace.quota", BATCH.set_quota)
@@ -77,6 +77,20 @@ async def start() -> None:
                 raise TimeoutError(PROGRESS("Redis 服务启动超时", logger=LOGGER))
             PROGRESS("Redis 服务已就绪", logger=LOGGER)
 
+        with PROGRESS["检查学生索引", LOGGER]:
+            from core import student
+
+            if await student.TABLE.migrate():
+                PROGRESS("学生索引已重建", logger=LOGGER)
+            else:
+                PROGRESS("学生索引已是最新")
+
+        with PROGRESS["检查后台任务", LOGGER]:
+            from core.job import JOB
+
+            if interrupted := await JOB.recover():
+                PROGRESS(f"{interrupted} 个中断的后台任务已标记为失败", logger=LOGGER)
+
     # integrity_check = False
     # if CONFIG.ENTRY.startup_integrity_check is None:
     #     if not await core.INTEGRITY.get():
@@ -136,6 +150,12 @@ async def start() -> None:
 
     ######
     aio.create_task(run(), name="watcher")
+    aio.create_task(student.CODESPACE.schedule_quotas(), name="quotas")
+    aio.create_task(student.CODESPACE.schedule_idle_reaping(), name="reaper")
+    aio.create_task(student.CODESPACE.schedule_starting(), name="starting")
+    aio.create_task(core.CLUSTER.rollout_image(), name="image-rollout")
+    aio.create_task(JOB.serve(), name="jobs")
+    # 任务处理函数在 core.student 中注册，上面检查学生索引时已导入
 
 
 async def stop():
@@ -177,12 +197,13 @@ async def run():
 
     await aio.sleep(3)  # 等待服务就绪
 
+    # 时间配额由 CODESPACE.schedule_quotas 按截止时间执行，这里只定期与集群核对状态
     while True:
         try:
             await student.CODESPACE.watch_all()
         except Exception as e:
             LOGGER.error(f"监控学生代码空间时发生错误: {e}")
-        await aio.sleep(60)  # 每60秒检查一次
+        await aio.sleep(CONFIG.ENTRY.default_watching_students_interval)
 
 
 # ==================================================================================== #
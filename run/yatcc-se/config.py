@@ -46,6 +46,42 @@ class Core(Configuration):
 
     default_admin_api_key = "SE!@2025"
 
+    read_batch_size = 500
+
+    student_cache_size = 4096
+    student_cache_ttl = 30.0
+
+    account_cache_size = 4096
+    account_cache_ttl = 300.0
+
+    provision_hash_concurrency = 8
+    provision_fs_concurrency = 16
+    provision_cluster_concurrency = 8
+    provision_db_concurrency = 32
+
+    password_workers = 2
+    password_slots = None
+    password_queue_limit = None
+    password_queue_timeout = 1.0
+    password_queue_poll = 0.01
+
+    job_concurrency = 2
+    job_ttl = 7 * 24 * 3600
+
+    codespace_batch_concurrency = 16
+
+    fs_workers = 8
+
+    job_status_share_ttl = 1.0
+    job_status_share_wait = 5.0
+
+    quota_schedule_max_wait = 60.0
+
+    codespace_idle_timeout = 30 * 60
+    codespace_reap_batch_size = 100
+    codespace_reap_retry_interval = 60.0
+    codespace_starting_interval = 5.0
+
 
 CONFIG.CORE = Core
 
@@ -61,6 +97,7 @@ CONFIG.SVC_STU = SvcStu
 class SvcAdm(Configuration):
 
     static_dir = "/app/adm-site"
+    student_page_size = 100
 
 
 CONFIG.SVC_ADM = SvcAdm
@@ -92,6 +129,11 @@ class ClusterConfig(Configuration):
         NAMESPACE = "default"
         KUBECONFIG_PATH = None
         TIMEOUT = 30
+        API_QPS = 20
+        API_BURST = 40
+        API_WORKERS = 16
+        INFORMER = True
+        WATCH_TIMEOUT = 300
 
     class Codespace(Configuration):
         """codespace 配置"""
@@ -101,6 +143,17 @@ class ClusterConfig(Configuration):
         DEFAULT_CPU_LIMIT = "500m"
         DEFAULT_MEMORY_LIMIT = "1Gi"
         DEFAULT_STORAGE_SIZE = "5Gi"
+        CENTRAL_CONTROL = None
+        KEEPALIVE_INTERVAL = 60
+        PREPULL = True
+        PREPULL_TIMEOUT = 1800
+        PROBE_PATH = "/healthz"
+        PROBE_PORT = 443
+        STARTUP_PROBE_PERIOD = 2
+        STARTUP_PROBE_TIMEOUT = 300
+        READINESS_PROBE_PERIOD = 10
+        READINESS_PROBE_FAILURES = 3
+        START_TIMEOUT = 600
         PORT = [
             {
                 "port": 80,
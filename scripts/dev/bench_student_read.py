@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+学生记录批量读取基准测试
+
+对比逐条 HMGET（旧 iter_all）与管道批量读取（TABLE.read_many）的 Redis 往返次数和耗时。
+
+用法:
+  python scripts/dev/bench_student_read.py
+  python scripts/dev/bench_student_read.py --students 10000 --batch-size 500 --db 15
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+import redis.asyncio
+from redis.asyncio.connection import Connection, UnixDomainSocketConnection
+
+ROUND_TRIPS = 0
+
+
+class CountingConnection(Connection):
+    async def send_packed_command(self, command, check_health=True):
+        global ROUND_TRIPS
+        ROUND_TRIPS += 1
+        return await super().send_packed_command(command, check_health)
+
+
+class CountingUnixConnection(UnixDomainSocketConnection):
+    async def send_packed_command(self, command, check_health=True):
+        global ROUND_TRIPS
+        ROUND_TRIPS += 1
+        return await super().send_packed_command(command, check_health)
+
+
+async def populate(db: redis.asyncio.Redis, n: int) -> None:
+    """写入 n 条合成学生记录"""
+    pipe = db.pipeline(transaction=False)
+    for i in range(n):
+        pipe.hset(
+            f"bench{i:08d}",
+            mapping={
+                "pwd_hash": "scrypt:32768:8:1$bench$" + "0" * 128,
+                "user_info.name": f"学生{i}",
+                "user_info.mail": f"bench{i}@example.com",
+                "codespace.status": "stopped",
+                "codespace.url": "",
+                "codespace.time_quota": 3600,
+                "codespace.time_used": 0,
+                "codespace.last_start": 0,
+                "codespace.last_stop": 0,
+                "codespace.last_active": 0,
+                "codespace.last_watch": 0,
+            },
+        )
+        if len(pipe) >= 1000:
+            await pipe.execute()
+    await pipe.execute()
+
+
+async def bench_before() -> int:
+    """旧实现：SCAN 后逐条 TABLE.read"""
+    from core import DB_STU
+    from core.student import TABLE, StudentNotFoundError
+
+    count = 0
+    async for sid in DB_STU.scan_iter(_type="HASH"):
+        try:
+            await TABLE.read(sid.decode())
+            count += 1
+        except StudentNotFoundError:
+            pass
+    return count
+
+
+async def bench_after(batch_size: int) -> int:
+    """新实现：TABLE.iter_all 按批次管道读取"""
+    from core.student import TABLE
+
+    count = 0
+    async for _ in TABLE.iter_all(batch_size=batch_size):
+        count += 1
+    return count
+
+
+async def main():
+    global ROUND_TRIPS
+
+    parser = argparse.ArgumentParser(description="学生记录批量读取基准测试")
+    parser.add_argument("--students", type=int, default=10000, help="合成学生数量")
+    parser.add_argument("--batch-size", type=int, default=500, help="管道批大小")
+    parser.add_argument("--db", type=int, default=15, help="使用的 Redis 数据库编号")
+    args = parser.parse_args()
+
+    import core
+    from config import CONFIG
+
+    db = redis.asyncio.Redis(**CONFIG.CORE.redis_init, db=args.db)
+    db.connection_pool.connection_class = (
+        CountingUnixConnection
+        if "unix_socket_path" in CONFIG.CORE.redis_init
+        else CountingConnection
+    )
+    core.DB_STU = db
+
+    if await db.dbsize():
+        print(f"❌ 数据库 {args.db} 非空，请指定空数据库")
+        return 1
+
+    try:
+        print(f"📝 写入 {args.students} 条合成学生记录...")
+        await populate(db, args.students)
+
+        for name, fn in [
+            ("before (逐条 HMGET)", bench_before),
+            (
+                f"after  (管道批量 {args.batch_size})",
+                lambda: bench_after(args.batch_size),
+            ),
+        ]:
+            ROUND_TRIPS = 0
+            t0 = time.perf_counter()
+            n = await fn()
+            dt = time.perf_counter() - t0
+            print(f"{name}: {n} 条记录, {ROUND_TRIPS} 次往返, {dt * 1000:.1f} ms")
+    finally:
+        await db.flushdb()
+        await db.aclose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+登录洪峰负载测试
+
+向学生服务并发发送大量登录请求，同时持续请求一个非登录接口（GET /user），统计非登录接口
+在洪峰期间的延迟分位数，以及登录请求的状态码分布。
+
+用法:
+  python scripts/dev/load_login_burst.py --sid 22335009 --pwd 123456
+  python scripts/dev/load_login_burst.py --url http://127.0.0.1:5002 --logins 500 --concurrency 64
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+
+def request(
+    url: str, data: dict | None = None, headers: dict = {}
+) -> tuple[int, bytes]:
+    """发送请求，返回状态码和响应体"""
+    body = json.dumps(data).encode() if data is not None else None
+    req = urllib.request.Request(
+        url,
+        data=body,
+        headers={"Content-Type": "application/json", **headers},
+        method="POST" if data is not None else "GET",
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=120) as resp:
+            return resp.status, resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="登录洪峰负载测试")
+    parser.add_argument("--url", default="http://127.0.0.1:5002", help="学生服务地址")
+    parser.add_argument("--sid", required=True, help="已存在的学生学号")
+    parser.add_argument("--pwd", required=True, help="该学生的密码")
+    parser.add_argument("--logins", type=int, default=500, help="登录请求数量")
+    parser.add_argument("--concurrency", type=int, default=64, help="登录并发数")
+    parser.add_argument("--probes", type=int, default=4, help="非登录请求并发数")
+    args = parser.parse_args()
+
+    login = {"sid": args.sid, "pwd": args.pwd}
+
+    # 洪峰前先取得 API-KEY
+    while True:
+        status, body = request(args.url + "/login", login)
+        if status == 200:
+            break
+        if status != 503:
+            print(f"❌ 登录失败: {status} {body!r}")
+            return 1
+        time.sleep(1)
+    headers = {"X-API-KEY": body.decode()}
+
+    done = threading.Event()
+    latencies: list[float] = []
+    probe_errors = Counter()
+
+    def probe():
+        while not done.is_set():
+            t0 = time.perf_counter()
+            status, _ = request(args.url + "/user", headers=headers)
+            latencies.append(time.perf_counter() - t0)
+            if status != 200:
+                probe_errors[status] += 1
+
+    def do_login(_) -> int:
+        return request(args.url + "/login", login)[0]
+
+    with ThreadPoolExecutor(args.probes) as probes:
+        for _ in range(args.probes):
+            probes.submit(probe)
+        time.sleep(0.5)
+        latencies.clear()
+
+        print(f"🚀 发送 {args.logins} 个登录请求，并发 {args.concurrency}...")
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            login_status = Counter(pool.map(do_login, range(args.logins)))
+        elapsed = time.perf_counter() - t0
+        done.set()
+
+    print(f"登录: {dict(login_status)}, 耗时 {elapsed:.2f} s")
+    print(
+        f"GET /user: {len(latencies)} 次, "
+        f"p50 {percentile(latencies, 0.50) * 1000:.1f} ms, "
+        f"p95 {percentile(latencies, 0.95) * 1000:.1f} ms, "
+        f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms, "
+        f"max {max(latencies) * 1000:.1f} ms"
+    )
+    if probe_errors:
+        print(f"GET /user 错误: {dict(probe_errors)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
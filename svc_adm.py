@@ -1,4 +1,5 @@
 import asyncio as aio
+import os
 from uuid import uuid4
 
 from flask import Response, g, redirect, request
@@ -8,7 +9,8 @@ from pydantic import BaseModel, Field, RootModel
 from config import CONFIG, ENVIRON
 from base.logger import logger
 from base import RUNNER
-from core import admin, student
+import core
+from core import admin, job, student
 
 LOGGER = logger(__spec__, __file__)
 
@@ -18,8 +20,13 @@ class AsyncFlask(OpenAPI):
     def async_to_sync(self, func):
         import contextvars
 
+        async def scoped(*args, **kwargs):
+            # 同一请求内学生记录和代码空间状态各最多获取一次
+            with student.MEMO.scope():
+                return await func(*args, **kwargs)
+
         def wrapper(*args, **kwargs):
-            return context.run(loop.run_until_complete, func(*args, **kwargs))
+            return context.run(loop.run_until_complete, scoped(*args, **kwargs))
 
         context = contextvars.copy_context()
         loop = RUNNER.get_loop()
@@ -83,7 +90,7 @@ async def check_api_key():
             )
         )
 
-    if not api_key == await admin.API_KEY.get():
+    if not await admin.API_KEY.check(api_key):
         raise ErrorResponse(
             Response(
                 "FORBIDDEN: incorrect API-KEY",
@@ -98,6 +105,33 @@ _CHECK_API_KEY_RESPONSES = {
 }
 
 
+class BatchQuery(BaseModel):
+    background: bool = Field(
+        False, description="作为后台任务执行，立即返回任务ID，结果通过 /job/<id> 查询"
+    )
+
+
+_BATCH_JOB_RESPONSES = {
+    202: {
+        "description": "已提交为后台任务",
+        "content": {
+            "application/json": {
+                "schema": {"type": "object", "properties": {"job": {"type": "string"}}}
+            }
+        },
+    },
+}
+
+
+async def run_batch(query: BatchQuery, kind: str, **params):
+    """执行批量操作，或将其提交为后台任务"""
+    if query.background:
+        return {"job": await job.JOB.submit(kind, params)}, 202
+    progress = job.BatchProgress()
+    await job.JOB.handler(kind)(progress=progress, **params)
+    return progress.report(), 200
+
+
 # ==================================================================================== #
 _TAG_STUDENT = Tag(name="student", description="学生管理")
 
@@ -172,34 +206,79 @@ async def student_detail(path: DetailPath):
     return StudentDetail.from_student(student_data).model_dump(), 200
 
 
+_STUDENT_FIELDS = {
+    "name": "user_info.name",
+    "mail": "user_info.mail",
+    **{
+        k: f"codespace.{k}"
+        for k in StudentDetail.model_fields
+        if k not in StudentBrief.model_fields
+    },
+}
+"""学生列表可投影的字段与 Redis 哈希字段的对应关系"""
+
+
+class StudentListQuery(BaseModel):
+    cursor: str = Field(
+        "0",
+        description="分页游标，取上一页响应头 X-Next-Cursor 的值，0 表示第一页",
+    )
+    limit: int = Field(
+        CONFIG.SVC_ADM.student_page_size,
+        ge=1,
+        le=1000,
+        description="每页的学生数量",
+    )
+    fields: str = Field(
+        ",".join(StudentBrief.model_fields),
+        description="返回的字段，逗号分隔，可选值为 StudentDetail 的字段",
+    )
+
+
 @WSGI.get(
     "/student",
     tags=[_TAG_STUDENT],
     responses={
         200: {
-            "description": "成功，返回学生列表",
+            "description": "成功，按学号顺序返回一页学生列表，响应头 X-Next-Cursor"
+            " 为下一页的游标，0 表示没有下一页",
             "content": {
                 "application/json": {
                     "schema": {
                         "type": "array",
-                        "items": StudentBrief.model_json_schema(),
+                        "items": StudentDetail.model_json_schema(),
                     }
                 }
             },
         },
+        400: {"description": "游标或字段不合法"},
         **_CHECK_API_KEY_RESPONSES,
     },
     security=_SECURITY,
 )
-async def student_list():
-    """获取学生列表"""
+async def student_list(query: StudentListQuery):
+    """分页获取学生列表，只返回请求的字段"""
     await check_api_key()
+    names = [f.strip() for f in query.fields.split(",") if f.strip()]
+    if unknown := [f for f in names if f != "id" and f not in _STUDENT_FIELDS]:
+        raise ErrorResponse(Response(f"unknown fields: {unknown}", status=400))
+    try:
+        cursor, records = await student.TABLE.scan(
+            query.cursor,
+            query.limit,
+            [_STUDENT_FIELDS[f] for f in names if f != "id"],
+        )
+    except ValueError as e:
+        raise ErrorResponse(Response(str(e), status=400))
+
     students = [
-        StudentBrief.from_student(stu).model_dump()
-        async for stu in student.TABLE.iter_all()
+        {
+            name: record["sid"] if name == "id" else record[_STUDENT_FIELDS[name]]
+            for name in names
+        }
+        for record in records
     ]
-
-    return students, 200
+    return students, 200, {"X-Next-Cursor": cursor}
 
 
 class StudentCreate(StudentBrief):
@@ -222,6 +301,7 @@ class StudentCreate(StudentBrief):
                                 "type": "array",
                                 "items": StudentBrief.model_json_schema(),
                             },
+                            "elapsed": {"type": "number"},
                             "failed": {
                                 "type": "array",
                                 "items": {
@@ -237,31 +317,25 @@ class StudentCreate(StudentBrief):
                 }
             },
         },
+        **_BATCH_JOB_RESPONSES,
         **_CHECK_API_KEY_RESPONSES,
     },
     security=_SECURITY,
 )
-async def create_student(body: RootModel[list[StudentCreate]]):
+async def create_student(query: BatchQuery, body: RootModel[list[StudentCreate]]):
     """创建学生"""
     await check_api_key()
-    success = []
-    failed = []
-    for stu_data in body.root:
-        try:
-            stu = student.Student(
-                sid=stu_data.id,
-                user_info=student.UserInfo(name=stu_data.name, mail=stu_data.mail),
-                codespace=student.CodespaceInfo(time_quota=stu_data.time_quota),
-            )
-            stu.reset_password(stu_data.pwd)
-            await student.TABLE.create(stu)
-            success.append(StudentBrief.from_student(stu).model_dump())
-        except Exception as e:
-            failed.append({"id": stu.sid, "reason": str(e)})
-    return {
-        "success": success,
-        "failed": failed,
-    }
+    students = [stu_data.model_dump() for stu_data in body.root]
+    result, status = await run_batch(query, "student.create", students=students)
+    if status == 200:
+        briefs = {
+            stu_data.id: StudentBrief(
+                id=stu_data.id, name=stu_data.name, mail=stu_data.mail
+            ).model_dump()
+            for stu_data in body.root
+        }
+        result["success"] = [briefs[sid] for sid in result["success"]]
+    return result, status
 
 
 # 批量删除学生API
@@ -284,6 +358,7 @@ class StudentDelete(BaseModel):
                                 "type": "array",
                                 "items": {"type": "string"},
                             },
+                            "elapsed": {"type": "number"},
                             "failed": {
                                 "type": "array",
                                 "items": {
@@ -299,25 +374,17 @@ class StudentDelete(BaseModel):
                 }
             },
         },
+        **_BATCH_JOB_RESPONSES,
         **_CHECK_API_KEY_RESPONSES,
     },
     security=_SECURITY,
 )
-async def batch_delete_student(body: RootModel[list[StudentDelete]]):
+async def batch_delete_student(query: BatchQuery, body: RootModel[list[StudentDelete]]):
     """批量删除学生"""
     await check_api_key()
-    success = []
-    failed = []
-    for stu_data in body.root:
-        try:
-            await student.TABLE.delete(stu_data.sid)
-            success.append(stu_data.sid)
-        except Exception as e:
-            failed.append({"id": stu_data.sid, "reason": str(e)})
-    return {
-        "success": success,
-        "failed": failed,
-    }
+    return await run_batch(
+        query, "student.delete", sids=[stu_data.sid for stu_data in body.root]
+    )
 
 
 # ==================================================================================== #
@@ -384,7 +451,8 @@ async def student_codespace_start(path: DetailPath):
     except student.StudentNotFoundError:
         return Response("Student not found", status=404)
     try:
-        await student.CODESPACE.start(path.sid)
+        if not await student.CODESPACE.start(path.sid):
+            return Response("代码空间已启动", status=202)
         return _OK
     except student.CodespaceQuotaExceededError:
         return Response("代码空间配额已耗尽", status=402)
@@ -409,9 +477,10 @@ async def student_codespace_stop(path: DetailPath):
         status = await student.CODESPACE.get_status(path.sid)
         if status == "stopped":
             return Response("代码空间不在运行", status=202)
+        if not await student.CODESPACE.stop(path.sid):
+            return Response("代码空间不在运行", status=202)
     except student.StudentNotFoundError:
         return Response("学生不存在", status=404)
-    await student.CODESPACE.stop(path.sid)
     return _OK
 
 
@@ -443,6 +512,26 @@ async def student_codespace_info(path: DetailPath):
         return Response("学生不存在", status=404)
 
 
+# 获取学生代码空间启动进度 api
+@WSGI.get(
+    "/student/codespace/progress/<sid>",
+    tags=[_TAG_STUDENT],
+    responses={
+        200: {"description": "成功返回代码空间状态、启动阶段和说明"},
+        404: {"description": "学生不存在"},
+        **_CHECK_API_KEY_RESPONSES,
+    },
+    security=_SECURITY,
+)
+async def student_codespace_progress(path: DetailPath):
+    """获取学生代码空间的状态和启动进度，就绪前状态为 starting"""
+    await check_api_key()
+    try:
+        return await student.CODESPACE.get_progress(path.sid), 200
+    except student.StudentNotFoundError:
+        return Response("学生不存在", status=404)
+
+
 # 保持学生代码空间活跃 api
 @WSGI.post(
     "/student/keepalive/<sid>",
@@ -456,8 +545,15 @@ async def student_codespace_info(path: DetailPath):
     security=_SECURITY,
 )
 async def student_codespace_keepalive(path: DetailPath):
-    """保持学生代码空间活跃，防止超时"""
-    pass
+    """保持学生代码空间活跃，防止因空闲被停止"""
+    await check_api_key()
+    if await student.CODESPACE.keep_alive(path.sid):
+        return _OK
+    try:
+        await student.TABLE.read(path.sid)
+    except student.StudentNotFoundError:
+        return Response("学生不存在", status=404)
+    return Response("代码空间不在运行", status=202)
 
 
 # 定义批量操作请求模型
@@ -478,6 +574,7 @@ class CodespaceBatchOperation(BaseModel):
                         "type": "object",
                         "properties": {
                             "success": {"type": "array", "items": {"type": "string"}},
+                            "elapsed": {"type": "number"},
                             "failed": {
                                 "type": "array",
                                 "items": {
@@ -493,31 +590,15 @@ class CodespaceBatchOperation(BaseModel):
                 }
             },
         },
+        **_BATCH_JOB_RESPONSES,
         **_CHECK_API_KEY_RESPONSES,
     },
     security=_SECURITY,
 )
-async def batch_start_codespace(body: CodespaceBatchOperation):
+async def batch_start_codespace(query: BatchQuery, body: CodespaceBatchOperation):
     """批量启动多个学生的代码空间"""
     await check_api_key()
-    success = []
-    failed = []
-    for sid in body.ids:
-        try:
-            status = await student.CODESPACE.get_status(sid)
-            if status == "running":
-                failed.append({"id": sid, "reason": "代码空间已在运行"})
-                continue
-            await student.CODESPACE.start(sid)
-            success.append(sid)
-        except student.StudentNotFoundError:
-            failed.append({"id": sid, "reason": "学生不存在"})
-        except student.CodespaceQuotaExceededError:
-            failed.append({"id": sid, "reason": "代码空间配额已耗尽"})
-    return {
-        "success": success,
-        "failed": failed,
-    }, 200
+    return await run_batch(query, "codespace.start", sids=body.ids)
 
 
 # 批量停止代码空间API
@@ -533,6 +614,7 @@ async def batch_start_codespace(body: CodespaceBatchOperation):
                         "type": "object",
                         "properties": {
                             "success": {"type": "array", "items": {"type": "string"}},
+                            "elapsed": {"type": "number"},
                             "failed": {
                                 "type": "array",
                                 "items": {
@@ -548,29 +630,15 @@ async def batch_start_codespace(body: CodespaceBatchOperation):
                 }
             },
         },
+        **_BATCH_JOB_RESPONSES,
         **_CHECK_API_KEY_RESPONSES,
     },
     security=_SECURITY,
 )
-async def batch_stop_codespace(body: CodespaceBatchOperation):
+async def batch_stop_codespace(query: BatchQuery, body: CodespaceBatchOperation):
     """批量停止多个学生的代码空间"""
     await check_api_key()
-    success = []
-    failed = []
-    for sid in body.ids:
-        try:
-            status = await student.CODESPACE.get_status(sid)
-            if status == "stopped":
-                failed.append({"id": sid, "reason": "代码空间不在运行"})
-                continue
-            await student.CODESPACE.stop(sid)
-            success.append(sid)
-        except student.StudentNotFoundError:
-            failed.append({"id": sid, "reason": "学生不存在"})
-    return {
-        "success": success,
-        "failed": failed,
-    }, 200
+    return await run_batch(query, "codespace.stop", sids=body.ids)
 
 
 # 调整学生代码空间配额API
@@ -593,16 +661,145 @@ async def update_student_codespace_quota(path: DetailPath, body: CodespaceQuota)
     """调整学生代码空间配额"""
     await check_api_key()
     try:
-        # 检查学生是否存在
-        student_data = await student.TABLE.read(path.sid)
         # 暂时不支持空间配额调整
-        student_data.codespace.time_quota = body.time_quota
-        await student.TABLE.write(student_data)
+        await student.TABLE.update(path.sid, {"codespace.time_quota": body.time_quota})
         return _OK
     except student.StudentNotFoundError:
         return Response("学生不存在", status=404)
 
 
+class CodespaceBatchQuota(CodespaceBatchOperation):
+    time_quota: int = Field(..., description="时间配额（秒）")
+
+
+@WSGI.put(
+    "/student/codespace/quota",
+    tags=[_TAG_STUDENT],
+    responses={
+        200: {
+            "description": "批量调整配额结果",
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            "success": {"type": "array", "items": {"type": "string"}},
+                            "elapsed": {"type": "number"},
+                            "failed": {
+                                "type": "array",
+                                "items": {
+                                    "type": "object",
+                                    "properties": {
+                                        "id": {"type": "string"},
+                                        "reason": {"type": "string"},
+                                    },
+                                },
+                            },
+                        },
+                    }
+                }
+            },
+        },
+        **_BATCH_JOB_RESPONSES,
+        **_CHECK_API_KEY_RESPONSES,
+    },
+    security=_SECURITY,
+)
+async def batch_update_codespace_quota(query: BatchQuery, body: CodespaceBatchQuota):
+    """批量调整多个学生的代码空间时间配额"""
+    await check_api_key()
+    return await run_batch(
+        query, "codespace.quota", sids=body.ids, time_quota=body.time_quota
+    )
+
+
+# ==================================================================================== #
+_TAG_JOB = Tag(name="job", description="后台任务")
+
+
+class JobPath(BaseModel):
+    id: str = Field(..., description="任务ID")
+
+
+@WSGI.get(
+    "/job/<id>",
+    tags=[_TAG_JOB],
+    responses={
+        200: {
+            "description": "任务的状态、进度和逐项结果",
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "string"},
+                            "kind": {"type": "string"},
+                            "state": {
+                                "type": "string",
+                                "enum": [s.value for s in job.JobState],
+                            },
+                            "message": {"type": "string"},
+                            "error": {"type": "string"},
+                            "total": {"type": "integer"},
+                            "done": {"type": "integer"},
+                            "created": {"type": "number"},
+                            "started": {"type": "number"},
+                            "finished": {"type": "number"},
+                            "success": {"type": "array", "items": {"type": "string"}},
+                            "elapsed": {"type": "number"},
+                            "failed": {
+                                "type": "array",
+                                "items": {
+                                    "type": "object",
+                                    "properties": {
+                                        "id": {"type": "string"},
+                                        "reason": {"type": "string"},
+                                    },
+                                },
+                            },
+                        },
+                    }
+                }
+            },
+        },
+        404: {"description": "任务不存在或已过期"},
+        **_CHECK_API_KEY_RESPONSES,
+    },
+    security=_SECURITY,
+)
+async def job_detail(path: JobPath):
+    """获取后台任务的状态和结果"""
+    await check_api_key()
+    try:
+        return await job.JOB.get(path.id), 200
+    except job.JobNotFoundError:
+        return Response("Job not found", status=404)
+
+
+# ==================================================================================== #
+_TAG_SYSTEM = Tag(name="system", description="系统状态")
+
+
+@WSGI.get(
+    "/metrics",
+    tags=[_TAG_SYSTEM],
+    responses={
+        200: {"description": "处理本请求的工作进程的运行指标"},
+        **_CHECK_API_KEY_RESPONSES,
+    },
+    security=_SECURITY,
+)
+async def metrics():
+    """获取运行指标，各工作进程的指标相互独立"""
+    await check_api_key()
+    return {
+        "pid": os.getpid(),
+        "student_cache": student.CACHE.info(),
+        "account_cache": student.ACCOUNT.info(),
+        "fs": core.FS.info(),
+    }, 200
+
+
 # ==================================================================================== #
 
 
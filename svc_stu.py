@@ -5,6 +5,7 @@ from flask import Response, g, redirect, request
 from flask_openapi3 import Info, OpenAPI, Tag
 from pydantic import BaseModel, Field
 
+import core.password
 import core.student
 from config import CONFIG, ENVIRON
 from base.logger import logger
@@ -18,8 +19,13 @@ class AsyncFlask(OpenAPI):
     def async_to_sync(self, func):
         import contextvars
 
+        async def scoped(*args, **kwargs):
+            # 同一请求内学生记录和代码空间状态各最多获取一次
+            with core.student.MEMO.scope():
+                return await func(*args, **kwargs)
+
         def wrapper(*args, **kwargs):
-            return context.run(loop.run_until_complete, func(*args, **kwargs))
+            return context.run(loop.run_until_complete, scoped(*args, **kwargs))
 
         context = contextvars.copy_context()
         loop = RUNNER.get_loop()
@@ -56,6 +62,9 @@ _SECURITY = [
     {"api-key-in-cookie": []},
 ]
 _OK = Response(status=200)
+_BUSY = Response("服务繁忙，请稍后重试", status=503, headers={"Retry-After": "1"})
+_STARTING_RETRY_AFTER = "5"
+"""代码空间启动中时要求客户端等待的秒数，浏览器按 Refresh 头自动重新进入"""
 
 
 class ErrorResponse(Exception):
@@ -89,27 +98,25 @@ _TAG_LOGIN = Tag(name="login", description="登录认证")
 async def check_api_key() -> str:
     """检查 API-KEY，返回账户"""
 
-    from util import api_key_dec
-
     api_key = request.headers.get("X-API-KEY")
     if api_key is None:
         api_key = request.cookies.get("X-API-KEY")
     if api_key is None:
         api_key = request.args.get("X-API-KEY")
     if api_key:
-        account = api_key_dec(api_key)
-        if not account:
+        try:
+            account = await core.student.ACCOUNT.verify(api_key)
+        except core.student.StudentNotFoundError:
             raise ErrorResponse(
                 Response(
-                    "API-KEY无效",
+                    "User not Found",
                     status=403,
                 )
             )
-        user = await core.student.TABLE.get_user_info(account)
-        if not user.name and not user.mail:
+        if not account:
             raise ErrorResponse(
                 Response(
-                    "User not Found",
+                    "API-KEY无效",
                     status=403,
                 )
             )
@@ -145,6 +152,7 @@ class LoginBody(BaseModel):
         },
         401: {"description": "密码错误"},
         403: {"description": "学生记录未找到"},
+        503: {"description": "登录繁忙，稍后重试"},
     },
 )
 async def login(body: LoginBody) -> Response:
@@ -156,6 +164,8 @@ async def login(body: LoginBody) -> Response:
             raise ErrorResponse(Response("UNAUTHORIZED: wrong password", status=401))
     except core.student.StudentNotFoundError:
         raise ErrorResponse(Response("student not found", status=403))
+    except core.password.PasswordBusyError:
+        raise ErrorResponse(_BUSY)
 
     return api_key_enc(body.sid), 200
 
@@ -218,6 +228,7 @@ class UserResetPassword(BaseModel):
     responses={
         200: {"description": "修改成功"},
         400: {"description": "旧密码错误"},
+        503: {"description": "繁忙，稍后重试"},
         **_CHECK_API_KEY_RESPONSES,
     },
     security=_SECURITY,
@@ -232,6 +243,8 @@ async def user_reset_password(body: UserResetPassword):
         return _OK
     except core.student.StudentNotFoundError as e:
         raise ErrorResponse(Response(str(e), status=403))
+    except core.password.PasswordBusyError:
+        raise ErrorResponse(_BUSY)
 
 
 # ==================================================================================== #
@@ -242,6 +255,7 @@ _TAG_CODESPACE = Tag(name="codespace", description="代码空间")
     "/codespace",
     tags=[_TAG_CODESPACE],
     responses={
+        202: {"description": "代码空间正在启动，稍后按 Retry-After 重试"},
         302: {"description": "容器正在运行，重定向到代码空间页面"},
         303: {"description": "容器不在运行，重定向到代码空间管理页面"},
         307: {"description": "容器正在运行，但代码空间未启动"},
@@ -250,9 +264,19 @@ _TAG_CODESPACE = Tag(name="codespace", description="代码空间")
     security=_SECURITY,
 )
 async def codespace():
-    """进入代码空间（重定向）"""
+    """进入代码空间（重定向），code-server 就绪前不重定向"""
     account = await check_api_key()
     space_status = await core.student.CODESPACE.get_status(account)
+    if space_status == "starting":
+        progress = await core.student.CODESPACE.get_progress(account)
+        return Response(
+            f"代码空间正在启动: {progress['phase'] or 'starting'}",
+            status=202,
+            headers={
+                "Retry-After": _STARTING_RETRY_AFTER,
+                "Refresh": _STARTING_RETRY_AFTER,
+            },
+        )
     url = await core.student.CODESPACE.get_url(account)
 
     if space_status == "running" and url:
@@ -281,7 +305,8 @@ async def codespace_start():
     if status == "running":
         return Response("代码空间已启动", status=202)
     try:
-        await core.student.CODESPACE.start(account)
+        if not await core.student.CODESPACE.start(account):
+            return Response("代码空间已启动", status=202)
         return _OK
     except core.student.CodespaceQuotaExceededError:
         return Response("代码空间配额已耗尽", status=402)
@@ -309,20 +334,43 @@ async def codespace_stop():
     if status == "stopped":
         return Response("代码空间未启动", status=202)
     try:
-        await core.student.CODESPACE.stop(account)
+        if not await core.student.CODESPACE.stop(account):
+            return Response("容器不在运行", status=202)
         return _OK
-    except core.student.CodespaceNotRunningError:
-        return Response("容器不在运行", status=202)
     except Exception as e:
         LOGGER.error(f"停止代码空间失败: {account}, 错误: {e}")
         return Response("停止代码空间失败", status=500)
 
 
+@WSGI.post(
+    "/codespace/keepalive",
+    tags=[_TAG_CODESPACE],
+    responses={
+        200: {"description": "心跳已记录"},
+        202: {"description": "容器不在运行"},
+        **_CHECK_API_KEY_RESPONSES,
+    },
+    security=_SECURITY,
+)
+async def codespace_keepalive():
+    """上报代码空间活动，由代码空间中的监控鼹鼠调用，防止代码空间因空闲被停止"""
+    account = await check_api_key()
+    if not await core.student.CODESPACE.keep_alive(account):
+        return Response("容器不在运行", status=202)
+    return _OK
+
+
 class CodespaceInfo(BaseModel):
     access_url: str | bool = Field(
         ...,
         description="访问链接，true 表示正在启动，false 表示不在运行",
     )
+    status: str = Field(..., description="代码空间状态")
+    phase: str | None = Field(
+        None,
+        description="启动阶段：scheduling、pulling、booting、ready 或 failing",
+    )
+    message: str | None = Field(None, description="启动阶段的说明")
 
     last_start: float = Field(..., description="上次启动时间，POSIX 时间戳")
     last_stop: float = Field(..., description="上次停止时间，POSIX 时间戳")
@@ -351,12 +399,15 @@ async def codespace_info():
     """获取代码空间信息"""
     account = await check_api_key()
     try:
-        student = await core.student.TABLE.read(account)
-        status = await core.student.CODESPACE.get_status(account)
+        # 先获取状态，其中的状态转换会更新记录
+        progress = await core.student.CODESPACE.get_progress(account)
+        status = progress["status"]
         url = await core.student.CODESPACE.get_url(account)
+        student = await core.student.TABLE.read(account)
 
         return {
-            "access_url": url if status == "running" else False,
+            "access_url": url if status in ("running", "starting") else False,
+            **progress,
             "last_start": student.codespace.last_start,
             "last_stop": student.codespace.last_stop,
             "time_quota": student.codespace.time_quota,
@@ -0,0 +1,132 @@
+"""Informer 测试
+
+用模拟的 list 和 watch 函数测试 Reflector 的同步、断线续传和过期重新同步，不需要集群。
+"""
+
+import threading
+import unittest
+from types import SimpleNamespace
+
+from base.logger import logger
+from cluster.informer import Reflector
+
+LOGGER = logger(__spec__, __file__)
+
+
+def setUpModule() -> None:
+    from .. import setup_test
+
+    setup_test(__name__)
+
+
+def _obj(name: str, rv: str, replicas: int = 0, app: str | None = None):
+    return SimpleNamespace(
+        metadata=SimpleNamespace(
+            name=name, resource_version=rv, labels={"app": app} if app else None
+        ),
+        spec=SimpleNamespace(replicas=replicas),
+    )
+
+
+def _list(rv: str, *items):
+    return SimpleNamespace(
+        items=list(items), metadata=SimpleNamespace(resource_version=rv)
+    )
+
+
+class Gone(Exception):
+    status = 410
+
+
+class ReflectorTest(unittest.TestCase):
+    """测试 Reflector"""
+
+    def test_sync(self):
+        lists = [
+            _list("10", _obj("a", "5"), _obj("b", "9")),
+            _list("30", _obj("c", "30")),
+        ]
+        watches = []
+        done = threading.Event()
+
+        def list_func():
+            return lists.pop(0)
+
+        def watch_func(rv):
+            watches.append(rv)
+            if len(watches) == 1:
+                # 第一次 watch：更新、删除、书签，然后断开
+                yield {"type": "MODIFIED", "object": _obj("a", "11", 1)}
+                yield {"type": "DELETED", "object": _obj("b", "12")}
+                yield {"type": "BOOKMARK", "object": _obj("", "15")}
+                raise ConnectionError("connection reset")
+            elif len(watches) == 2:
+                # 从最后的 resourceVersion 继续，之后过期
+                yield {"type": "ADDED", "object": _obj("b", "16")}
+                raise Gone()
+            else:
+                done.set()
+                reflector.stop()
+                yield {
+                    "type": "BOOKMARK",
+                    "object": {"metadata": {"resourceVersion": "31"}},
+                }
+
+        reflector = Reflector(
+            "Deployment", list_func, watch_func, lambda obj: obj.metadata.name
+        )
+        reflector.apply({"type": "ADDED", "object": _obj("x", "1")})
+        self.assertEqual(reflector.keys(), ["x"])
+
+        reflector.resource_version = None
+        reflector._stopped.wait = lambda timeout: None  # 不等待重试
+        reflector.start()
+        self.assertTrue(done.wait(5))
+        reflector._thread.join(5)
+
+        self.assertEqual(watches, ["10", "15", "30"])
+        self.assertEqual(reflector.relists, 2)
+        self.assertEqual(reflector.errors, 1)
+        self.assertEqual(reflector.resource_version, "31")
+        # 过期后重新同步，本地存储被替换
+        self.assertEqual(reflector.keys(), ["c"])
+
+    def test_observe(self):
+        reflector = Reflector(
+            "Deployment", None, None, lambda obj: obj.metadata.name  # type: ignore
+        )
+        reflector.apply({"type": "ADDED", "object": _obj("a", "5")})
+
+        # 旧对象不覆盖新对象
+        reflector.observe(_obj("a", "4", 1))
+        self.assertEqual(reflector.get("a").metadata.resource_version, "5")
+        reflector.observe(_obj("a", "6", 1))
+        self.assertEqual(reflector.get("a").spec.replicas, 1)
+
+        reflector.forget("a")
+        self.assertIsNone(reflector.get("a"))
+
+    def test_select(self):
+        reflector = Reflector(
+            "Pod",
+            lambda: _list("10", _obj("p1", "5", app="a"), _obj("p2", "9", app="a")),
+            None,  # type: ignore
+            lambda obj: obj.metadata.name,
+            lambda obj: (obj.metadata.labels or {}).get("app"),
+        )
+        reflector.relist()
+        select = lambda app: sorted(p.metadata.name for p in reflector.select(app))
+        self.assertEqual(select("a"), ["p1", "p2"])
+
+        # 对象的二级索引键变化、删除时同步维护索引
+        reflector.apply({"type": "MODIFIED", "object": _obj("p2", "11", app="b")})
+        reflector.apply({"type": "ADDED", "object": _obj("p3", "12")})
+        self.assertEqual(select("a"), ["p1"])
+        self.assertEqual(select("b"), ["p2"])
+        reflector.apply({"type": "DELETED", "object": _obj("p1", "13", app="a")})
+        self.assertEqual(select("a"), [])
+        self.assertEqual(reflector.keys(), ["p2", "p3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
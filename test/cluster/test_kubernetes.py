@@ -5,6 +5,7 @@
 
 import unittest
 import asyncio as aio
+from types import SimpleNamespace
 from cluster import JobInfo
 from base.logger import logger
 from . import ClusterTestBase, RUNNER, get_kubernetes_cluster, ensure_kubernetes_cluster
@@ -245,5 +246,163 @@ class KubernetesClusterTest(ClusterTestBase):
         return RUNNER.run(test_logic())
 
 
+class TransportTest(unittest.TestCase):
+    """测试 API 调用的线程池传输，不需要集群"""
+
+    def test_call(self):
+        from cluster.kubernetes import KubernetesCluster
+        from config import CONFIG
+
+        k8s = KubernetesCluster()
+        timeouts = []
+
+        def api(name, _request_timeout=None):
+            timeouts.append(_request_timeout)
+            return name
+
+        def broken(_request_timeout=None):
+            raise RuntimeError("boom")
+
+        async def test_logic():
+            results = await aio.gather(*(k8s._call(api, f"job-{i}") for i in range(8)))
+            self.assertEqual(results, [f"job-{i}" for i in range(8)])
+            with self.assertRaises(RuntimeError):
+                await k8s._call(broken)
+
+        RUNNER.run(test_logic())
+
+        # 每次调用都带超时
+        self.assertEqual(set(timeouts), {CONFIG.CLUSTER.Kubernetes.TIMEOUT})
+        info = k8s.info()
+        self.assertEqual(info["api"]["calls"], 9)
+        self.assertEqual(info["api"]["errors"], 1)
+        self.assertEqual(info["limiter"]["acquired"], 9)
+        self.assertIsNone(info["informer"])
+
+
+class ImageTest(unittest.TestCase):
+    """测试镜像摘要的固定，不需要集群"""
+
+    def test_digest_ref(self):
+        from cluster.kubernetes import KubernetesSpec, _digest_ref
+        from cluster import JobParams
+
+        digest = "sha256:" + "0" * 64
+        image = "registry.example.com:5000/ns/codespace:latest"
+        pinned = f"registry.example.com:5000/ns/codespace@{digest}"
+        self.assertEqual(
+            _digest_ref(image, f"docker-pullable://{pinned}"),
+            pinned,
+        )
+        self.assertEqual(_digest_ref("ns/codespace", pinned), f"ns/codespace@{digest}")
+        # containerd 可能只报告镜像配置的 ID
+        self.assertIsNone(_digest_ref(image, digest))
+
+        container = lambda image: KubernetesSpec(
+            JobParams(name="codespace-1", image=image, user_id="1")
+        )._build_container()
+        self.assertEqual(container(image)["imagePullPolicy"], "Always")
+        self.assertEqual(container(pinned)["imagePullPolicy"], "IfNotPresent")
+
+
+class ReadinessTest(unittest.TestCase):
+    """测试探针和就绪前的状态与启动阶段，不需要集群"""
+
+    def test_probes(self):
+        from kubernetes import client
+        from cluster.kubernetes import KubernetesSpec, _probe_matches
+        from cluster import JobParams
+        from config import CONFIG
+
+        container = KubernetesSpec(
+            JobParams(name="codespace-1", image="codespace", user_id="1")
+        )._build_container()
+        startup, readiness = container["startupProbe"], container["readinessProbe"]
+        self.assertEqual(
+            startup["httpGet"]["path"], CONFIG.CLUSTER.Codespace.PROBE_PATH
+        )
+        self.assertGreaterEqual(
+            startup["periodSeconds"] * startup["failureThreshold"],
+            CONFIG.CLUSTER.Codespace.STARTUP_PROBE_TIMEOUT,
+        )
+
+        # 已有 Deployment 的探针带有服务端填充的默认值
+        probe = client.V1Probe(
+            http_get=client.V1HTTPGetAction(
+                path=readiness["httpGet"]["path"],
+                port=readiness["httpGet"]["port"],
+                scheme="HTTP",
+            ),
+            period_seconds=readiness["periodSeconds"],
+            failure_threshold=readiness["failureThreshold"],
+            timeout_seconds=1,
+        )
+        self.assertTrue(_probe_matches(probe, readiness))
+        self.assertFalse(_probe_matches(probe, startup))
+        self.assertFalse(_probe_matches(None, readiness))
+
+    def test_status_and_phase(self):
+        from cluster.kubernetes import KubernetesCluster, _pod_phase
+
+        def deployment(replicas=1, ready=None, conditions=()):
+            return SimpleNamespace(
+                metadata=SimpleNamespace(annotations={}),
+                spec=SimpleNamespace(replicas=replicas),
+                status=SimpleNamespace(
+                    ready_replicas=ready,
+                    unavailable_replicas=1 if not ready else None,
+                    conditions=[SimpleNamespace(**c) for c in conditions],
+                ),
+            )
+
+        status = KubernetesCluster._deployment_status
+        # 未就绪的 Pod 计入 unavailableReplicas，但仍在启动中
+        self.assertEqual(status(deployment()), JobInfo.Status.PENDING)
+        self.assertEqual(status(deployment(ready=1)), JobInfo.Status.RUNNING)
+        self.assertEqual(status(deployment(replicas=0)), JobInfo.Status.SUSPENDED)
+        self.assertEqual(
+            status(deployment(conditions=[{"type": "Progressing", "status": "False"}])),
+            JobInfo.Status.FAILED,
+        )
+
+        def pod(conditions, waiting=None, running=False):
+            state = SimpleNamespace(
+                waiting=(
+                    SimpleNamespace(reason=waiting, message=None) if waiting else None
+                ),
+                running=SimpleNamespace() if running else None,
+            )
+            return SimpleNamespace(
+                status=SimpleNamespace(
+                    conditions=[
+                        SimpleNamespace(type=t, status=v, message=f"{t} message")
+                        for t, v in conditions.items()
+                    ],
+                    container_statuses=[SimpleNamespace(state=state)],
+                )
+            )
+
+        self.assertEqual(
+            _pod_phase(pod({"PodScheduled": "False"})),
+            (JobInfo.Phase.SCHEDULING, "PodScheduled message"),
+        )
+        self.assertEqual(
+            _pod_phase(pod({"PodScheduled": "True"}, waiting="ContainerCreating")),
+            (JobInfo.Phase.PULLING, "ContainerCreating"),
+        )
+        self.assertEqual(
+            _pod_phase(pod({"PodScheduled": "True"}, waiting="ImagePullBackOff"))[0],
+            JobInfo.Phase.FAILING,
+        )
+        self.assertEqual(
+            _pod_phase(pod({"PodScheduled": "True", "Ready": "False"}, running=True)),
+            (JobInfo.Phase.BOOTING, None),
+        )
+        self.assertEqual(
+            _pod_phase(pod({"PodScheduled": "True", "Ready": "True"}, running=True)),
+            (JobInfo.Phase.READY, None),
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -80,6 +80,22 @@ class MockClusterTest(ClusterTestBase):
 
         RUNNER.run(_test())
 
+    def test_job_statuses(self):
+        """测试批量获取作业状态"""
+
+        async def _test():
+            job_params = self.build_test_job_params(sid="5020")
+            job_info = await self.cluster.submit_job(job_params)
+            self.track_job(job_info.id)
+
+            statuses = await self.cluster.get_job_statuses([job_info.id, "missing-job"])
+            self.assertEqual(
+                statuses, {job_info.id: await self.cluster.get_job_status(job_info.id)}
+            )
+            self.assertEqual(await self.cluster.get_job_statuses([]), {})
+
+        RUNNER.run(_test())
+
 
 if __name__ == "__main__":
     import unittest
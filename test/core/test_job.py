@@ -0,0 +1,104 @@
+from base.logger import logger
+
+from .. import RUNNER, AsyncTestCase
+
+LOGGER = logger(__spec__, __file__)
+
+
+def setUpModule() -> None:
+    from .. import setup_test, ainit_core
+
+    setup_test(__name__)
+    RUNNER.run(ainit_core())
+
+
+def tearDownModule() -> None:
+    return
+
+
+class JobTest(AsyncTestCase):
+    """测试后台任务队列"""
+
+    async def test_run(self):
+        from core import DB0
+        from core.job import JOB, JobNotFoundError, JobProgress
+
+        async def handler(items: list[str], progress: JobProgress):
+            progress.total(len(items), "测试")
+            for item in items:
+                if item.startswith("bad"):
+                    progress.fail(item, "坏的")
+                else:
+                    progress.succeed(item)
+
+        async def broken(progress: JobProgress):
+            progress.total(1)
+            raise RuntimeError("boom")
+
+        JOB.register("test.ok", handler)
+        JOB.register("test.broken", broken)
+
+        with self.assertRaises(ValueError):
+            await JOB.submit("test.unknown", {})
+        with self.assertRaises(JobNotFoundError):
+            await JOB.get("404")
+
+        job_id = await JOB.submit("test.ok", {"items": ["a", "bad1", "b"]})
+        info = await JOB.get(job_id)
+        self.assertEqual(info["state"], "pending")
+        self.assertEqual(info["kind"], "test.ok")
+
+        self.assertTrue(await JOB.run_once())
+        self.assertFalse(await JOB.run_once())
+        info = await JOB.get(job_id)
+        self.assertEqual(info["state"], "succeeded")
+        self.assertEqual(info["total"], 3)
+        self.assertEqual(info["done"], 3)
+        self.assertEqual(info["success"], ["a", "b"])
+        self.assertEqual(info["failed"], [{"id": "bad1", "reason": "坏的"}])
+        self.assertGreater(info["finished"], 0)
+        # 参数在任务开始时即被删除
+        self.assertFalse(await DB0.exists(f"job:{job_id}:params"))
+        self.assertGreater(await DB0.ttl(f"job:{job_id}"), 0)
+
+        job_id = await JOB.submit("test.broken", {})
+        self.assertTrue(await JOB.run_once(timeout=1))
+        info = await JOB.get(job_id)
+        self.assertEqual(info["state"], "failed")
+        self.assertIn("boom", info["error"])
+
+        # 进度写入失败时任务同样结束为失败，不会停留在运行中
+        from unittest import mock
+
+        job_id = await JOB.submit("test.ok", {"items": ["a"]})
+        flush = mock.AsyncMock(side_effect=ConnectionError("redis down"))
+        with mock.patch.object(JobProgress, "_flush", flush):
+            self.assertTrue(await JOB.run_once())
+        info = await JOB.get(job_id)
+        self.assertEqual(info["state"], "failed")
+        self.assertIn("redis down", info["error"])
+        self.assertEqual(await DB0.lrange("job-running", 0, -1), [])
+
+    async def test_recover(self):
+        from core.job import JOB
+
+        async def handler(progress):
+            pass
+
+        JOB.register("test.noop", handler)
+        job_id = await JOB.submit("test.noop", {})
+
+        # 模拟任务被取出后 entry 进程退出
+        from core import DB0
+
+        await DB0.lmove("job-queue", "job-running", "RIGHT", "LEFT")
+        self.assertEqual(await JOB.recover(), 1)
+        info = await JOB.get(job_id)
+        self.assertEqual(info["state"], "failed")
+        self.assertEqual(await JOB.recover(), 0)
+
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main()
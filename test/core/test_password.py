@@ -0,0 +1,89 @@
+import contextlib
+
+from base.logger import logger
+
+from .. import RUNNER, AsyncTestCase
+
+LOGGER = logger(__spec__, __file__)
+
+
+def setUpModule() -> None:
+    from .. import setup_test, ainit_core
+
+    setup_test(__name__)
+    RUNNER.run(ainit_core())
+
+
+def tearDownModule() -> None:
+    return
+
+
+class PasswordTest(AsyncTestCase):
+    """测试密码哈希原语"""
+
+    async def test_hash_verify(self):
+        from core.password import PASSWORD
+
+        pwd_hash = await PASSWORD.hash("123456")
+        self.assertTrue(await PASSWORD.verify(pwd_hash, "123456"))
+        self.assertFalse(await PASSWORD.verify(pwd_hash, "654321"))
+        self.assertFalse(await PASSWORD.verify("", "123456"))
+
+        pwd_hash = await PASSWORD.hash("abc", wait=True)
+        self.assertTrue(await PASSWORD.verify(pwd_hash, "abc", wait=True))
+
+    def test_defaults(self):
+        from config import CONFIG
+        from core.password import PASSWORD
+
+        # 默认的槽位与等待队列不会占满学生服务的所有工作进程
+        workers = CONFIG.ENTRY.svc_stu_workers
+        self.assertGreaterEqual(PASSWORD.slots(), 1)
+        self.assertLess(PASSWORD.slots() + PASSWORD.queue_limit(), workers)
+
+    async def test_busy(self):
+        from core.password import PASSWORD, PasswordBusyError
+
+        pwd_hash = await PASSWORD.hash("123456")
+
+        # 占满所有槽位和等待队列后立即拒绝
+        with contextlib.ExitStack() as stack:
+            for _ in range(PASSWORD.slots()):
+                stack.enter_context(PASSWORD._slot())
+            for _ in range(PASSWORD.queue_limit()):
+                stack.enter_context(PASSWORD._ticket())
+            with self.assertRaises(PasswordBusyError):
+                await PASSWORD.verify(pwd_hash, "123456")
+
+        self.assertTrue(await PASSWORD.verify(pwd_hash, "123456"))
+
+    async def test_queue(self):
+        import asyncio as aio
+        from unittest import mock
+
+        from config import CONFIG
+        from core.password import PASSWORD, PasswordBusyError
+
+        pwd_hash = await PASSWORD.hash("123456")
+
+        # 槽位已满时排队等待，槽位释放后完成
+        with contextlib.ExitStack() as stack:
+            for _ in range(PASSWORD.slots()):
+                stack.enter_context(PASSWORD._slot())
+            task = aio.create_task(PASSWORD.verify(pwd_hash, "123456"))
+            await aio.sleep(0.1)
+            self.assertFalse(task.done())
+        self.assertTrue(await task)
+
+        # 等待超时后拒绝
+        with mock.patch.object(CONFIG.CORE, "password_queue_timeout", 0.1):
+            with contextlib.ExitStack() as stack:
+                for _ in range(PASSWORD.slots()):
+                    stack.enter_context(PASSWORD._slot())
+                with self.assertRaises(PasswordBusyError):
+                    await PASSWORD.verify(pwd_hash, "123456")
+
+if __name__ == "__main__":
+    import unittest
+
+    unittest.main()
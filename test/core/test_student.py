@@ -3,7 +3,9 @@ from base.logger import logger
 import core.student
 import asyncio
 import cluster
+import os
 import uuid
+from datetime import datetime
 
 from .. import RUNNER, AsyncTestCase
 
@@ -36,6 +38,33 @@ class TableTest(AsyncTestCase):
     def tearDown(self) -> None:
         return
 
+    async def _start_ready(self, sid: str) -> None:
+        """启动代码空间并等待模拟作业就绪，代码空间转换到 running"""
+        from core.student import CODESPACE
+
+        self.assertTrue(await CODESPACE.start(sid))
+        for _ in range(20):
+            await asyncio.sleep(0.01)
+            if await CODESPACE.get_status(sid) == "running":
+                return
+        self.fail(f"代码空间未就绪: {sid}")
+
+    async def _create_student(
+        self, sid: str, time_quota: float = 0, name: str | None = None
+    ) -> "core.student.Student":
+        """创建测试学生，测试结束时（包括断言失败时）删除记录及其代码空间"""
+        from core.student import TABLE, Student, UserInfo
+
+        stu = Student(
+            sid=sid,
+            pwd_hash="test_hash",
+            user_info=UserInfo(name=name or f"Name {sid}", mail=f"{sid}@example.com"),
+            codespace=core.student.CodespaceInfo(time_quota=time_quota),
+        )
+        self.assertTrue(await TABLE.create(stu))
+        self.addCleanup(lambda: RUNNER.run(TABLE.delete(sid)))
+        return stu
+
     async def test_create_and_delete(self):
         from core.student import TABLE, Student, UserInfo
 
@@ -46,14 +75,48 @@ class TableTest(AsyncTestCase):
             codespace=core.student.CodespaceInfo(),
         )
 
+        from config import CONFIG
+
+        stu_path = CONFIG.CORE.students_dir + stu.sid + "/"
         self.assertTrue(await TABLE.create(stu))
         LOGGER.info("Created student record: %s", stu)
+        self.assertTrue(os.path.isdir(stu_path + "code/"))
         read_stu = await TABLE.read(stu.sid)
         LOGGER.info("Read student record: %s", read_stu)
         self.assertEqual(stu.sid, read_stu.sid)
 
         self.assertTrue(await TABLE.delete(stu.sid))
         LOGGER.info("Deleted student record: %s", stu.sid)
+        self.assertFalse(os.path.exists(stu_path))
+
+        # 目录操作在文件系统线程池中执行并计时
+        info = core.FS.info()
+        self.assertGreater(info["ops"]["makedirs"]["count"], 0)
+        self.assertGreater(info["ops"]["rename"]["count"], 0)
+
+    async def test_create_many(self):
+        from core.student import TABLE, Student, UserInfo, StudentAlreadyExistsError
+
+        sids = [f"2233505{i}" for i in range(6)]
+        students = [
+            Student(sid=sid, user_info=UserInfo(name=f"Bulk {sid}", mail=""))
+            for sid in sids + [sids[0]]
+        ]
+        results = await TABLE.create_many(
+            students, ["pwd-" + sid for sid in sids] + ["x"]
+        )
+
+        # 批次内重复的学号只创建一次
+        self.assertEqual(results[:-1], [None] * len(sids))
+        self.assertIsInstance(results[-1], StudentAlreadyExistsError)
+        self.assertTrue(await TABLE.check_password(sids[3], "pwd-" + sids[3]))
+
+        # 已存在的学生创建失败
+        results = await TABLE.create_many(students[:1], ["pwd"])
+        self.assertIsInstance(results[0], StudentAlreadyExistsError)
+
+        for sid in sids:
+            self.assertTrue(await TABLE.delete(sid))
 
     async def test_check_password(self):
         from core.student import TABLE, Student, UserInfo
@@ -162,6 +225,582 @@ class TableTest(AsyncTestCase):
         await TABLE.delete(stu.sid)
         LOGGER.info("Deleted test student: %s", stu.sid)
 
+    async def test_read_many(self):
+        from core.student import TABLE
+
+        sids = [f"2233510{i}" for i in range(5)]
+        for sid in sids:
+            await self._create_student(sid)
+
+        # 小批量读取，跨越多个管道批次，不存在的记录被跳过
+        students = await TABLE.read_many(
+            [sids[0], "non_existent_sid", *sids[1:]], batch_size=2
+        )
+        self.assertEqual([stu.sid for stu in students], sids)
+        self.assertEqual(students[3].user_info.name, f"Name {sids[3]}")
+
+        # iter_all 按批次流式读取所有记录
+        seen = {stu.sid async for stu in TABLE.iter_all(batch_size=2)}
+        self.assertTrue(set(sids) <= seen)
+
+        for sid in sids:
+            await TABLE.delete(sid)
+
+    async def test_status_index(self):
+        from core import DB_STU
+        from core.student import TABLE, CodespaceStatus
+
+        stu = await self._create_student("22335020")
+        self.assertIn(stu.sid, await TABLE.ids_by_status(CodespaceStatus.STOPPED))
+
+        # 写入新状态时索引随之迁移
+        stu.codespace.status = CodespaceStatus.RUNNING
+        await TABLE.write(stu)
+        self.assertIn(stu.sid, await TABLE.ids_by_status(CodespaceStatus.RUNNING))
+        self.assertNotIn(stu.sid, await TABLE.ids_by_status(CodespaceStatus.STOPPED))
+
+        # 重建索引后结果不变，运行中的代码空间从重建时开始计算空闲时间
+        await DB_STU.delete("@index-version")
+        before = datetime.now().timestamp()
+        self.assertTrue(await TABLE.migrate())
+        self.assertFalse(await TABLE.migrate())
+        self.assertIn(stu.sid, await TABLE.ids_by_status(CodespaceStatus.RUNNING))
+        active = await DB_STU.zscore("@codespace.activity", stu.sid)
+        self.assertGreaterEqual(active, before)
+
+        # 删除学生后索引被清理
+        self.assertTrue(await TABLE.delete(stu.sid))
+        self.assertNotIn(stu.sid, await TABLE.ids_by_status(CodespaceStatus.RUNNING))
+
+    async def test_registry(self):
+        from core import DB_STU
+        from core.student import TABLE
+
+        sids = [f"2233503{i}" for i in range(5)]
+        for sid in reversed(sids):
+            await self._create_student(sid)
+        self.assertTrue(set(sids) <= set(await TABLE.all_ids()))
+
+        # 按学号顺序分页
+        pages = []
+        cursor = "(2233502"
+        while True:
+            cursor, records = await TABLE.scan(cursor, 2, ["user_info.name"])
+            pages.append([r["sid"] for r in records if r["sid"] in sids])
+            if cursor == "0":
+                break
+        self.assertEqual(pages[0], sids[:2])
+        self.assertEqual(sum(pages, []), sids)
+
+        # 从已有的学生记录重建注册表
+        await DB_STU.delete("@students", "@index-version")
+        self.assertTrue(await TABLE.migrate())
+        self.assertTrue(set(sids) <= set(await TABLE.all_ids()))
+
+        for sid in sids:
+            self.assertTrue(await TABLE.delete(sid))
+        self.assertFalse(set(sids) & set(await TABLE.all_ids()))
+
+    async def test_update(self):
+        from core.student import TABLE, CodespaceStatus
+
+        stu = await self._create_student("22335040", time_quota=100, name="Update User")
+
+        # 只修改指定字段，状态索引随之迁移
+        await TABLE.update(
+            stu.sid,
+            {"codespace.status": CodespaceStatus.RUNNING, "codespace.url": "http://x"},
+        )
+        updated = await TABLE.read(stu.sid)
+        self.assertEqual(updated.codespace.status, CodespaceStatus.RUNNING)
+        self.assertEqual(updated.codespace.url, "http://x")
+        self.assertEqual(updated.user_info.name, "Update User")
+        self.assertEqual(updated.codespace.time_quota, 100)
+        self.assertIn(stu.sid, await TABLE.ids_by_status(CodespaceStatus.RUNNING))
+        self.assertNotIn(stu.sid, await TABLE.ids_by_status(CodespaceStatus.STOPPED))
+
+        # 并发累加使用时间不会丢失更新
+        await asyncio.gather(*(TABLE.incr_time_used(stu.sid, 1.5) for _ in range(10)))
+        self.assertEqual((await TABLE.read(stu.sid)).codespace.time_used, 15)
+
+        with self.assertRaises(ValueError):
+            await TABLE.update(stu.sid, {"no_such_field": "x"})
+        with self.assertRaises(ValueError):
+            await TABLE.update(stu.sid, incr={"user_info.name": 1})
+
+        self.assertTrue(await TABLE.delete(stu.sid))
+        with self.assertRaises(core.student.StudentNotFoundError):
+            await TABLE.update(stu.sid, {"codespace.url": ""})
+        with self.assertRaises(core.student.StudentNotFoundError):
+            await TABLE.incr_time_used(stu.sid, 1)
+
+    async def test_transition(self):
+        from core.student import (
+            TABLE,
+            CODESPACE,
+            Student,
+            UserInfo,
+            CodespaceStatus,
+            CodespaceTransitionError,
+            CodespaceQuotaExceededError,
+        )
+
+        stu = await self._create_student("22335041", time_quota=100)
+
+        # 比较并设置：只有一个并发转换成功
+        results = await asyncio.gather(
+            *(
+                TABLE.transition(
+                    stu.sid, (CodespaceStatus.STOPPED,), CodespaceStatus.STARTING
+                )
+                for _ in range(5)
+            ),
+            return_exceptions=True,
+        )
+        self.assertEqual(
+            sum(isinstance(r, CodespaceTransitionError) for r in results), 4
+        )
+        self.assertIn(stu.sid, await TABLE.ids_by_status(CodespaceStatus.STARTING))
+
+        # running -> stopped 时结算使用时间
+        now = (await TABLE.read(stu.sid)).codespace.last_start + 1000
+        await TABLE.transition(
+            stu.sid,
+            (CodespaceStatus.STARTING,),
+            CodespaceStatus.RUNNING,
+            {"codespace.last_start": now - 30, "codespace.last_watch": now - 10},
+        )
+        time_used, time_quota = await TABLE.transition(
+            stu.sid,
+            (CodespaceStatus.RUNNING,),
+            CodespaceStatus.STOPPED,
+            charge=True,
+            now=now,
+        )
+        self.assertEqual((time_used, time_quota), (10, 100))
+
+        # 配额用尽时拒绝启动
+        await TABLE.update(stu.sid, {"codespace.time_used": 100})
+        with self.assertRaises(CodespaceQuotaExceededError):
+            await TABLE.transition(
+                stu.sid,
+                (CodespaceStatus.STOPPED,),
+                CodespaceStatus.STARTING,
+                check_quota=True,
+            )
+        self.assertEqual(
+            (await TABLE.read(stu.sid)).codespace.status, CodespaceStatus.STOPPED
+        )
+
+        # 重复的启动、停止请求只有一个会访问集群
+        await TABLE.update(stu.sid, {"codespace.time_used": 0})
+        results = await asyncio.gather(*(CODESPACE.start(stu.sid) for _ in range(3)))
+        self.assertEqual(sorted(results), [False, False, True])
+        results = await asyncio.gather(*(CODESPACE.stop(stu.sid) for _ in range(3)))
+        self.assertEqual(sorted(results), [False, False, True])
+
+        self.assertTrue(await TABLE.delete(stu.sid))
+
+    async def test_cache(self):
+        from core import DB_STU
+        from core.student import TABLE, CACHE, UserInfo
+
+        stu = await self._create_student("22335042", name="Cache User")
+
+        # 第二次读取命中缓存，修改返回的记录不影响缓存
+        await TABLE.read(stu.sid)
+        hits = CACHE.info()["hits"]
+        cached = await TABLE.read(stu.sid)
+        self.assertEqual(CACHE.info()["hits"], hits + 1)
+        cached.user_info.name = "Modified"
+        self.assertEqual((await TABLE.read(stu.sid)).user_info.name, "Cache User")
+
+        # 模拟其他进程修改记录并发布失效通知
+        await DB_STU.hset(stu.sid, "user_info.name", "Other Worker")
+        self.assertEqual((await TABLE.read(stu.sid)).user_info.name, "Cache User")
+        await DB_STU.publish("student-invalidate", stu.sid)
+        self.assertEqual((await TABLE.read(stu.sid)).user_info.name, "Other Worker")
+
+        # 本进程的写操作立即生效
+        await TABLE.set_user_info(stu.sid, UserInfo(name="New Name", mail=""))
+        self.assertEqual((await TABLE.read(stu.sid)).user_info.name, "New Name")
+
+        self.assertTrue(await TABLE.delete(stu.sid))
+        with self.assertRaises(core.student.StudentNotFoundError):
+            await TABLE.read(stu.sid)
+
+    async def test_memo(self):
+        from core import CLUSTER
+        from core.student import TABLE, CACHE, CODESPACE, MEMO
+
+        stu = await self._create_student("22335043", time_quota=3600)
+        self.assertTrue(await CODESPACE.start(stu.sid))
+
+        calls = []
+        get_job_status = CLUSTER.get_job_status
+
+        async def counting(job_name):
+            calls.append(job_name)
+            return await get_job_status(job_name)
+
+        CLUSTER.get_job_status = counting
+        try:
+            with MEMO.scope():
+                # 同一范围内集群状态只获取一次，记录只从缓存读取一次
+                status = await CODESPACE.get_status(stu.sid)
+                hits = CACHE.info()["hits"]
+                await CODESPACE.get_url(stu.sid)
+                self.assertEqual(await CODESPACE.get_status(stu.sid), status)
+                await TABLE.read(stu.sid)
+                self.assertEqual(len(calls), 1)
+                self.assertEqual(CACHE.info()["hits"], hits)
+
+                # 写操作使记忆失效
+                self.assertTrue(await CODESPACE.stop(stu.sid))
+                self.assertEqual(await CODESPACE.get_status(stu.sid), "stopped")
+
+            # 范围之外不做记忆化
+            self.assertIsNone(MEMO.get("status", stu.sid))
+        finally:
+            del CLUSTER.get_job_status
+
+        self.assertTrue(await TABLE.delete(stu.sid))
+
+    async def test_single_flight(self):
+        from unittest import mock
+
+        from core import CLUSTER, DB0
+        from core.student import TABLE, CODESPACE
+
+        stu = await self._create_student("22335044", time_quota=3600)
+        self.assertTrue(await CODESPACE.start(stu.sid))
+        job_name = CODESPACE.build_job_params(stu.sid).name
+
+        calls = []
+        get_job_status = CLUSTER.get_job_status
+
+        async def slow(job_name):
+            calls.append(job_name)
+            await asyncio.sleep(0.1)
+            return await get_job_status(job_name)
+
+        CLUSTER.get_job_status = slow
+        try:
+            # 并发的查询只访问集群一次
+            results = await asyncio.gather(
+                *(CODESPACE.get_status(stu.sid) for _ in range(5))
+            )
+            self.assertEqual(len(set(results)), 1)
+            self.assertEqual(len(calls), 1)
+
+            # 其它进程在共享时间内复用查询结果
+            self.assertIsNotNone(await DB0.get("codespace-job-status:" + job_name))
+            CODESPACE._inflight.clear()
+            await CODESPACE.get_status(stu.sid)
+            self.assertEqual(len(calls), 1)
+
+            # 集群从本地缓存读取状态时不经过 Redis 共享
+            await DB0.delete("codespace-job-status:" + job_name)
+            CODESPACE._inflight.clear()
+            cached = mock.PropertyMock(return_value=True)
+            with mock.patch.object(type(CLUSTER), "status_cached", cached):
+                await CODESPACE.get_status(stu.sid)
+            self.assertEqual(len(calls), 2)
+            self.assertIsNone(await DB0.get("codespace-job-status:" + job_name))
+
+            # 停止后丢弃共享的结果
+            self.assertTrue(await CODESPACE.stop(stu.sid))
+            self.assertIsNone(await DB0.get("codespace-job-status:" + job_name))
+        finally:
+            del CLUSTER.get_job_status
+
+        self.assertTrue(await TABLE.delete(stu.sid))
+
+    async def test_get_statuses(self):
+        from core import CLUSTER
+        from core.student import TABLE, CODESPACE
+
+        sids = ["22335045", "22335046", "22335047"]
+        for sid in sids:
+            await self._create_student(sid, time_quota=3600)
+        await self._start_ready(sids[0])
+        await self._start_ready(sids[1])
+        # 作业在集群中消失
+        await CLUSTER.delete_job(CODESPACE.build_job_params(sids[1]).name)
+
+        calls = []
+        get_job_statuses = CLUSTER.get_job_statuses
+
+        async def counting(job_names):
+            calls.append(list(job_names))
+            return await get_job_statuses(job_names)
+
+        CLUSTER.get_job_statuses = counting
+        try:
+            statuses = await CODESPACE.get_statuses(sids + ["00000000"])
+        finally:
+            del CLUSTER.get_job_statuses
+
+        # 只有记录为非 stopped 的代码空间访问集群，且只访问一次
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(calls[0]), 2)
+        self.assertEqual(set(statuses), set(sids))
+        self.assertEqual(statuses[sids[0]], "running")
+        self.assertEqual(statuses[sids[1]], "stopped")
+        self.assertEqual(statuses[sids[2]], "stopped")
+        # 与逐个查询的结果一致，且已写回数据库
+        for sid in sids:
+            self.assertEqual(await CODESPACE.get_status(sid), statuses[sid])
+        self.assertEqual((await TABLE.read(sids[1])).codespace.status, "stopped")
+
+        for sid in sids:
+            self.assertTrue(await TABLE.delete(sid))
+
+    async def test_readiness(self):
+        from unittest import mock
+
+        from config import CONFIG
+        from core import CLUSTER, DB_STU
+        from core.student import TABLE, CODESPACE, CodespaceStatus
+
+        stu = await self._create_student("22335055", time_quota=3600)
+        name = CODESPACE.build_job_params(stu.sid).name
+        await CLUSTER.delete_job(name)
+
+        # 取得启动权后尚未提交作业，在启动期限内视为启动中
+        now = datetime.now().timestamp()
+        await TABLE.transition(
+            stu.sid,
+            (CodespaceStatus.STOPPED,),
+            CodespaceStatus.STARTING,
+            {"codespace.last_start": now},
+        )
+        progress = await CODESPACE.get_progress(stu.sid)
+        self.assertEqual(progress["status"], "starting")
+        self.assertEqual(progress["phase"], "scheduling")
+        timeout = CONFIG.CLUSTER.Codespace.START_TIMEOUT
+        await TABLE.update(stu.sid, {"codespace.last_start": now - timeout - 1})
+        self.assertEqual(await CODESPACE.get_status(stu.sid), "stopped")
+
+        # 提交作业后保持 starting，不计费也不计算空闲时间
+        self.assertTrue(await CODESPACE.start(stu.sid))
+        await asyncio.sleep(0.01)
+        job = CLUSTER._jobs[name]
+        job.status = cluster.JobInfo.Status.PENDING
+        await CODESPACE._forget_job_status(name)
+        progress = await CODESPACE.get_progress(stu.sid)
+        self.assertEqual(progress["status"], "starting")
+        self.assertEqual(progress["phase"], "booting")
+        record = (await TABLE.read(stu.sid)).codespace
+        self.assertTrue(record.url.startswith("http"))
+        self.assertIsNone(await DB_STU.zscore("@codespace.deadline", stu.sid))
+        self.assertIsNone(await DB_STU.zscore("@codespace.activity", stu.sid))
+
+        # Pod 就绪后转换到 running，从 Pod 就绪而不是观察到就绪的时间开始计费
+        await asyncio.sleep(0.05)
+        ready_at = datetime.now()
+        job.status = cluster.JobInfo.Status.RUNNING
+        job.updated_at = ready_at.isoformat()
+        await asyncio.sleep(0.05)
+        await CODESPACE._forget_job_status(name)
+        self.assertEqual(await CODESPACE.get_status(stu.sid), "running")
+        ready = (await TABLE.read(stu.sid)).codespace
+        self.assertGreaterEqual(ready.last_start - record.last_start, 0.05)
+        self.assertAlmostEqual(ready.last_start, ready_at.timestamp(), places=3)
+        self.assertEqual(ready.time_used, 0)
+        self.assertAlmostEqual(
+            await DB_STU.zscore("@codespace.deadline", stu.sid),
+            ready.last_start + 3600,
+            places=3,
+        )
+        self.assertEqual((await CODESPACE.get_progress(stu.sid))["phase"], "ready")
+        self.assertTrue(await CODESPACE.stop(stu.sid))
+
+        # 启动中的代码空间不必等到查询状态即转换到 running
+        self.assertTrue(await CODESPACE.start(stu.sid))
+        with mock.patch.object(CONFIG.CORE, "codespace_starting_interval", 0.01):
+            task = asyncio.create_task(CODESPACE.schedule_starting())
+            try:
+                for _ in range(20):
+                    await asyncio.sleep(0.01)
+                    if (await TABLE.read(stu.sid)).codespace.status == "running":
+                        break
+            finally:
+                task.cancel()
+        self.assertEqual((await TABLE.read(stu.sid)).codespace.status, "running")
+
+        self.assertTrue(await CODESPACE.stop(stu.sid))
+        self.assertTrue(await TABLE.delete(stu.sid))
+
+    async def test_schedule_quotas(self):
+        from core import DB_STU
+        from core.student import TABLE, CODESPACE
+
+        stu = await self._create_student("22335048", time_quota=3600)
+        deadline = lambda: DB_STU.zscore("@codespace.deadline", stu.sid)
+        self.assertIsNone(await deadline())
+
+        await self._start_ready(stu.sid)
+        record = (await TABLE.read(stu.sid)).codespace
+        self.assertAlmostEqual(await deadline(), record.last_start + 3600, places=3)
+
+        # 计费不改变截止时间，调整配额时重新计算
+        await CODESPACE.watch(stu.sid)
+        self.assertAlmostEqual(await deadline(), record.last_start + 3600, places=3)
+        await TABLE.update(stu.sid, {"codespace.time_quota": 7200})
+        self.assertAlmostEqual(await deadline(), record.last_start + 7200, places=3)
+
+        # 截止时间提前时唤醒调度器，到期后代码空间被停止
+        task = asyncio.create_task(CODESPACE.schedule_quotas())
+        try:
+            await asyncio.sleep(0.1)
+            used = (await TABLE.read(stu.sid)).codespace.time_used
+            await TABLE.update(stu.sid, {"codespace.time_quota": used + 0.3})
+            for _ in range(40):
+                if (await TABLE.read(stu.sid)).codespace.status == "stopped":
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            task.cancel()
+
+        record = (await TABLE.read(stu.sid)).codespace
+        self.assertEqual(record.status, "stopped")
+        self.assertGreaterEqual(record.time_used, record.time_quota)
+        self.assertIsNone(await deadline())
+
+        self.assertTrue(await TABLE.delete(stu.sid))
+
+    async def test_reap_idle(self):
+        from unittest import mock
+
+        from config import CONFIG
+        from core import DB_STU
+        from core.student import TABLE, CODESPACE
+
+        sids = ["22335049", "22335050"]
+        for sid in sids:
+            await self._create_student(sid, time_quota=3600)
+            self.assertFalse(await CODESPACE.keep_alive(sid))
+            await self._start_ready(sid)
+        active = lambda sid: DB_STU.zscore("@codespace.activity", sid)
+        self.assertIsNotNone(await active(sids[0]))
+
+        # 只有第二个代码空间有心跳，活动时间未变化的心跳同样报告在运行
+        await asyncio.sleep(0.3)
+        now = datetime.now()
+        with mock.patch("core.student.datetime") as clock:
+            clock.now.return_value = now
+            self.assertTrue(await CODESPACE.keep_alive(sids[1]))
+            self.assertTrue(await CODESPACE.keep_alive(sids[1]))
+        last_active = await active(sids[1])
+
+        timeout = CONFIG.CORE.codespace_idle_timeout
+        CONFIG.CORE.codespace_idle_timeout = 0.2
+        try:
+            next_idle = await CODESPACE.reap_idle()
+        finally:
+            CONFIG.CORE.codespace_idle_timeout = timeout
+        self.assertAlmostEqual(next_idle, last_active + 0.2, places=3)
+
+        # 停止时把最后活动时间写回记录
+        idle = (await TABLE.read(sids[0])).codespace
+        self.assertEqual(idle.status, "stopped")
+        self.assertGreater(idle.last_active, 0)
+        self.assertIsNone(await active(sids[0]))
+        self.assertEqual((await TABLE.read(sids[1])).codespace.status, "running")
+
+        self.assertTrue(await CODESPACE.stop(sids[1]))
+        self.assertAlmostEqual(
+            (await TABLE.read(sids[1])).codespace.last_active, last_active, places=3
+        )
+        for sid in sids:
+            self.assertTrue(await TABLE.delete(sid))
+
+        # 代码空间不上报心跳时不回收
+        with mock.patch.object(CONFIG.CLUSTER.Codespace, "CENTRAL_CONTROL", None):
+            await asyncio.wait_for(CODESPACE.schedule_idle_reaping(), 1)
+
+    async def test_reap_idle_failure(self):
+        from unittest import mock
+
+        from config import CONFIG
+        from core import CLUSTER, DB_STU
+        from core.student import TABLE, CODESPACE
+
+        sids = ["22335054", "22335056"]
+        for sid in sids:
+            await self._create_student(sid, time_quota=3600)
+            await self._start_ready(sid)
+        await asyncio.sleep(0.3)
+        active = lambda sid: DB_STU.zscore("@codespace.activity", sid)
+        last_active = await active(sids[0])
+
+        # 删除第一个代码空间的作业失败
+        broken = CODESPACE.build_job_params(sids[0]).name
+        delete_job = CLUSTER.delete_job
+        deleted = []
+
+        async def flaky(job_name):
+            deleted.append(job_name)
+            if job_name == broken:
+                raise cluster.ClusterError("cluster unavailable")
+            await delete_job(job_name)
+
+        with (
+            mock.patch.object(CONFIG.CORE, "codespace_idle_timeout", 0.2),
+            mock.patch.object(CONFIG.CORE, "codespace_reap_batch_size", 1),
+            mock.patch.object(CONFIG.CORE, "codespace_reap_retry_interval", 60.0),
+            mock.patch.object(CLUSTER, "delete_job", flaky),
+        ):
+            next_idle = await asyncio.wait_for(CODESPACE.reap_idle(), 5)
+
+        # 失败的代码空间恢复运行并保留最后活动时间，不跳过其后健康的代码空间
+        self.assertEqual(deleted.count(broken), 1)
+        self.assertEqual(len(deleted), 2)
+        self.assertGreater(next_idle, datetime.now().timestamp() + 50)
+        self.assertEqual((await TABLE.read(sids[0])).codespace.status, "running")
+        self.assertEqual(await active(sids[0]), last_active)
+        job_status = await CLUSTER.get_job_status(broken)
+        self.assertEqual(job_status, cluster.JobInfo.Status.RUNNING)
+        self.assertEqual((await TABLE.read(sids[1])).codespace.status, "stopped")
+        self.assertIsNone(await active(sids[1]))
+
+        # 集群恢复后重试成功
+        with mock.patch.object(CONFIG.CORE, "codespace_idle_timeout", 0.2):
+            await CODESPACE.reap_idle()
+        self.assertEqual((await TABLE.read(sids[0])).codespace.status, "stopped")
+
+    async def test_account(self):
+        from core import DB_STU
+        from core.student import TABLE, ACCOUNT
+        from util import api_key_enc
+
+        sid = "22335057"
+        api_key = api_key_enc(sid)
+        with self.assertRaises(core.student.StudentNotFoundError):
+            await ACCOUNT.verify(api_key)
+        self.assertIsNone(await ACCOUNT.verify("invalid:" + sid))
+
+        # 创建学生后负缓存失效
+        stu = await self._create_student(sid)
+        self.assertEqual(await ACCOUNT.verify(api_key), stu.sid)
+        hits = ACCOUNT.info()["valid"]["hits"]
+        self.assertEqual(await ACCOUNT.verify(api_key), stu.sid)
+        self.assertEqual(ACCOUNT.info()["valid"]["hits"], hits + 1)
+
+        # 模拟其他进程删除学生并发布失效通知
+        await DB_STU.delete(stu.sid)
+        self.assertEqual(await ACCOUNT.verify(api_key), stu.sid)
+        await DB_STU.publish("student-invalidate", stu.sid)
+        with self.assertRaises(core.student.StudentNotFoundError):
+            await ACCOUNT.verify(api_key)
+
+        await TABLE.write(stu)
+        self.assertEqual(await ACCOUNT.verify(api_key), stu.sid)
+        self.assertTrue(await TABLE.delete(stu.sid))
+        with self.assertRaises(core.student.StudentNotFoundError):
+            await ACCOUNT.verify(api_key)
+
 
 # 集群接口打桩类
 class ClusterStub:
@@ -1,3 +1,4 @@
+import asyncio as aio
 import unittest
 
 import svc_adm
@@ -144,6 +145,31 @@ class Basic(unittest.TestCase):
         self.assertEqual(resp.json[2]["name"], "顾宇浩clone2")
         self.assertEqual(resp.json[2]["mail"], "yhgu2002@outlook.com")
 
+    def test_student_list_page(self):
+        # 逐页获取学生列表，每页一条记录
+        ids = []
+        cursor = "0"
+        while True:
+            resp = self.client.get(
+                f"/student?cursor={cursor}&limit=1&fields=id,status,time_quota",
+                headers=self.header,
+            )
+            self.assertEqual(resp.status_code, 200)
+            for item in resp.json:
+                self.assertEqual(set(item), {"id", "status", "time_quota"})
+                ids.append(item["id"])
+            cursor = resp.headers["X-Next-Cursor"]
+            if cursor == "0":
+                break
+        self.assertTrue({"24111352", "24111353", "24111354"} <= set(ids))
+        self.assertEqual(len(ids), len(set(ids)))
+
+        # 测试不合法的字段和游标
+        resp = self.client.get("/student?fields=id,pwd_hash", headers=self.header)
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.get("/student?cursor=abc", headers=self.header)
+        self.assertEqual(resp.status_code, 400)
+
     def test_create_student(self):
 
         students = [
@@ -349,6 +375,8 @@ class Basic(unittest.TestCase):
         self.assertIn("24111352", resp.json["success"])
         self.assertNotIn("24111353", resp.json["success"])
         self.assertNotIn("24111354", resp.json["success"])
+        self.assertEqual(len(resp.json["success"]) + len(resp.json["failed"]), 3)
+        self.assertGreaterEqual(resp.json["elapsed"], 0)
 
         async def ado():
             # 恢复旧数据
@@ -397,3 +425,139 @@ class Basic(unittest.TestCase):
         # 检查更新是否成功
         resp = self.client.get("/student/24111352", headers=self.header)
         self.assertEqual(resp.json["time_quota"], 7200)
+
+    def test_batch_job(self):
+        ids = ["24111352", "24111354", "404"]
+        self._test_api_key("/job/404", None, "GET")
+
+        resp = self.client.get("/job/404", headers=self.header)
+        self.assertEqual(resp.status_code, 404)
+
+        # 提交为后台任务，立即返回任务ID
+        resp = self.client.put(
+            "/student/codespace/quota?background=true",
+            json={"ids": ids, "time_quota": 5400},
+            headers=self.header,
+        )
+        self.assertEqual(resp.status_code, 202)
+        job_id = resp.json["job"]
+
+        resp = self.client.get(f"/job/{job_id}", headers=self.header)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json["state"], "pending")
+
+        async def ado():
+            from core.job import JOB
+
+            self.assertTrue(await JOB.run_once())
+
+        RUNNER.run(ado())
+
+        resp = self.client.get(f"/job/{job_id}", headers=self.header)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json["state"], "succeeded")
+        self.assertEqual(resp.json["total"], 3)
+        self.assertEqual(resp.json["done"], 3)
+        self.assertEqual(resp.json["success"], ["24111352", "24111354"])
+        self.assertEqual(resp.json["failed"][0]["id"], "404")
+
+        resp = self.client.get("/student/24111354", headers=self.header)
+        self.assertEqual(resp.json["time_quota"], 5400)
+
+        # 不指定 background 时同步执行
+        resp = self.client.put(
+            "/student/codespace/quota",
+            json={"ids": ids[:2], "time_quota": 3600},
+            headers=self.header,
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json["success"], ids[:2])
+
+    def test_keepalive(self):
+        self._test_api_key("/student/keepalive/24111352", None, "POST")
+
+        async def ado():
+            await student.CODESPACE.start("24111352")
+            # 等待模拟作业就绪，代码空间转换到 running
+            await aio.sleep(0.01)
+            await student.CODESPACE.get_status("24111352")
+
+        RUNNER.run(ado())
+
+        # 测试运行中的代码空间
+        resp = self.client.post("/student/keepalive/24111352", headers=self.header)
+        self.assertEqual(resp.status_code, 200)
+
+        # 测试不在运行的代码空间
+        resp = self.client.post("/student/keepalive/24111354", headers=self.header)
+        self.assertEqual(resp.status_code, 202)
+
+        # 测试不存在的学生
+        resp = self.client.post("/student/keepalive/404", headers=self.header)
+        self.assertEqual(resp.status_code, 404)
+
+        async def ado():
+            # 重置测试数据
+            await student.CODESPACE.stop("24111352")
+
+        RUNNER.run(ado())
+
+    def test_codespace_progress(self):
+        self._test_api_key("/student/codespace/progress/24111352", None, "GET")
+
+        async def ado():
+            await student.CODESPACE.start("24111352")
+            await aio.sleep(0.01)
+
+        RUNNER.run(ado())
+
+        # 测试已就绪的代码空间
+        resp = self.client.get(
+            "/student/codespace/progress/24111352", headers=self.header
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json["status"], "running")
+        self.assertEqual(resp.json["phase"], "ready")
+
+        # 测试不在运行的代码空间
+        resp = self.client.get(
+            "/student/codespace/progress/24111354", headers=self.header
+        )
+        self.assertEqual(resp.status_code, 200)
+        self.assertIsNone(resp.json["phase"])
+
+        # 测试不存在的学生
+        resp = self.client.get("/student/codespace/progress/404", headers=self.header)
+        self.assertEqual(resp.status_code, 404)
+
+        RUNNER.run(student.CODESPACE.stop("24111352"))
+
+    def test_metrics(self):
+        self._test_api_key("/metrics", None, "GET")
+
+        resp = self.client.get("/metrics", headers=self.header)
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("hits", resp.json["student_cache"])
+        self.assertIn("evictions", resp.json["student_cache"])
+        self.assertIn("ops", resp.json["fs"])
+
+    def test_api_key_refresh(self):
+        resp = self.client.get("/metrics", headers=self.header)
+        self.assertEqual(resp.status_code, 200)
+
+        async def ado(api_key: str):
+            # 模拟其他进程修改管理员 API-KEY
+            from core import DB0
+
+            await DB0.set("admin-api-key", api_key)
+            await DB0.publish("admin-api-key", b"")
+
+        RUNNER.run(ado("654321"))
+        resp = self.client.get("/metrics", headers=self.header)
+        self.assertEqual(resp.status_code, 403)
+        resp = self.client.get("/metrics", headers={"ADM-API-KEY": "654321"})
+        self.assertEqual(resp.status_code, 200)
+
+        RUNNER.run(ado("123456"))
+        resp = self.client.get("/metrics", headers=self.header)
+        self.assertEqual(resp.status_code, 200)
@@ -1,5 +1,7 @@
+import asyncio as aio
 import unittest
 
+import cluster
 import svc_stu
 from base.logger import logger
 from core import student
@@ -24,6 +26,13 @@ def tearDownModule() -> None:
     return
 
 
+async def start_ready(sid: str) -> None:
+    """启动代码空间并等待模拟作业就绪，代码空间转换到 running"""
+    await student.CODESPACE.start(sid)
+    await aio.sleep(0.01)
+    await student.CODESPACE.get_status(sid)
+
+
 class Basic(unittest.TestCase):
     @classmethod
     def setUpClass(cls) -> None:
@@ -52,7 +61,7 @@ class Basic(unittest.TestCase):
             )
             running_stu.reset_password("123456")
             await student.TABLE.create(running_stu)
-            await student.CODESPACE.start("24111353")
+            await start_ready("24111353")
 
             exceeded_stu = student.Student(
                 sid="24111354",
@@ -257,6 +266,37 @@ class Basic(unittest.TestCase):
         )
         self.assertEqual(resp.status_code, 302)
 
+        # 测试代码空间尚未就绪的情况
+        async def ado():
+            from core import CLUSTER
+
+            await start_ready("24111352")
+            name = student.CODESPACE.build_job_params("24111352").name
+            CLUSTER._jobs[name].status = cluster.JobInfo.Status.PENDING
+            await student.CODESPACE._forget_job_status(name)
+
+        RUNNER.run(ado())
+        resp = self.client.get("/codespace", headers=self.header)
+        self.assertEqual(resp.status_code, 202)
+        self.assertEqual(resp.headers["Retry-After"], "5")
+        resp = self.client.get("/codespace/info", headers=self.header)
+        self.assertEqual(resp.json["status"], "starting")
+        self.assertEqual(resp.json["phase"], "booting")
+        self.assertIs(resp.json["access_url"], True)
+
+        RUNNER.run(student.CODESPACE.stop("24111352"))
+
+    def test_keepalive(self):
+        self._test_api_key("/codespace/keepalive", None, "POST")
+
+        # 测试未启动代码空间情况
+        resp = self.client.post("/codespace/keepalive", headers=self.header)
+        self.assertEqual(resp.status_code, 202)
+
+        # 测试启动代码空间的情况
+        resp = self.client.post("/codespace/keepalive", headers=self.running_header)
+        self.assertEqual(resp.status_code, 200)
+
     def test_start_codespace(self):
         self._test_api_key("/codespace", None, "POST")
 
@@ -306,7 +346,7 @@ class Basic(unittest.TestCase):
 
         async def ado():
             # 恢复旧数据
-            await student.CODESPACE.start("24111353")
+            await start_ready("24111353")
 
         RUNNER.run(ado())
 
@@ -325,3 +365,5 @@ class Basic(unittest.TestCase):
         )
         self.assertEqual(resp.status_code, 200)
         self.assertTrue(resp.json["access_url"].startswith("http"))
+        self.assertEqual(resp.json["status"], "running")
+        self.assertEqual(resp.json["phase"], "ready")